@@ -10,13 +10,75 @@ License: MIT
 """
 
 import argparse
+import csv
+import contextlib
+import os
 import re
+import signal
 import sys
 import hashlib
-from pathlib import Path
+import tarfile
+import threading
+import time
+import zipfile
+from pathlib import Path, PurePosixPath
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Set
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Set
 import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+# Building blocks (see conversion/__init__.py), re-exported as part of this module's API
+from conversion.document import ConversationDocument, clean_conversation_lines
+from conversion.files import fsync_directory
+from conversion.hubs import HubIndex
+from conversion.indexes import HashIndex, NoteIndex, NearDuplicateIndex
+from conversion.jsonstream import JsonStream, json_chunks
+from conversion.metrics import RunMetrics
+from conversion.search import SearchIndex
+from conversion.sources import (ARCHIVE_SUFFIXES, is_archive, is_session_export, MemorySource,
+                                iter_archive, SESSION_LIST_KEYS, iter_json_sessions,
+                                render_vscode_session, iter_session_export)
+from conversion.streaming import strip_pieces, StreamedBody, StreamedDocument, NoteStream
+from conversion.taxonomy import KeywordHits, KeywordMatcher, Taxonomy
+from conversion.watch import Inotify, DirectoryWatcher
+
+
+@dataclass
+class ConversionResult:
+    """Outcome of converting one source, as returned by ``convert_file``.
+    
+    ``status`` is one of ``STATUSES``; ``path`` is the note written, or the
+    existing note that made this one a duplicate or skip. Metadata fields
+    are empty when the file was not rendered (unchanged, failed, exact
+    duplicate). Truthy when a note was (or, in a dry run, would be) created
+    or, for ``'grown'``, updated with the turns a conversation gained.
+    """
+    __slots__ = ('source', 'status', 'path', 'title', 'date', 'domains',
+                 'activity', 'topics', 'content_hash', 'seconds')
+    
+    STATUSES = ('converted', 'grown', 'dry-run', 'unchanged', 'skipped', 'duplicate',
+                'near-duplicate', 'failed')
+    FIELDS = __slots__
+    
+    source: str
+    status: str
+    path: Optional[str]
+    title: Optional[str]
+    date: Optional[str]
+    domains: List[str]
+    activity: Optional[str]
+    topics: List[str]
+    content_hash: Optional[str]
+    seconds: float
+    
+    def __bool__(self) -> bool:
+        return self.status in ('converted', 'grown', 'dry-run')
+    
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.FIELDS}
 
 
 class ConversationConverter:
@@ -60,71 +122,1073 @@ class ConversationConverter:
                      'cheat sheet', 'quick reference']
     }
     
-    def __init__(self, output_dir: Path):
-        """Initialize converter and build index of existing files."""
+    # Frameworks recognized by extract_key_topics:
+    # (topic, keywords that must all appear, keywords of which one must)
+    TOPIC_FRAMEWORKS = [
+        ('NIST-RMF', ('nist',), ('rmf',)),
+        ('NIST-800-53', ('nist',), ('800-53',)),
+        ('NIST-CSF', ('nist',), ('csf', 'cybersecurity framework')),
+        ('MITRE ATT&CK', (), ('mitre', 'att&ck')),
+        ('CVSS', (), ('cvss',)),
+        ('ISO 27001', (), ('iso 27001', 'iso27001')),
+    ]
+    
+    # Tools recognized by extract_key_topics
+    TOPIC_TOOLS = ['wireshark', 'nmap', 'splunk', 'metasploit', 'burp suite',
+                   'snort', 'suricata', 'zeek', 'elk', 'siem']
+    
+    # Pages linked from a note's Related section, per domain
+    DOMAIN_PAGES = {
+        'grc': 'Governance, Risk, and Compliance',
+        'risk-management': 'Risk Management',
+        'threat-intelligence': 'Threat Intelligence and Hunting',
+        'security-operations': 'Security Operations',
+        'network-security': 'Network Security',
+        'cryptography': 'Cryptography',
+        'application-security': 'Application Security',
+        'cloud-security': 'Cloud Security',
+        'iam': 'Identity and Access Management (IAM)',
+        'career': 'Career Development'
+    }
+    
+    # Output layouts: every note in output_dir, or sharded into YYYY/MM/
+    # or into a two-hex-digit directory taken from the filename's hash
+    LAYOUTS = ('flat', 'date', 'hash')
+    NOTE_FILENAME = re.compile(r'^(\d{4})-(\d{2})-\d{2}_.*_([0-9a-f]{8})\.md$')
+    
+    # Lines that open a user turn in a rendered note (see turn_chain)
+    USER_TURN_LINE = re.compile(r'^(?:\*\*(?:User|Q)\*\*|user|q|question):',
+                                re.IGNORECASE | re.MULTILINE)
+    # Identifies the turn hashing scheme; stored hashes with another tag are recomputed
+    TURN_SCHEME = 'turns-v2'
+    # Length of one hash in a turn chain (see chain_marks)
+    TURN_HASH_CHARS = 16
+    # A shared prefix shorter than this (normalized characters) is not
+    # taken as proof that a conversation grew, e.g. a common greeting
+    GROWN_MIN_CHARS = 200
+    
+    # Full-text search index (see SearchIndex), kept next to the notes
+    SEARCH_FILENAME = '.conversation-search.sqlite'
+    
+    # Hub pages per domain, activity and topic (see HubIndex) and their state
+    HUB_DIRNAME = 'hubs'
+    HUB_STATE_FILENAME = '.conversation-hubs.json'
+    
+    # Persistent dedup index kept alongside the notes
+    INDEX_FILENAME = '.conversation-index.json'
+    INDEX_VERSION = 1
+    
+    # Source manifest used to skip unchanged inputs on re-runs
+    MANIFEST_FILENAME = '.conversation-sources.json'
+    MANIFEST_VERSION = 1
+    
+    # Per-node snapshots of both written by partitioned runs (see merge_shards)
+    SHARD_DIRNAME = '.conversation-shards'
+    
+    # Seconds between index checkpoints in --watch mode
+    WATCH_SAVE_INTERVAL = 60
+    
+    # Sources larger than this (bytes) are converted without loading them
+    # (see StreamedDocument); the search index gets the first
+    # STREAM_INDEXED_CHARS characters of such a note's conversation
+    STREAM_THRESHOLD = 64 << 20
+    STREAM_INDEXED_CHARS = 1 << 20
+    
+    def __init__(self, output_dir: Optional[Path], build_index: bool = True,
+                 near_duplicate_threshold: Optional[float] = None,
+                 metrics: Optional[RunMetrics] = None, fsync_batch: int = 0,
+                 taxonomy: Optional[Taxonomy] = None, layout: Optional[str] = None,
+                 migrate_layout: bool = False, search_index: Optional[bool] = None,
+                 partition: Optional[Tuple[int, int]] = None, hubs: Optional[bool] = None,
+                 stream_threshold: Optional[int] = None):
+        """Initialize converter and build index of existing files.
+        
+        ``near_duplicate_threshold`` (0-1) enables MinHash near-duplicate
+        detection next to the exact hash check. ``metrics`` instruments the
+        conversion stages (see ``RunMetrics``). ``fsync_batch`` makes note
+        writes durable, syncing every that many notes (see ``sync_notes``).
+        ``taxonomy`` replaces the built-in domain/activity/topic keywords.
+        
+        ``layout`` (see ``LAYOUTS``) defaults to the one recorded in the
+        index file. Asking for another layout on a graph that already has
+        notes raises ``ValueError`` unless ``migrate_layout`` is set, in
+        which case the notes are moved once (see ``migrate_layout``).
+        
+        ``search_index=True`` creates the full-text index (``SearchIndex``);
+        by default an existing one is kept up to date, and ``False`` leaves
+        it alone. ``hubs`` does the same for the hub pages (``HubIndex``).
+        
+        ``partition=(i, n)`` makes this converter node ``i`` of ``n`` (see
+        ``partition_sources``): it only converts its share of the inputs and
+        saves its index to a shard manifest instead of the shared state
+        files, which ``merge_shards`` combines once every node is done. The
+        search index and hub pages are not touched on a partition.
+        
+        Source files larger than ``stream_threshold`` bytes (default:
+        ``STREAM_THRESHOLD``) are read line by line instead of whole, so
+        their size doesn't bound what fits in memory (see ``StreamedDocument``).
+        
+        With ``output_dir=None`` the converter never touches the disk and can
+        only parse and render (see ``ConversionService``).
+        """
         self.output_dir = output_dir
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if output_dir is None:
+            build_index = False
+        else:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
         self.converted = []
         self.skipped = []
         self.failed = []
         self.duplicates = []
+        self.unchanged = []
+        self.replaced = []
+        self.grown = []
+        self.near_duplicates = []
+        # One ConversionResult per source handled, in order
+        self.results: List[ConversionResult] = []
+        self.taxonomy = taxonomy if taxonomy is not None else self.default_taxonomy()
+        self.stream_threshold = (self.STREAM_THRESHOLD if stream_threshold is None
+                                 else stream_threshold)
+        
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.instrument(self)
         
         # Build hash index of existing files for deduplication
-        self.existing_hashes: Dict[str, Path] = {}
-        self.build_existing_index()
+        self.existing_hashes = HashIndex(self.output_dir or Path())
+        # Last turn hash of each note (see turn_chain) -> note, to spot grown exports
+        self.turn_heads = HashIndex(self.output_dir or Path())
+        # Anchor hash of each note (see chain_marks) -> note, to spot stale exports
+        self.turn_anchors = HashIndex(self.output_dir or Path())
+        # Optional near-duplicate index, keyed by note path relative to output_dir
+        self.near_index: Optional[NearDuplicateIndex] = None
+        if near_duplicate_threshold is not None:
+            self.near_index = NearDuplicateIndex(near_duplicate_threshold)
+        
+        # Cached per-note entries:
+        # relative path -> [digest, size, mtime_ns(, minhash signature)],
+        # plus each note's chain_marks ('' for notes without user turns)
+        self.note_index = NoteIndex()
+        # Notes the index file listed at startup
+        self._indexed_notes = 0
+        self.index_path = output_dir / self.INDEX_FILENAME if output_dir else None
+        self._index_dirty = False
+        # Layout of the notes on disk, as recorded in the index file
+        self.layout = 'flat'
+        # Shard directories known to exist (created on first use)
+        self._note_dirs: Set[Path] = set()
+        
+        # Source manifest: absolute source path -> [size, mtime_ns, note path,
+        # note digest when recorded, whether the source wrote the note]
+        self.source_manifest: Dict[str, list] = {}
+        self.manifest_path = output_dir / self.MANIFEST_FILENAME if output_dir else None
+        self._manifest_dirty = False
+        
+        # Durable writes: final path -> temp file awaiting the next sync
+        self.fsync_batch = fsync_batch
+        self._unsynced: Dict[Path, Path] = {}
+        self._sync_lock = threading.Lock()
+        
+        # Full-text index and hub pages, only open when enabled
+        self.search_index: Optional[SearchIndex] = None
+        self.hub_index: Optional[HubIndex] = None
+        
+        # (node, node count) for partitioned runs, plus sources kept/seen
+        self.partition = partition
+        self._partition_counts = [0, 0]
+        self._shard_saved = False
+        # Notes written this run -> the content hash they were deduplicated by
+        # (shards hand it to merge_shards)
+        self.note_hashes: Dict[str, str] = {}
+        
+        # Writer pool state, only set while convert_files_pipelined runs
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._writes: Optional[deque] = None
+        self._write_window = 0
+        self._pending_paths: Set[Path] = set()
+        
+        if build_index:
+            self.build_existing_index()
+            self.source_manifest = self.load_manifest_file()
+            if partition is None:
+                self.open_note_views(search_index, hubs)
+        if layout is not None and layout != self.layout:
+            # On a partition, notes missing from the shared index were written
+            # by the other nodes of the run (which share the layout setting)
+            if self.note_index and (partition is None or self._indexed_notes):
+                if not migrate_layout:
+                    raise ValueError(
+                        f"{output_dir} uses the {self.layout} layout; use "
+                        f"--migrate-layout to move its notes to the {layout} layout")
+                self.migrate_layout(layout)
+            self.layout = layout
+            self._index_dirty = True
     
     def build_existing_index(self):
-        """Build index of existing converted files by content hash."""
+        """Build index of existing converted files by content hash.
+        
+        Digests are cached in the index file together with each note's size
+        and mtime, so only notes that changed since the last run are re-read.
+        Notes deleted or renamed outside the tool drop out of the index.
+        """
         if not self.output_dir.exists():
             return
         
+        cached = self.load_index_file()
+        self._indexed_notes = len(cached)
+        notes = NoteIndex()
+        notes.load(self.scan_notes(cached))
+        if len(notes) != len(cached):
+            self._index_dirty = True
+        self.note_index = notes
+        
+        def shared(rel_path: str) -> bool:
+            # On a partition run, a note missing from the shared index was
+            # written by another node of this run: its name is taken, but
+            # duplicates across nodes are settled by merge_shards, so the
+            # outcome doesn't depend on which node got there first
+            return self.partition is None or rel_path in cached
+        
+        self.existing_hashes.load((entry[0], rel_path) for rel_path, entry in notes.items()
+                                  if entry[0] and shared(rel_path))
+        cut = self.TURN_HASH_CHARS
+        self.turn_heads.load((marks[:cut], rel_path) for rel_path, marks in notes.turn_items()
+                             if marks and shared(rel_path))
+        self.turn_anchors.load((marks[cut:], rel_path) for rel_path, marks in notes.turn_items()
+                               if marks[cut:] and shared(rel_path))
+        if self.near_index is not None:
+            for rel_path, entry in notes.items():
+                if len(entry) > 3 and entry[3] and shared(rel_path):
+                    self.near_index.add(rel_path, NearDuplicateIndex.decode(entry[3]))
+        self.save_index()
+    
+    def scan_notes(self, cached: NoteIndex) -> Iterator[Tuple[str, list, Optional[str]]]:
+        """List the notes on disk as ``NoteIndex`` rows, re-reading only changed ones.
+        
+        A note's digest, signature and turn marks come from ``cached`` while
+        its size and mtime match; anything computed marks the index dirty.
+        """
+        hub_prefix = self.HUB_DIRNAME + '/'
+        # Paths listed under output_dir start with it (str() is cheaper than relative_to)
+        root = str(self.output_dir)
+        root_prefix = '' if root == '.' else root.rstrip(os.sep) + os.sep
         for md_file in self.output_dir.rglob("*.md"):
+            if self.is_temp_note(md_file):
+                # Left behind by a run that was killed mid-write. On a
+                # partition run it may be a sibling node's unsynced write,
+                # so leave it for the next unpartitioned run or merge.
+                if self.partition is None:
+                    try:
+                        md_file.unlink()
+                    except OSError:
+                        pass
+                continue
+            rel_path = str(md_file)[len(root_prefix):]
+            if os.sep != '/':
+                rel_path = rel_path.replace(os.sep, '/')
+            if rel_path.startswith(hub_prefix):
+                continue  # hub pages are derived from the notes (see HubIndex)
+            turn_hash = None
             try:
-                content = md_file.read_text(encoding='utf-8')
-                # Hash the conversation section only (skip frontmatter)
-                conv_match = re.search(r'## Conversation\n\n(.+?)(?:\n---|\Z)', 
-                                      content, re.DOTALL)
-                if conv_match:
-                    content_hash = self.hash_content(conv_match.group(1))
-                    self.existing_hashes[content_hash] = md_file
-            except:
-                pass
+                stat = md_file.stat()
+                entry, cached_marks = cached.get_with_marks(rel_path) or (None, None)
+                if (entry and entry[1] == stat.st_size
+                        and entry[2] == stat.st_mtime_ns):
+                    content = None
+                else:
+                    self._index_dirty = True
+                    content = md_file.read_text(encoding='utf-8')
+                    entry = [self.note_digest(content), stat.st_size, stat.st_mtime_ns]
+                
+                # Signatures are computed once per note and then persisted
+                if self.near_index is not None and entry[0] and len(entry) < 4:
+                    if content is None:
+                        content = md_file.read_text(encoding='utf-8')
+                    entry.append(self.note_signature(content))
+                    self._index_dirty = True
+                
+                # Turn hashes likewise (computed once for notes from older versions)
+                if entry[0]:
+                    turn_hash = cached_marks if content is None else None
+                    if turn_hash is None:
+                        if content is None:
+                            content = md_file.read_text(encoding='utf-8')
+                        turn_hash = self.note_turn_hash(content)
+                        self._index_dirty = True
+            except UnicodeDecodeError:
+                # Not a note we can index, but its name is still taken
+                entry = [None, stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                continue
+            yield rel_path, entry, turn_hash
+    
+    def load_index_file(self) -> NoteIndex:
+        """Load cached note entries; empty if the index is missing or corrupt.
+        
+        The file is decoded one entry at a time straight into a ``NoteIndex``
+        (turn marks included), so it is never held in memory as a whole.
+        """
+        index = NoteIndex()
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as fp:
+                valid = self.read_index(JsonStream(fp), index)
+        except FileNotFoundError:
+            return index
+        except (OSError, ValueError):
+            print(f"⚠️  Index file unreadable, rebuilding: {self.index_path.name}")
+            return NoteIndex()
+        
+        if not valid:
+            print(f"⚠️  Index file invalid, rebuilding: {self.index_path.name}")
+            return NoteIndex()
+        return index
+    
+    def read_index(self, stream: JsonStream, index: NoteIndex) -> bool:
+        """Decode an index file into ``index``; False if it is not a valid one.
+        
+        ``save_index`` writes the header fields before the notes and the
+        turn scheme before the turns, so each entry can be checked as it
+        goes by.
+        """
+        if stream.peek() != '{':
+            return False
+        header = {}
+        found_notes = False
+        for key in stream.object_keys():
+            if key == 'notes':
+                if header.get('version') != self.INDEX_VERSION or stream.peek() != '{':
+                    return False
+                # Signatures from another MinHash scheme can't be compared; drop them
+                keep_signatures = header.get('signatures') == NearDuplicateIndex.SCHEME
+                index.load((rel_path, entry, None)
+                           for rel_path, entry in self.iter_note_entries(stream, keep_signatures))
+                found_notes = True
+            elif (key == 'turns' and header.get('turn_scheme') == self.TURN_SCHEME
+                    and stream.peek() == '{'):
+                for rel_path in stream.object_keys():
+                    marks = stream.value()
+                    if NoteIndex.valid_marks(marks):
+                        index.set_marks(rel_path, marks)
+            else:
+                header[key] = stream.value()
+        
+        if not found_notes:
+            return False
+        if header.get('layout') in self.LAYOUTS:
+            self.layout = header['layout']
+        return True
+    
+    @staticmethod
+    def iter_note_entries(stream: JsonStream,
+                          keep_signatures: bool) -> Iterator[Tuple[str, list]]:
+        """The well-formed entries of a ``notes`` object, decoded one at a time."""
+        for rel_path in stream.object_keys():
+            entry = NoteIndex.valid_entry(stream.value(), keep_signatures)
+            if entry is not None:
+                yield rel_path, entry
+    
+    def valid_note_entries(self, data: dict) -> Dict[str, list]:
+        """The well-formed note entries of shard file data."""
+        keep_signatures = data.get('signatures') == NearDuplicateIndex.SCHEME
+        valid = {}
+        for rel_path, entry in data['notes'].items():
+            entry = NoteIndex.valid_entry(entry, keep_signatures)
+            if entry is not None:
+                valid[rel_path] = entry
+        return valid
+    
+    def valid_turns(self, data: dict, notes: Dict[str, list]) -> Dict[str, str]:
+        """The turn hashes of shard file data for ``notes``."""
+        turns = data.get('turns')
+        if data.get('turn_scheme') != self.TURN_SCHEME or not isinstance(turns, dict):
+            return {}
+        return {rel_path: turn_hash for rel_path, turn_hash in turns.items()
+                if rel_path in notes and NoteIndex.valid_marks(turn_hash)}
+    
+    def load_manifest_file(self) -> Dict[str, list]:
+        """Load the source manifest; empty if it is missing or corrupt."""
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            print(f"⚠️  Source manifest unreadable, ignoring: {self.manifest_path.name}")
+            return {}
+        
+        if (not isinstance(data, dict) or data.get('version') != self.MANIFEST_VERSION
+                or not isinstance(data.get('sources'), dict)):
+            print(f"⚠️  Source manifest invalid, ignoring: {self.manifest_path.name}")
+            return {}
+        
+        return self.valid_sources(data)
+    
+    @staticmethod
+    def valid_sources(data: dict) -> Dict[str, list]:
+        """The well-formed entries of source manifest (or shard) file data."""
+        valid = {}
+        for source, entry in data['sources'].items():
+            if (isinstance(entry, list) and len(entry) in (3, 5)
+                    and isinstance(entry[0], int) and isinstance(entry[1], int)
+                    and (entry[2] is None or isinstance(entry[2], str))
+                    and (len(entry) == 3 or (entry[3] is None or isinstance(entry[3], str))
+                         and isinstance(entry[4], bool))):
+                valid[source] = entry
+        return valid
+    
+    def save_index(self):
+        """Write the note index and source manifest if they changed.
+        
+        A partitioned run leaves the shared files alone and saves both to
+        its shard manifest instead (see ``save_shard``).
+        """
+        # Never let the state files point at notes that are not durable yet
+        self.sync_notes()
+        if self.partition is not None:
+            self.save_shard()
+            return
+        if self._index_dirty:
+            data = {'version': self.INDEX_VERSION,
+                    'signatures': NearDuplicateIndex.SCHEME,
+                    'layout': self.layout,
+                    'notes': self.note_index.items(),
+                    'turn_scheme': self.TURN_SCHEME,
+                    'turns': self.note_index.turn_items()}
+            if self.write_json_atomic(self.index_path, data):
+                self._index_dirty = False
+        if self._manifest_dirty:
+            data = {'version': self.MANIFEST_VERSION, 'sources': self.source_manifest}
+            if self.write_json_atomic(self.manifest_path, data):
+                self._manifest_dirty = False
+        for view in self.note_views():
+            view.commit()
+    
+    @property
+    def shard_path(self) -> Path:
+        node, count = self.partition
+        return self.output_dir / self.SHARD_DIRNAME / f"{node}-of-{count}.json"
+    
+    def save_shard(self):
+        """Write this node's snapshot of the note index and source manifest.
+        
+        The snapshot covers the whole output directory as this node saw it;
+        ``merge_shards`` works out what the node changed by comparing it
+        with the shared index all nodes started from.
+        """
+        if self._shard_saved and not (self._index_dirty or self._manifest_dirty):
+            return
+        data = {'version': self.INDEX_VERSION,
+                'partition': list(self.partition),
+                'signatures': NearDuplicateIndex.SCHEME,
+                'layout': self.layout,
+                'notes': self.note_index.items(),
+                'turn_scheme': self.TURN_SCHEME,
+                'turns': self.note_index.turn_items(),
+                'sources': self.source_manifest,
+                'hashes': self.note_hashes}
+        try:
+            self.shard_path.parent.mkdir(exist_ok=True)
+        except OSError as e:
+            print(f"⚠️  Could not save {self.shard_path.name}: {e}")
+            return
+        if self.write_json_atomic(self.shard_path, data):
+            self._index_dirty = self._manifest_dirty = False
+            self._shard_saved = True
+    
+    def load_shards(self) -> List[dict]:
+        """Read the shard manifests of a partitioned run, ordered by node.
+        
+        Raises ``ValueError`` unless there is exactly one valid shard for
+        every node of the run.
+        """
+        shard_dir = self.output_dir / self.SHARD_DIRNAME
+        paths = sorted(shard_dir.glob('*-of-*.json')) if shard_dir.is_dir() else []
+        if not paths:
+            raise ValueError(f"No shard manifests found in {shard_dir}")
+        
+        shards = {}
+        counts = set()
+        for path in paths:
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                raise ValueError(f"Shard manifest unreadable: {path.name} ({e})")
+            partition = data.get('partition') if isinstance(data, dict) else None
+            if (not (isinstance(partition, list) and len(partition) == 2
+                     and all(isinstance(n, int) for n in partition)
+                     and 1 <= partition[0] <= partition[1])
+                    or data.get('version') != self.INDEX_VERSION
+                    or not isinstance(data.get('notes'), dict)
+                    or not isinstance(data.get('sources'), dict)):
+                raise ValueError(f"Shard manifest invalid: {path.name}")
+            node, count = partition
+            counts.add(count)
+            notes = self.valid_note_entries(data)
+            hashes = data.get('hashes')
+            shards[node] = {'path': path, 'node': node, 'notes': notes,
+                            'turns': self.valid_turns(data, notes),
+                            'sources': self.valid_sources(data),
+                            'hashes': {rel_path: content_hash for rel_path, content_hash
+                                       in hashes.items() if isinstance(content_hash, str)}
+                                      if isinstance(hashes, dict) else {},
+                            'layout': data.get('layout')}
+        
+        if len(counts) != 1:
+            raise ValueError(f"Shard manifests from runs with different node counts: "
+                             f"{', '.join(str(n) for n in sorted(counts))}")
+        count = counts.pop()
+        missing = [f"{node}/{count}" for node in range(1, count + 1) if node not in shards]
+        if missing:
+            raise ValueError(f"Shard manifests missing for partition(s) {', '.join(missing)} "
+                             f"(node still running or failed?)")
+        layouts = {shard['layout'] for shard in shards.values()}
+        if len(layouts) != 1 or layouts.pop() not in self.LAYOUTS:
+            raise ValueError("Shard manifests disagree on the note layout")
+        return [shards[node] for node in sorted(shards)]
+    
+    def merge_shards(self, dry_run: bool = False) -> dict:
+        """Fold the shard manifests of a partitioned run into the shared index.
+        
+        Each node's changes are found by comparing its shard with the index
+        and manifest all nodes started from. When two nodes wrote the same
+        note path, the entry matching the file on disk wins. Exact
+        duplicates (same content hash, as recorded by the writing node)
+        from different nodes are resolved the way a single run resolves
+        them: the note whose first source sorts first is kept, the others
+        are deleted and their sources point at the kept note.
+        The shards are removed once the index is saved, so the next run
+        (partitioned or not) loads one global index. Returns counts.
+        """
+        shards = self.load_shards()
+        base = self.load_index_file()
+        base_notes = dict(base.items())
+        base_turns = dict(base.turn_items())
+        del base
+        base_sources = self.load_manifest_file()
+        
+        # Notes each node added or changed, and what it removed
+        candidates: Dict[str, list] = {}
+        removed: Set[str] = set()
+        sources = dict(base_sources)
+        for shard in shards:
+            for rel_path, entry in shard['notes'].items():
+                if entry != base_notes.get(rel_path):
+                    candidates.setdefault(rel_path, []).append(
+                        (entry, shard['turns'].get(rel_path), shard['node'],
+                         shard['hashes'].get(rel_path)))
+            removed.update(base_notes.keys() - shard['notes'].keys())
+            for key, entry in shard['sources'].items():
+                if entry != base_sources.get(key):
+                    sources[key] = entry
+            for key in base_sources.keys() - shard['sources'].keys():
+                sources.pop(key, None)
+        
+        notes = {rel_path: entry for rel_path, entry in base_notes.items()
+                 if rel_path not in removed}
+        turns = {rel_path: turn_hash for rel_path, turn_hash in base_turns.items()
+                 if rel_path in notes}
+        
+        # Same path written by several nodes: the file on disk decides.
+        # Nodes that only listed a note another node wrote have no hash for it.
+        origins: Dict[str, Tuple[int, Optional[str]]] = {}
+        collisions = 0
+        for rel_path, options in candidates.items():
+            if len({option[0][0] for option in options}) > 1:
+                collisions += 1
+            notes.pop(rel_path, None)
+            turns.pop(rel_path, None)
+            try:
+                stat = (self.output_dir / rel_path).stat()
+            except OSError:
+                continue
+            options.sort(key=lambda option: option[3] is None)
+            for entry, turn_hash, node, content_hash in options:
+                if entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+                    notes[rel_path] = entry
+                    if turn_hash is not None:
+                        turns[rel_path] = turn_hash
+                    origins[rel_path] = (node, content_hash)
+                    break
+            # No match: left out, so the next run re-reads the note
+        
+        # Same content written by several nodes: keep the note of the first source
+        first_source: Dict[str, str] = {}
+        for key, entry in sources.items():
+            rel_path = entry[2]
+            if rel_path is not None and (rel_path not in first_source
+                                         or key < first_source[rel_path]):
+                first_source[rel_path] = key
+        by_hash: Dict[str, List[str]] = {}
+        for rel_path, (node, content_hash) in origins.items():
+            if content_hash is not None:
+                by_hash.setdefault(content_hash, []).append(rel_path)
+        redirects: Dict[str, str] = {}
+        for rel_paths in by_hash.values():
+            if len({origins[rel_path][0] for rel_path in rel_paths}) < 2:
+                continue
+            keep = min(rel_paths, key=lambda rel_path: (
+                first_source.get(rel_path, '\uffff'), rel_path))
+            for rel_path in rel_paths:
+                if origins[rel_path][0] != origins[keep][0]:
+                    redirects[rel_path] = keep
+        
+        for rel_path, keep in sorted(redirects.items()):
+            print(f"   🔁 {rel_path} duplicates {keep}")
+            notes.pop(rel_path)
+            turns.pop(rel_path, None)
+            if not dry_run:
+                try:
+                    (self.output_dir / rel_path).unlink()
+                except FileNotFoundError:
+                    pass
+        for key, entry in sources.items():
+            if entry[2] in redirects:
+                keep = redirects[entry[2]]
+                sources[key] = [entry[0], entry[1], keep, notes[keep][0], False]
+        
+        counts = {'shards': len(shards), 'notes': len(origins) - len(redirects),
+                  'removed': len(base_notes.keys() - notes.keys()),
+                  'collisions': collisions, 'duplicates': len(redirects)}
+        if dry_run:
+            return counts
+        
+        self.note_index = NoteIndex()
+        self.note_index.load((rel_path, entry, turns.get(rel_path))
+                             for rel_path, entry in notes.items())
+        self.source_manifest = sources
+        self.layout = shards[0]['layout']
+        self._index_dirty = self._manifest_dirty = True
+        self.save_index()
+        if self._index_dirty or self._manifest_dirty:
+            raise ValueError("Could not save the merged index; shard manifests kept")
+        for shard in shards:
+            shard['path'].unlink()
+        try:
+            (self.output_dir / self.SHARD_DIRNAME).rmdir()
+        except OSError:
+            pass
+        
+        self.open_note_views()
+        return counts
+    
+    def write_json_atomic(self, path: Path, data: dict) -> bool:
+        """Replace a JSON state file in one step so it is never half-written.
+        
+        Values may be iterators of (key, value) pairs (see ``json_chunks``).
+        """
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for chunk in json_chunks(data):
+                    f.write(chunk)
+                if self.fsync_batch:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            if self.fsync_batch:
+                fsync_directory(path.parent)
+            return True
+        except OSError as e:
+            print(f"⚠️  Could not save {path.name}: {e}")
+            return False
+    
+    def source_key(self, filepath: Path) -> str:
+        """Manifest key for a source file (absolute path, no symlink lookups)."""
+        if isinstance(filepath, MemorySource):
+            return filepath.key
+        return os.path.abspath(filepath)
+    
+    def source_unchanged(self, filepath: Path) -> bool:
+        """True if a source has the size and mtime recorded in the manifest.
+        
+        Only a stat call is needed; the note it produced (or was
+        deduplicated into) must still be as the source left it (see
+        ``source_note``).
+        """
+        entry = self.source_manifest.get(self.source_key(filepath))
+        if entry is None:
+            return False
+        try:
+            stat = filepath.stat()
+        except OSError:
+            return False
+        return (entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns
+                and self.source_note(entry) is not None)
+    
+    def source_note(self, entry: list) -> Optional[bool]:
+        """Whether the source of a manifest entry owns its note.
+        
+        True if the source wrote the note, False if it was deduplicated
+        into it, and None once the note is gone or was rewritten since (a
+        changed source replaced it in place, or another export grew it):
+        the source has to be read again then. Entries saved before the
+        manifest kept the digest count as owners of the note as it is.
+        """
+        if entry[2] not in self.note_index:
+            return None
+        if len(entry) == 3:
+            return True
+        if self.note_index.digest(entry[2]) != entry[3]:
+            return None
+        return entry[4]
+    
+    def record_source(self, filepath: Path, prepared: dict, note_path: Path,
+                      owner: bool = False):
+        """Remember which note a source produced (``owner``) or was deduplicated into."""
+        rel_path = note_path.relative_to(self.output_dir).as_posix()
+        self.source_manifest[self.source_key(filepath)] = [
+            prepared['size'], prepared['mtime_ns'], rel_path,
+            self.note_index.digest(rel_path), owner]
+        self._manifest_dirty = True
+    
+    def retire_note(self, note_path: Path, unlink: bool = True):
+        """Delete a note superseded by a re-converted source."""
+        rel_path = note_path.relative_to(self.output_dir).as_posix()
+        self.forget_hashes(rel_path, note_path)
+        self.set_turn_hash(rel_path, note_path, None)
+        self.note_index.pop(rel_path, None)
+        self._index_dirty = True
+        if self.near_index is not None:
+            self.near_index.remove(rel_path)
+        for view in self.note_views():
+            view.remove(rel_path)
+        with self._sync_lock:
+            tmp_path = self._unsynced.pop(note_path, None)
+        if tmp_path is not None:
+            tmp_path.unlink()
+        if not unlink:
+            return
+        try:
+            note_path.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def forget_hashes(self, rel_path: str, note_path: Path):
+        """Stop deduplicating into a note that is about to be rewritten or deleted.
+        
+        A note is found by its digest from the index file and, if it was
+        written this run, by the content hash of the source it came from.
+        """
+        for digest in (self.note_index.digest(rel_path), self.note_hashes.pop(rel_path, None)):
+            if digest and self.existing_hashes.get(digest) == note_path:
+                del self.existing_hashes[digest]
+    
+    def record_note(self, note_path: Path, content,
+                    signature: Optional[str] = None, stat=None,
+                    turn_hash: Optional[str] = None):
+        """Add a freshly written note (text or ``NoteStream``) to the persistent index."""
+        if stat is None:
+            stat = note_path.stat()
+        rel_path = note_path.relative_to(self.output_dir).as_posix()
+        streamed = isinstance(content, NoteStream)
+        if streamed:
+            # Worked out while the body went by (see StreamedBody)
+            body = content.body
+            entry = [body.digest, stat.st_size, stat.st_mtime_ns]
+            signature = body.signature
+            turn_hash = self.chain_marks(body.chain)
+        else:
+            entry = [self.note_digest(content), stat.st_size, stat.st_mtime_ns]
+        if self.near_index is not None:
+            if signature is None and not streamed:
+                signature = self.note_signature(content)
+            entry.append(signature)
+            if signature:
+                self.near_index.add(rel_path, NearDuplicateIndex.decode(signature))
+            else:
+                self.near_index.remove(rel_path)
+        self.note_index[rel_path] = entry
+        self._index_dirty = True
+        if entry[0] and turn_hash is None:
+            turn_hash = self.note_turn_hash(content)
+        self.set_turn_hash(rel_path, note_path, turn_hash if entry[0] else None)
+        if self.search_index is not None or self.hub_index is not None:
+            if entry[0]:
+                self.index_note(rel_path, content, stat.st_size, stat.st_mtime_ns)
+            else:
+                for view in self.note_views():
+                    view.remove(rel_path)
+    
+    def set_turn_hash(self, rel_path: str, note_path: Path, turn_hash: Optional[str]):
+        """Point a note's ``chain_marks`` at it (``None`` forgets the note).
+        
+        The note must be in the note index, which keeps the marks.
+        """
+        old = self.note_index.marks(rel_path)
+        if old:
+            for index, key in zip((self.turn_heads, self.turn_anchors), self.split_marks(old)):
+                if key and index.get(key) == note_path:
+                    del index[key]
+        self.note_index.set_marks(rel_path, turn_hash)
+        if turn_hash is not None:
+            if turn_hash:
+                last, anchor = self.split_marks(turn_hash)
+                self.turn_heads[last] = note_path
+                if anchor:
+                    self.turn_anchors[anchor] = note_path
+    
+    def turn_chain(self, content: str) -> List[Tuple[str, int]]:
+        """Rolling hashes over a note's conversation, one per user turn.
+        
+        A turn runs from one user marker to the next and is hashed without
+        its surrounding whitespace (the renderer already collapses blank
+        lines, and the last turn of a shorter export is followed by nothing
+        rather than the next turn). Entry ``k`` covers turns ``0..k`` and carries
+        the number of characters they hold, so a longer export of the same
+        conversation repeats the shorter one's chain as a prefix. Text
+        before the first user turn is left out: exports of the same thread
+        may differ in their header.
+        """
+        body = self.note_body(content)
+        if body is None:
+            return []
+        starts = [match.start() for match in self.USER_TURN_LINE.finditer(body)]
+        chain = []
+        digest = b''
+        chars = 0
+        for start, end in zip(starts, starts[1:] + [len(body)]):
+            text = body[start:end].strip()
+            digest = hashlib.sha256(digest + text.encode('utf-8')).digest()
+            chars += len(text)
+            chain.append((digest.hex()[:16], chars))
+        return chain
+    
+    def chain_marks(self, chain: List[Tuple[str, int]]) -> str:
+        """What the index keeps of a turn chain: its last hash, then its anchor.
+        
+        The anchor is the first hash covering ``GROWN_MIN_CHARS``; every
+        export of a conversation long enough to compare shares it, so it
+        finds a longer note from a shorter export (see ``find_longer_note``).
+        Notes shorter than that have no anchor; '' without user turns.
+        """
+        if not chain:
+            return ''
+        anchor = next((turn_hash for turn_hash, chars in chain
+                       if chars >= self.GROWN_MIN_CHARS), '')
+        return chain[-1][0] + anchor
+    
+    def split_marks(self, marks: str) -> Tuple[str, str]:
+        """The last hash and the anchor ('' if none) of ``chain_marks``."""
+        return marks[:self.TURN_HASH_CHARS], marks[self.TURN_HASH_CHARS:]
+    
+    def note_turn_hash(self, content: str) -> str:
+        """The ``chain_marks`` of a note's turn chain ('' without user turns)."""
+        return self.chain_marks(self.turn_chain(content))
+    
+    def find_grown_note(self, chain: List[Tuple[str, int]]) -> Optional[Tuple[Path, int]]:
+        """Find the note whose whole conversation this chain strictly extends.
+        
+        Each proper prefix of the chain is one lookup in ``turn_heads``;
+        the longest match wins. Returns the note and its number of turns.
+        """
+        for k in range(len(chain) - 2, -1, -1):
+            turn_hash, chars = chain[k]
+            if chars < self.GROWN_MIN_CHARS:
+                break
+            note_path = self.turn_heads.get(turn_hash)
+            if note_path is not None:
+                return note_path, k + 1
+        return None
+    
+    def find_longer_note(self, chain: List[Tuple[str, int]]) -> Optional[Tuple[Path, int]]:
+        """Find the note whose conversation strictly extends this chain.
+        
+        The reverse of ``find_grown_note``, for a stale export seen after
+        the longer one: the chain's anchor leads to the one candidate note,
+        whose chain must repeat this one as a proper prefix. Only the
+        candidate is read. Returns the note and its number of turns.
+        """
+        if not chain or chain[-1][1] < self.GROWN_MIN_CHARS:
+            return None
+        anchor = self.split_marks(self.chain_marks(chain))[1]
+        note_path = self.turn_anchors.get(anchor)
+        if note_path is None:
+            return None
+        # The candidate may still be queued, or written but not yet synced
+        while note_path in self._pending_paths:
+            self.complete_write()
+        with self._sync_lock:
+            read_path = self._unsynced.get(note_path, note_path)
+        try:
+            longer = self.turn_chain(read_path.read_text(encoding='utf-8'))
+        except (OSError, UnicodeDecodeError):
+            return None
+        if len(longer) > len(chain) and longer[len(chain) - 1][0] == chain[-1][0]:
+            return note_path, len(longer)
+        return None
+    
+    def open_note_views(self, search_index: Optional[bool] = None,
+                        hubs: Optional[bool] = None):
+        """Open the search index and hub pages (created if asked, kept if present)."""
+        search_path = self.output_dir / self.SEARCH_FILENAME
+        if search_index or (search_index is None and search_path.exists()):
+            self.search_index = SearchIndex(search_path, durable=bool(self.fsync_batch))
+        hub_state = self.output_dir / self.HUB_STATE_FILENAME
+        if hubs or (hubs is None and hub_state.exists()):
+            self.hub_index = HubIndex(hub_state, self.output_dir / self.HUB_DIRNAME,
+                                      self.taxonomy, durable=bool(self.fsync_batch))
+        if self.note_views():
+            self.sync_note_views()
+    
+    def note_views(self) -> list:
+        """The open views derived from the notes: search index and hub pages."""
+        return [view for view in (self.search_index, self.hub_index) if view is not None]
+    
+    def sync_note_views(self):
+        """Bring the search index and hub pages in line with the note index.
+        
+        Only notes added, changed (by size or mtime) or removed since the
+        last run are touched, and each is read once for all views; pages
+        that are not converted conversations (no digest) are left out.
+        """
+        views = self.note_views()
+        pending = [view.entries() for view in views]
+        updated = [0] * len(views)
+        for rel_path, entry in self.note_index.items():
+            stale = []
+            for view, indexed in zip(views, pending):
+                current = indexed.pop(rel_path, None)
+                if not entry[0]:
+                    if current is not None:
+                        view.remove(rel_path)
+                elif current != (entry[1], entry[2]):
+                    stale.append(view)
+            if not stale:
+                continue
+            try:
+                content = (self.output_dir / rel_path).read_text(encoding='utf-8')
+            except (OSError, UnicodeDecodeError):
+                continue
+            self.index_note(rel_path, content, entry[1], entry[2], stale)
+            for view in stale:
+                updated[views.index(view)] += 1
+        for view, indexed, count in zip(views, pending, updated):
+            for rel_path in indexed:
+                view.remove(rel_path)
+            view.commit()
+            if count or indexed:
+                label = "🔎 Search index" if view is self.search_index else "🗂️  Hub pages"
+                print(f"{label}: {count} notes indexed, {len(indexed)} removed")
+    
+    def index_note(self, rel_path: str, content: str, size: int, mtime_ns: int,
+                   views: Optional[list] = None):
+        """Add or refresh one note in the search index and hub pages."""
+        fields = self.note_fields(content)
+        for view in self.note_views() if views is None else views:
+            view.add(rel_path, fields, size, mtime_ns)
+    
+    def note_fields(self, content) -> dict:
+        """Searchable fields of a note, read back from its frontmatter and body."""
+        if isinstance(content, NoteStream):
+            # Frontmatter and links come with the header and footer; the
+            # conversation only as far as StreamedBody kept it
+            fields = self.note_fields(content.header + content.footer)
+            fields['body'] = content.body.text
+            return fields
+        fields = {'title': '', 'date': '', 'domains': [], 'activity': '', 'topics': [],
+                  'body': self.note_body(content) or ''}
+        end = content.find('\n---', 4) if content.startswith('---\n') else -1
+        source = None
+        tags = []
+        for line in content[4:end].splitlines() if end != -1 else ():
+            if line.startswith('title: "'):
+                fields['title'] = line[8:-1]
+            elif line.startswith('created: "'):
+                fields['date'] = line[10:-1]
+            elif line.startswith('source: "'):
+                source = line[9:-1]
+            elif line.startswith('  - activity/'):
+                fields['activity'] = line[13:]
+            elif line.startswith('  - '):
+                tags.append(line[4:])
+        # Domain tags are the ones without a namespace, besides the fixed two
+        fields['domains'] = [tag for tag in tags
+                             if '/' not in tag and tag not in ('conversation', source)]
+        related = content.rfind('## Related Topics\n')
+        if related != -1:
+            pages = set(self.taxonomy.pages.values())
+            for line in content[related:].splitlines():
+                if line.startswith('- [[') and line.endswith(']]') and line[4:-2] not in pages:
+                    fields['topics'].append(line[4:-2])
+        return fields
+    
+    def note_body(self, content: str) -> Optional[str]:
+        """A note's conversation, from its heading up to the Related Topics block."""
+        start = content.find(ConversationDocument.SECTION_MARKER)
+        if start == -1:
+            return None
+        start += len(ConversationDocument.SECTION_MARKER)
+        end = content.rfind('\n\n---\n\n## Related Topics')
+        return content[start:end] if end >= start else content[start:]
+    
+    def note_signature(self, content: str) -> Optional[str]:
+        """Encoded MinHash signature of a note's whole conversation body.
+        
+        Unlike the digest, this does not stop at the first ``---`` rule
+        inside the conversation; it runs up to the Related Topics block.
+        """
+        body = self.note_body(content)
+        if body is None:
+            return None
+        signature = NearDuplicateIndex.signature(body)
+        return NearDuplicateIndex.encode(signature) if signature else None
+    
+    def note_digest(self, content: str) -> Optional[str]:
+        """Hash the conversation section of a note (frontmatter is skipped)."""
+        section = self.conversation_section(content)
+        if section is not None:
+            return self.hash_content(section)
+        return None
     
     def hash_content(self, content: str) -> str:
         """Generate SHA256 hash of content for deduplication."""
         return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
     
-    def detect_source_type(self, content: str) -> str:
+    def parse(self, content: str) -> ConversationDocument:
+        """Tokenize a conversation once for all extractors."""
+        return ConversationDocument(content)
+    
+    def parse_stream(self, filepath: Path) -> StreamedDocument:
+        """Summarize a large conversation file in one pass (see ``StreamedDocument``)."""
+        return StreamedDocument(filepath, self.taxonomy.matcher(), self.streamed_body())
+    
+    def streamed_body(self) -> StreamedBody:
+        return StreamedBody(self.USER_TURN_LINE, self.near_index is not None,
+                            self.STREAM_INDEXED_CHARS)
+    
+    def detect_source_type(self, content: str,
+                           doc: Optional[ConversationDocument] = None) -> str:
         """Detect if conversation is from Perplexity, VS Code, or other."""
-        if 'perplexity' in content.lower()[:500]:
+        if doc is None:
+            doc = self.parse(content)
+        if 'perplexity' in doc.lower[:500]:
             return 'perplexity'
-        elif 'github copilot' in content.lower()[:500]:
+        elif 'github copilot' in doc.lower[:500]:
             return 'vscode_copilot'
-        elif '```json' in content and 'conversation' in content.lower():
+        elif isinstance(doc, StreamedDocument):
+            return 'vscode_export' if doc.json_fence and doc.mentions_conversation else 'general'
+        elif '```json' in content and 'conversation' in doc.lower:
             return 'vscode_export'
         else:
             return 'general'
     
-    def extract_title(self, content: str) -> str:
+    def extract_title(self, content: str,
+                      doc: Optional[ConversationDocument] = None) -> str:
         """Extract or infer title from conversation."""
-        lines = content.split('\n')
+        if doc is None:
+            doc = self.parse(content)
         
         # Look for first heading
-        for line in lines[:20]:
-            if line.startswith('# '):
-                title = line[2:].strip()
-                if title.lower() not in ['chat session', 'conversation', 'untitled']:
-                    return title
-            elif line.startswith('## '):
-                title = line[3:].strip()
+        for line_no, level, text in doc.headings:
+            if line_no >= 20:
+                break
+            if level in (1, 2):
+                title = text.strip()
                 if title.lower() not in ['chat session', 'conversation', 'untitled']:
                     return title
         
         # Look for question patterns (first substantial user question)
         user_questions = []
-        for match in re.finditer(r'^(?:User|Q|Question):\s*(.+?)(?:\n|$)', 
-                                content, re.MULTILINE | re.IGNORECASE):
-            question = match.group(1).strip()
+        for question in doc.user_questions():
             # Skip meta questions
             if len(question) > 20 and not any(skip in question.lower() 
                                              for skip in ['how are you', 'hello', 'hi ', 'test']):
@@ -139,7 +1203,7 @@ class ConversationConverter:
             return title[:80] + ('...' if len(title) > 80 else '')
         
         # Use first substantial line
-        for line in lines[:30]:
+        for line in doc.lines[:30]:
             line = line.strip()
             if (len(line) > 20 and 
                 not line.startswith(('---', '```', '>', '#', 'Date:', 'Source:')) and
@@ -148,25 +1212,15 @@ class ConversationConverter:
         
         return "Conversation"
     
-    def extract_date(self, filepath: Path, content: str) -> str:
+    def extract_date(self, filepath: Path, content: str,
+                     doc: Optional[ConversationDocument] = None) -> str:
         """Extract conversation date from content or filename."""
-        # Try to find date in content
-        date_patterns = [
-            r'(\d{4}-\d{2}-\d{2})',  # YYYY-MM-DD
-            r'(\d{1,2}/\d{1,2}/\d{4})',  # MM/DD/YYYY
-            r'(January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}'
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, content[:500])
-            if match:
-                date_str = match.group(1)
-                try:
-                    # Try to parse and normalize
-                    if '-' in date_str:
-                        return date_str
-                except:
-                    pass
+        if doc is None:
+            doc = self.parse(content)
+        
+        # Try to find date in content (first YYYY-MM-DD near the top)
+        if doc.date:
+            return doc.date
         
         # Try filename
         filename_date = re.search(r'(\d{4}-\d{2}-\d{2})', filepath.name)
@@ -177,61 +1231,52 @@ class ConversationConverter:
         mtime = filepath.stat().st_mtime
         return datetime.fromtimestamp(mtime).strftime('%Y-%m-%d')
     
-    def classify_domains(self, content: str) -> List[str]:
+    @classmethod
+    def default_taxonomy(cls) -> Taxonomy:
+        """Return the taxonomy built from this class's keyword constants, once."""
+        taxonomy = cls.__dict__.get('_default_taxonomy')
+        if taxonomy is None:
+            topics = [(name, tuple(required), tuple(options))
+                      for name, required, options in cls.TOPIC_FRAMEWORKS]
+            topics.extend((tool.title(), (), (tool,)) for tool in cls.TOPIC_TOOLS)
+            taxonomy = Taxonomy({domain: list(keywords) for domain, keywords
+                                 in cls.DOMAIN_KEYWORDS.items()},
+                                {activity: list(keywords) for activity, keywords
+                                 in cls.ACTIVITY_KEYWORDS.items()},
+                                topics, dict(cls.DOMAIN_PAGES))
+            cls._default_taxonomy = taxonomy
+        return taxonomy
+    
+    def scan_keywords(self, content: str,
+                      doc: Optional[ConversationDocument] = None) -> KeywordHits:
+        """Find the domain, activity and topic keywords (see ``KeywordHits``)."""
+        lower = doc.lower if doc is not None else content.lower()
+        return self.taxonomy.matcher().scan(lower)
+    
+    def score_domains(self, hits: Mapping[str, List[int]]) -> Dict[str, int]:
+        """Count keyword occurrences per domain (for frequency weighting)."""
+        return self.taxonomy.domain_scores(hits)
+    
+    def classify_domains(self, content: str,
+                         hits: Optional[Mapping[str, List[int]]] = None) -> List[str]:
         """Classify conversation into relevant domains."""
-        content_lower = content.lower()
-        matched_domains = []
-        
-        for domain, keywords in self.DOMAIN_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in content_lower:
-                    matched_domains.append(domain)
-                    break
-        
-        return matched_domains if matched_domains else ['general']
+        if hits is None:
+            hits = self.scan_keywords(content)
+        return self.taxonomy.classify_domains(hits)
     
-    def classify_activity(self, content: str) -> str:
+    def classify_activity(self, content: str,
+                          hits: Optional[Mapping[str, List[int]]] = None) -> str:
         """Classify the type of activity/conversation."""
-        content_lower = content.lower()
-        
-        for activity, keywords in self.ACTIVITY_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in content_lower:
-                    return activity
-        
-        return 'reference'
+        if hits is None:
+            hits = self.scan_keywords(content)
+        return self.taxonomy.classify_activity(hits)
     
-    def extract_key_topics(self, content: str) -> List[str]:
-        """Extract key topics/concepts from conversation."""
-        topics = []
-        content_lower = content.lower()
-        
-        # Check for specific frameworks/tools
-        if 'nist' in content_lower:
-            if 'rmf' in content_lower:
-                topics.append('NIST-RMF')
-            if '800-53' in content_lower:
-                topics.append('NIST-800-53')
-            if 'csf' in content_lower or 'cybersecurity framework' in content_lower:
-                topics.append('NIST-CSF')
-        
-        if 'mitre' in content_lower or 'att&ck' in content_lower:
-            topics.append('MITRE ATT&CK')
-        
-        if 'cvss' in content_lower:
-            topics.append('CVSS')
-        
-        if 'iso 27001' in content_lower or 'iso27001' in content_lower:
-            topics.append('ISO 27001')
-        
-        # Check for tools
-        tools = ['wireshark', 'nmap', 'splunk', 'metasploit', 'burp suite',
-                'snort', 'suricata', 'zeek', 'elk', 'siem']
-        for tool in tools:
-            if tool in content_lower:
-                topics.append(tool.title())
-        
-        return topics
+    def extract_key_topics(self, content: str,
+                           hits: Optional[Mapping[str, List[int]]] = None) -> List[str]:
+        """Extract key topics/concepts (frameworks and tools) from conversation."""
+        if hits is None:
+            hits = self.scan_keywords(content)
+        return self.taxonomy.match_topics(hits)
     
     def generate_tags(self, domains: List[str], activity: str, 
                      source_type: str) -> List[str]:
@@ -255,22 +1300,10 @@ class ConversationConverter:
         links = []
         
         # Link to domain pages
-        domain_map = {
-            'grc': '[[Governance, Risk, and Compliance]]',
-            'risk-management': '[[Risk Management]]',
-            'threat-intelligence': '[[Threat Intelligence and Hunting]]',
-            'security-operations': '[[Security Operations]]',
-            'network-security': '[[Network Security]]',
-            'cryptography': '[[Cryptography]]',
-            'application-security': '[[Application Security]]',
-            'cloud-security': '[[Cloud Security]]',
-            'iam': '[[Identity and Access Management (IAM)]]',
-            'career': '[[Career Development]]'
-        }
-        
+        pages = self.taxonomy.pages
         for domain in domains:
-            if domain in domain_map:
-                links.append(domain_map[domain])
+            if domain in pages:
+                links.append(f'[[{pages[domain]}]]')
         
         # Link to specific topics
         for topic in topics:
@@ -278,25 +1311,22 @@ class ConversationConverter:
         
         return links
     
-    def clean_content(self, content: str) -> str:
-        """Clean and format conversation content."""
-        # Remove multiple blank lines
-        content = re.sub(r'\n{3,}', '\n\n', content)
+    def clean_content(self, content: str,
+                      doc: Optional[ConversationDocument] = None) -> str:
+        """Clean and format conversation content.
         
-        # Clean up conversation markers
-        content = re.sub(r'^(User|Assistant|Q|A):\s*', r'**\1**: ', 
-                        content, flags=re.MULTILINE)
-        
-        # Preserve code blocks
-        # (already in markdown format, no changes needed)
-        
-        return content.strip()
+        Runs of blank lines collapse to one and ``User:``/``Assistant:``/
+        ``Q:``/``A:`` markers become bold; code blocks are left as they are.
+        """
+        if doc is None:
+            doc = self.parse(content)
+        return ''.join(doc.clean_lines()).strip()
     
     def generate_frontmatter(self, title: str, date: str, domains: List[str],
                             tags: List[str], source_type: str,
                             source_file: str) -> str:
         """Generate YAML frontmatter."""
-        primary_domain = domains[0] if domains else 'general'
+        primary_domain = domains[0] if domains else self.taxonomy.default_domain
         
         frontmatter = f"""---
 title: "{title}"
@@ -313,77 +1343,115 @@ tags:
         frontmatter += 'status: "converted"\n---\n'
         return frontmatter
     
-    def convert_file(self, filepath: Path, dry_run: bool = False, 
-                    skip_existing: bool = True, force: bool = False) -> bool:
-        """Convert a single conversation file."""
-        print(f"\n📄 Processing: {filepath.name}")
+    def conversation_section(self, content: str) -> Optional[str]:
+        """Return the text under a ``## Conversation`` heading, if present."""
+        return ConversationDocument.find_section(content)
+    
+    def conversation_hash(self, content: str,
+                          doc: Optional[ConversationDocument] = None) -> str:
+        """Hash the conversation section of a source, or all of it if absent."""
+        section = doc.section if doc is not None else self.conversation_section(content)
+        return self.hash_content(section if section is not None else content)
+    
+    def read_source(self, filepath: Path) -> Tuple[Optional[str], int, int]:
+        """Return a source's text, size and mtime (ns).
+        
+        The text is None for a file over the stream threshold, which
+        ``read_file`` reads line by line instead.
+        """
+        stat = filepath.stat()
+        if isinstance(filepath, Path) and stat.st_size > self.stream_threshold:
+            return None, stat.st_size, stat.st_mtime_ns
+        return filepath.read_text(encoding='utf-8'), stat.st_size, stat.st_mtime_ns
+    
+    def read_file(self, filepath: Path,
+                  source: Optional[Tuple[Optional[str], int, int]] = None) -> dict:
+        """Read and tokenize a source file and hash its conversation content.
         
+        ``source`` is a ``read_source`` result that was already fetched.
+        """
+        start = time.perf_counter()
         try:
-            content = filepath.read_text(encoding='utf-8')
+            content, size, mtime_ns = source or self.read_source(filepath)
+            if content is None:
+                doc = self.parse_stream(filepath)
         except Exception as e:
-            print(f"   ❌ Error reading file: {e}")
-            self.failed.append(str(filepath))
-            return False
-        
-        # Check for duplicate content
-        conv_match = re.search(r'## Conversation\n\n(.+?)(?:\n---|\Z)', 
-                              content, re.DOTALL)
-        if conv_match:
-            content_hash = self.hash_content(conv_match.group(1))
+            return {'error': str(e), 'seconds': time.perf_counter() - start}
+        if content is None:
+            content_hash = doc.content_hash
         else:
-            content_hash = self.hash_content(content)
+            doc = self.parse(content)
+            content_hash = self.conversation_hash(content, doc)
+        return {'doc': doc, 'content_hash': content_hash,
+                'size': size, 'mtime_ns': mtime_ns,
+                'seconds': time.perf_counter() - start}
+    
+    def render_note(self, filepath: Path, doc: ConversationDocument) -> dict:
+        """Extract metadata from a parsed conversation and render its note.
         
-        if content_hash in self.existing_hashes and not force:
-            existing_file = self.existing_hashes[content_hash]
-            print(f"   ⏭️  Duplicate content exists: {existing_file.name}")
-            self.duplicates.append((str(filepath), str(existing_file)))
-            return False
+        For a ``StreamedDocument`` the ``output`` is a ``NoteStream``, whose
+        conversation is only rendered while it is written.
+        """
+        content = doc.text
+        streamed = isinstance(doc, StreamedDocument)
         
-        # Detect source type
-        source_type = self.detect_source_type(content)
-        print(f"   🔍 Source: {source_type}")
+        # Detect source type (unless the input already knows it)
+        source_type = (getattr(filepath, 'source_type', None)
+                       or self.detect_source_type(content, doc))
         
         # Extract metadata
-        title = self.extract_title(content)
-        date = self.extract_date(filepath, content)
-        domains = self.classify_domains(content)
-        activity = self.classify_activity(content)
-        topics = self.extract_key_topics(content)
+        title = self.extract_title(content, doc)
+        date = self.extract_date(filepath, content, doc)
+        hits = doc.hits if streamed else self.scan_keywords(content, doc)
+        domains = self.classify_domains(content, hits)
+        activity = self.classify_activity(content, hits)
+        topics = self.extract_key_topics(content, hits)
         tags = self.generate_tags(domains, activity, source_type)
         
-        print(f"   📝 Title: {title}")
-        print(f"   📅 Date: {date}")
-        print(f"   🏷️  Domains: {', '.join(domains)}")
-        print(f"   🎯 Activity: {activity}")
-        if topics:
-            print(f"   📚 Topics: {', '.join(topics)}")
-        
         # Generate output
         frontmatter = self.generate_frontmatter(
             title, date, domains, tags, source_type, filepath.name
         )
         
-        # Clean content
-        clean_content = self.clean_content(content)
-        
         # Add heading and metadata section
-        output = frontmatter + '\n'
-        output += f"# {title}\n\n"
-        output += f"**Date**: {date}  \n"
-        output += f"**Source**: {source_type.replace('_', ' ').title()}  \n\n"
-        output += "---\n\n"
-        output += "## Conversation\n\n"
-        output += clean_content + "\n\n"
-        output += "---\n\n"
-        output += "## Related Topics\n\n"
+        header = frontmatter + '\n'
+        header += f"# {title}\n\n"
+        header += f"**Date**: {date}  \n"
+        header += f"**Source**: {source_type.replace('_', ' ').title()}  \n\n"
+        header += "---\n\n"
+        header += "## Conversation\n\n"
+        
+        footer = "\n\n---\n\n"
+        footer += "## Related Topics\n\n"
         
         # Add related links
         related_links = self.create_related_links(domains, topics)
         for link in related_links:
-            output += f"- {link}\n"
+            footer += f"- {link}\n"
         
-        output += "\n---\n"
-        output += "*Part of [[Core Cybersecurity Domains]] > [[Knowledge Base]]*\n"
+        footer += "\n---\n"
+        footer += "*Part of [[Core Cybersecurity Domains]] > [[Knowledge Base]]*\n"
+        
+        if streamed:
+            body = doc.body
+            marker = ConversationDocument.SECTION_MARKER
+            start = header.find(marker) + len(marker)
+            if start < len(header):
+                # A title ending in "## Conversation" opens the note's section
+                # itself; read the body again behind the rest of the header
+                body = self.streamed_body()
+                body.feed(header[start:])
+                for piece in strip_pieces(doc.clean_lines()):
+                    body.feed(piece)
+                body.close()
+            output = NoteStream(doc, header, footer, body)
+            signature, turns = body.signature, body.chain
+        else:
+            # Clean content
+            output = header + self.clean_content(content, doc) + footer
+            signature = (self.note_signature(output)
+                         if self.near_index is not None else None)
+            turns = self.turn_chain(output)
         
         # Determine output filename with unique hash to avoid conflicts
         safe_title = re.sub(r'[^\w\s-]', '', title.lower())
@@ -393,49 +1461,613 @@ tags:
         source_hash = hashlib.md5(filepath.name.encode()).hexdigest()[:8]
         output_filename = f"{date}_{safe_title}_{source_hash}.md"
         
-        # Keep all conversations in single directory (use tags for organization)
-        output_path = self.output_dir / output_filename
+        return {
+            'source_type': source_type,
+            'title': title,
+            'date': date,
+            'domains': domains,
+            'activity': activity,
+            'topics': topics,
+            'output': output,
+            'filename': output_filename,
+            'signature': signature,
+            'turns': turns,
+        }
+    
+    def prepare_file(self, filepath: Path) -> dict:
+        """Read, hash, classify and render a file without touching any state.
+        
+        This is the part of a conversion that can run in a worker process;
+        ``finish_file`` applies the result in the parent.
+        """
+        prepared = self.read_file(filepath)
+        if 'error' not in prepared:
+            start = time.perf_counter()
+            try:
+                prepared['note'] = self.render_note(filepath, prepared.pop('doc'))
+            except OSError as e:  # a streamed source is read again (see StreamedDocument)
+                prepared['error'] = str(e)
+            prepared['seconds'] += time.perf_counter() - start
+        return prepared
+    
+    def convert_file(self, filepath: Path, dry_run: bool = False, 
+                    skip_existing: bool = True, force: bool = False) -> ConversionResult:
+        """Convert a single conversation file."""
+        if not force and self.source_unchanged(filepath):
+            print(f"\n⏩ Unchanged since last conversion: {filepath.name}")
+            self.unchanged.append(str(filepath))
+            return self.add_result(filepath, 'unchanged')
+        return self.finish_file(filepath, self.read_file(filepath),
+                                dry_run=dry_run, skip_existing=skip_existing,
+                                force=force)
+    
+    def add_result(self, filepath: Path, status: str, path: Optional[Path] = None,
+                   note: Optional[dict] = None, content_hash: Optional[str] = None,
+                   seconds: float = 0.0) -> ConversionResult:
+        """Record the outcome for one source (see ``ConversionResult``)."""
+        note = note or {}
+        result = ConversionResult(
+            str(filepath), status, str(path) if path is not None else None,
+            note.get('title'), note.get('date'), note.get('domains', []),
+            note.get('activity'), note.get('topics', []), content_hash, seconds)
+        self.results.append(result)
+        return result
+    
+    def finish_file(self, filepath: Path, prepared: dict, dry_run: bool = False,
+                    skip_existing: bool = True, force: bool = False) -> ConversionResult:
+        """Deduplicate and write a file read by ``read_file``/``prepare_file``."""
+        start = time.perf_counter()
+        result = self._finish_file(filepath, prepared, dry_run, skip_existing, force)
+        result.seconds = prepared.get('seconds', 0.0) + time.perf_counter() - start
+        return result
+    
+    def _finish_file(self, filepath: Path, prepared: dict, dry_run: bool,
+                     skip_existing: bool, force: bool) -> ConversionResult:
+        print(f"\n📄 Processing: {filepath.name}")
+        
+        if 'error' in prepared:
+            print(f"   ❌ Error reading file: {prepared['error']}")
+            self.failed.append(str(filepath))
+            return self.add_result(filepath, 'failed')
+        
+        # A changed source replaces the note it produced last time, as long
+        # as nothing else has been written to that note since
+        previous = self.source_manifest.get(self.source_key(filepath))
+        previous_note = None
+        if previous and self.source_note(previous):
+            previous_note = self.output_dir / previous[2]
+        
+        # Check for duplicate content
+        content_hash = prepared['content_hash']
+        existing_file = self.existing_hashes.get(content_hash)
+        if existing_file is not None and existing_file != previous_note and not force:
+            print(f"   ⏭️  Duplicate content exists: {existing_file.name}")
+            self.duplicates.append((str(filepath), str(existing_file)))
+            if not dry_run:
+                if previous_note is not None:
+                    self.retire_note(previous_note)
+                self.record_source(filepath, prepared, existing_file)
+            return self.add_result(filepath, 'duplicate', existing_file,
+                                   content_hash=content_hash)
+        
+        note = prepared.get('note')
+        if note is None:
+            try:
+                note = self.render_note(filepath, prepared['doc'])
+            except OSError as e:  # a streamed source is read again (see StreamedDocument)
+                print(f"   ❌ Error reading file: {e}")
+                self.failed.append(str(filepath))
+                return self.add_result(filepath, 'failed', content_hash=content_hash)
+        
+        # A longer export of a conversation we have updates that note in place
+        grown = self.find_grown_note(note['turns']) if not force else None
+        if grown is not None and grown[0] == previous_note:
+            grown = None  # the same source grew: replaced below as usual
+        
+        # An older, shorter export of a conversation we have in full adds nothing.
+        # Only the source that wrote the note may shorten it: once another
+        # export grew it, ``previous_note`` is None (see ``source_note``).
+        longer = (self.find_longer_note(note['turns'])
+                  if not force and grown is None else None)
+        if longer is not None and longer[0] != previous_note:
+            print(f"   ⏭️  Older export ({len(note['turns'])} of {longer[1]} turns): "
+                  f"{longer[0].name}")
+            self.duplicates.append((str(filepath), str(longer[0])))
+            if not dry_run:
+                if previous_note is not None:
+                    self.retire_note(previous_note)
+                self.record_source(filepath, prepared, longer[0])
+            return self.add_result(filepath, 'duplicate', longer[0], note, content_hash)
+        
+        # Check for near-duplicate content (re-exports with small changes)
+        if note['signature'] and not force and grown is None:
+            match = self.near_index.query(NearDuplicateIndex.decode(note['signature']))
+            similar_file = self.output_dir / match[0] if match else None
+            if match and similar_file != previous_note:
+                print(f"   ⏭️  Near-duplicate ({match[1]:.0%} similar): {similar_file.name}")
+                self.near_duplicates.append((str(filepath), str(similar_file), match[1]))
+                if not dry_run:
+                    if previous_note is not None:
+                        self.retire_note(previous_note)
+                    self.record_source(filepath, prepared, similar_file)
+                return self.add_result(filepath, 'near-duplicate', similar_file,
+                                       note, content_hash)
+        
+        print(f"   🔍 Source: {note['source_type']}")
+        print(f"   📝 Title: {note['title']}")
+        print(f"   📅 Date: {note['date']}")
+        print(f"   🏷️  Domains: {', '.join(note['domains'])}")
+        print(f"   🎯 Activity: {note['activity']}")
+        if note['topics']:
+            print(f"   📚 Topics: {', '.join(note['topics'])}")
+        
+        # Flat by default (tags organize the graph), optionally sharded
+        output_path = self.output_dir / self.note_relpath(note['filename'])
+        output = note['output']
+        turn_hash = self.chain_marks(note['turns'])
+        if grown is not None:
+            # Keep the note's name so links to it stay valid
+            output_path = grown[0]
+            print(f"   🌱 Conversation grew ({grown[1]} → {len(note['turns'])} turns): "
+                  f"updating {output_path.name}")
         
         # Check if file already exists
-        if output_path.exists() and skip_existing and not force:
+        if (grown is None and self.note_exists(output_path) and output_path != previous_note
+                and skip_existing and not force):
             print(f"   ⏭️  File already exists: {output_path.name}")
             self.skipped.append(str(output_path))
-            return False
+            if not dry_run:
+                if previous_note is not None:
+                    self.retire_note(previous_note)
+                self.record_source(filepath, prepared, output_path)
+            return self.add_result(filepath, 'skipped', output_path, note, content_hash)
         
         if dry_run:
-            print(f"   🔍 [DRY RUN] Would create: {output_path}")
-            return True
+            action = 'update' if grown is not None else 'create'
+            print(f"   🔍 [DRY RUN] Would {action}: {output_path}")
+            return self.add_result(filepath, 'dry-run', output_path, note, content_hash)
         
-        # Write file
+        # Write file (handed to the writer threads in pipelined mode)
         try:
-            output_path.write_text(output, encoding='utf-8')
-            print(f"   ✅ Created: {output_path}")
-            self.converted.append(str(output_path))
+            # A rewritten note's old conversation no longer exists as such
+            rel_path = output_path.relative_to(self.output_dir).as_posix()
+            self.forget_hashes(rel_path, output_path)
+            if self._writes is None:
+                stat = self.write_note(output_path, output)
+                self.record_note(output_path, output, note['signature'], stat, turn_hash)
+            else:
+                retired = previous_note if previous_note != output_path else None
+                self.queue_write(filepath, output_path, output, note['signature'],
+                                 retired, turn_hash)
+            if grown is not None:
+                print(f"   ✅ Updated: {output_path}")
+                self.grown.append(str(output_path))
+            else:
+                print(f"   ✅ Created: {output_path}")
+                self.converted.append(str(output_path))
             # Add to hash index
             self.existing_hashes[content_hash] = output_path
-            return True
+            self.note_hashes[rel_path] = content_hash
+            self.record_source(filepath, prepared, output_path, owner=True)
+            if previous_note is not None:
+                print(f"   ♻️  Replaces previous note: {previous_note.name}")
+                self.replaced.append(str(previous_note))
+                if previous_note != output_path:
+                    # A queued write deletes the old note itself, once written
+                    self.retire_note(previous_note, unlink=self._writes is None)
+            status = 'grown' if grown is not None else 'converted'
+            return self.add_result(filepath, status, output_path, note, content_hash)
         except Exception as e:
             print(f"   ❌ Error writing file: {e}")
             self.failed.append(str(filepath))
-            return False
+            return self.add_result(filepath, 'failed', None, note, content_hash)
     
-    def convert_directory(self, input_dir: Path, pattern: str = "*.md",
-                         recursive: bool = True, dry_run: bool = False,
-                         skip_existing: bool = True, force: bool = False):
-        """Convert all matching files in directory."""
-        print(f"\n🔍 Scanning: {input_dir}")
+    @staticmethod
+    def temp_note_path(output_path: Path) -> Path:
+        return output_path.with_name(f".{output_path.name[:-3]}.tmp.md")
+    
+    @staticmethod
+    def is_temp_note(path: Path) -> bool:
+        return path.name.startswith('.') and path.name.endswith('.tmp.md')
+    
+    def write_note(self, output_path: Path, output) -> os.stat_result:
+        """Write a note to a temp file and atomically rename it into place.
         
-        # Find files
-        if recursive:
-            files = list(input_dir.rglob(pattern))
-        else:
-            files = list(input_dir.glob(pattern))
+        A killed run therefore never leaves a truncated note under a real
+        name. With ``fsync_batch`` the rename waits for ``sync_notes``, which
+        fsyncs the batch first. Returns the stat of the written file (the
+        rename keeps size and mtime). ``output`` is the note text or a
+        ``NoteStream``, which is rendered into the file piece by piece.
+        """
+        tmp_path = self.temp_note_path(output_path)
+        if output_path.parent not in self._note_dirs:
+            self.make_note_dir(output_path.parent)
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                if isinstance(output, NoteStream):
+                    f.writelines(output.pieces())
+                else:
+                    f.write(output)
+        except Exception:
+            # e.g. a streamed note's source changed while it was rendered
+            tmp_path.unlink(missing_ok=True)
+            raise
+        stat = tmp_path.stat()
+        if not self.fsync_batch:
+            os.replace(tmp_path, output_path)
+            return stat
+        with self._sync_lock:
+            self._unsynced[output_path] = tmp_path
+            full = len(self._unsynced) >= self.fsync_batch
+        if full:
+            self.sync_notes()
+        return stat
+    
+    def sync_notes(self):
+        """Fsync the pending batch of notes, rename them, then fsync their directories."""
+        with self._sync_lock:
+            batch, self._unsynced = self._unsynced, {}
+            if not batch:
+                return
+            synced = []
+            for output_path, tmp_path in batch.items():
+                try:
+                    fd = os.open(tmp_path, os.O_RDONLY)
+                    try:
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+                    os.replace(tmp_path, output_path)
+                    synced.append(output_path)
+                except OSError as e:
+                    print(f"⚠️  Could not sync {output_path.name}: {e}")
+            for directory in {path.parent for path in synced}:
+                fsync_directory(directory)
+    
+    def note_exists(self, output_path: Path) -> bool:
+        """Whether a note exists or is waiting to be written.
+        
+        Answered from the note index (the listing taken by
+        ``build_existing_index`` plus every note written since), so no stat
+        call is made per file.
+        """
+        return output_path.relative_to(self.output_dir).as_posix() in self.note_index
+    
+    def note_relpath(self, filename: str, layout: Optional[str] = None) -> str:
+        """Where a note goes, relative to the output directory.
+        
+        Only names produced by ``render_note`` are sharded; anything else
+        stays where it is in every layout.
+        """
+        layout = layout or self.layout
+        match = self.NOTE_FILENAME.match(filename) if layout != 'flat' else None
+        if match is None:
+            return filename
+        if layout == 'date':
+            return f"{match.group(1)}/{match.group(2)}/{filename}"
+        return f"{match.group(3)[:2]}/{filename}"
+    
+    def make_note_dir(self, directory: Path):
+        """Create a shard directory (and make its entry durable if asked to)."""
+        if not directory.is_dir():
+            directory.mkdir(parents=True, exist_ok=True)
+            if self.fsync_batch:
+                parent = directory
+                while parent != self.output_dir:
+                    parent = parent.parent
+                    fsync_directory(parent)
+        self._note_dirs.add(directory)
+    
+    def migrate_layout(self, layout: str):
+        """Move every note from the current layout to ``layout`` (one-time).
         
-        print(f"📊 Found {len(files)} files matching '{pattern}'")
+        Renames keep size and mtime, so the index entries move along without
+        re-reading any note. Only notes sitting where the current layout
+        puts them are moved; running it again after an interruption picks up
+        the rest once the new layout is recorded.
+        """
+        print(f"🚚 Migrating notes from the {self.layout} to the {layout} layout...")
+        self.sync_notes()
+        moved = 0
+        old_dirs = set()
+        path_changes = {}
+        for rel_path in list(self.note_index):
+            name = PurePosixPath(rel_path).name
+            new_rel = self.note_relpath(name, layout)
+            if new_rel == rel_path or rel_path != self.note_relpath(name):
+                continue
+            old_path = self.output_dir / rel_path
+            new_path = self.output_dir / new_rel
+            if new_rel in self.note_index:
+                print(f"   ⚠️  Not moving {rel_path}: {new_rel} already exists")
+                continue
+            try:
+                if new_path.parent not in self._note_dirs:
+                    self.make_note_dir(new_path.parent)
+                os.replace(old_path, new_path)
+            except OSError as e:
+                print(f"   ⚠️  Could not move {rel_path}: {e}")
+                continue
+            turn_hash = self.note_index.marks(rel_path)
+            self.set_turn_hash(rel_path, old_path, None)
+            entry = self.note_index.pop(rel_path)
+            self.note_index[new_rel] = entry
+            if entry[0] and self.existing_hashes.get(entry[0]) == old_path:
+                self.existing_hashes[entry[0]] = new_path
+            if self.near_index is not None and len(entry) > 3 and entry[3]:
+                self.near_index.remove(rel_path)
+                self.near_index.add(new_rel, NearDuplicateIndex.decode(entry[3]))
+            for view in self.note_views():
+                view.rename(rel_path, new_rel)
+            self.set_turn_hash(new_rel, new_path, turn_hash)
+            path_changes[rel_path] = new_rel
+            old_dirs.add(old_path.parent)
+            moved += 1
+        
+        for entry in self.source_manifest.values():
+            if entry[2] in path_changes:
+                entry[2] = path_changes[entry[2]]
+                self._manifest_dirty = True
+        if self.fsync_batch:
+            for directory in old_dirs | self._note_dirs:
+                fsync_directory(directory)
+        # Drop shard directories the move emptied
+        for directory in sorted(old_dirs, key=lambda d: len(d.parts), reverse=True):
+            while directory != self.output_dir:
+                try:
+                    directory.rmdir()
+                except OSError:
+                    break
+                directory = directory.parent
         
-        if not files:
-            print("⚠️  No files found to convert")
+        self.layout = layout
+        self._index_dirty = True
+        self.save_index()
+        print(f"   ✅ Moved {moved} notes")
+    
+    def queue_write(self, filepath: Path, output_path: Path, output: str,
+                    signature: Optional[str], retired: Optional[Path] = None, turn_hash: Optional[str] = None):
+        """Hand a note to the writer threads (pipelined mode).
+        
+        The in-memory index is updated right away, so later files are
+        deduplicated exactly as in a serial run; the size and mtime are
+        filled in by ``complete_write`` once the note is on disk.
+        """
+        # A second write to the same note must land after the first
+        while output_path in self._pending_paths or len(self._writes) >= self._write_window:
+            self.complete_write()
+        self.record_note(output_path, output, signature,
+                         stat=SimpleNamespace(st_size=0, st_mtime_ns=0), turn_hash=turn_hash)
+        future = self._writer.submit(self.flush_note, output_path, output, retired)
+        self._writes.append((future, filepath, output_path))
+        self._pending_paths.add(output_path)
+    
+    def flush_note(self, output_path: Path, output: str,
+                   retired: Optional[Path] = None):
+        """Write a queued note (writer thread), then delete the note it replaces."""
+        stat = self.write_note(output_path, output)
+        if retired is not None:
+            try:
+                retired.unlink()
+            except FileNotFoundError:
+                pass
+        return stat
+    
+    def complete_write(self):
+        """Wait for the oldest queued write and finish its bookkeeping."""
+        future, filepath, output_path = self._writes.popleft()
+        self._pending_paths.discard(output_path)
+        rel_path = output_path.relative_to(self.output_dir).as_posix()
+        try:
+            stat = future.result()
+        except Exception as e:
+            print(f"\n❌ Error writing file {output_path.name}: {e}")
+            self.failed.append(str(filepath))
+            for written in (self.converted, self.grown):
+                if str(output_path) in written:
+                    written.remove(str(output_path))
+            self.forget_hashes(rel_path, output_path)
+            self.set_turn_hash(rel_path, output_path, None)
+            self.note_index.pop(rel_path, None)
+            if self.near_index is not None:
+                self.near_index.remove(rel_path)
+            for view in self.note_views():
+                view.remove(rel_path)
+            key = self.source_key(filepath)
+            if self.source_manifest.get(key, [None] * 3)[2] == rel_path:
+                del self.source_manifest[key]
+            for result in reversed(self.results):
+                if result.source == str(filepath) and result.status in ('converted', 'grown'):
+                    result.status, result.path = 'failed', None
+                    break
             return
+        if rel_path in self.note_index:
+            self.note_index.set_stat(rel_path, stat.st_size, stat.st_mtime_ns)
+            for view in self.note_views():
+                view.touch(rel_path, stat.st_size, stat.st_mtime_ns)
+    
+    def convert_files_pipelined(self, files: Iterable[Path], io_threads: int,
+                                dry_run: bool = False, skip_existing: bool = True,
+                                force: bool = False):
+        """Overlap source reads and note writes with processing in this thread.
+        
+        A reader pool prefetches sources and a writer pool flushes notes, each
+        bounded to ``io_threads * 4`` files in flight. Parsing, dedup and
+        rendering stay in order on this thread, so the outcome matches a
+        serial run file for file.
+        """
+        window = io_threads * 4
+        pending = deque()
+        with ThreadPoolExecutor(io_threads) as readers, \
+                ThreadPoolExecutor(io_threads) as writers:
+            self._writer, self._writes, self._write_window = writers, deque(), window
+            try:
+                for filepath in files:
+                    pending.append((filepath, readers.submit(self.read_source, filepath)))
+                    if len(pending) >= window:
+                        self.finish_prefetched(*pending.popleft(), dry_run=dry_run,
+                                               skip_existing=skip_existing, force=force)
+                while pending:
+                    self.finish_prefetched(*pending.popleft(), dry_run=dry_run,
+                                           skip_existing=skip_existing, force=force)
+                while self._writes:
+                    self.complete_write()
+            finally:
+                self._writer = self._writes = None
+                self._pending_paths = set()
+    
+    def finish_prefetched(self, filepath: Path, future, dry_run: bool = False,
+                          skip_existing: bool = True, force: bool = False):
+        try:
+            source = future.result()
+        except Exception as e:
+            prepared = {'error': str(e), 'seconds': 0.0}
+        else:
+            prepared = self.read_file(filepath, source)
+        self.finish_file(filepath, prepared, dry_run=dry_run,
+                         skip_existing=skip_existing, force=force)
+        while self._writes and self._writes[0][0].done():
+            self.complete_write()
+    
+    def convert_files_parallel(self, files: Iterable[Path], jobs: int,
+                               dry_run: bool = False, skip_existing: bool = True,
+                               force: bool = False):
+        """Prepare files in worker processes and finish them in input order.
+        
+        Workers only read and render; dedup, skip checks and writes stay in
+        this process, so the outcome matches a serial run file for file.
+        """
+        window = jobs * 4
+        pending = deque()
+        options = {'near_duplicate_threshold':
+                   self.near_index.threshold if self.near_index else None,
+                   'metrics': self.metrics is not None,
+                   'taxonomy': self.taxonomy,
+                   'stream_threshold': self.stream_threshold}
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(type(self), self.output_dir, options)) as executor:
+            for filepath in files:
+                pending.append((filepath, executor.submit(_prepare_in_worker, filepath)))
+                if len(pending) >= window:
+                    done_path, future = pending.popleft()
+                    self.finish_file(done_path, future.result(), dry_run=dry_run,
+                                     skip_existing=skip_existing, force=force)
+            while pending:
+                done_path, future = pending.popleft()
+                self.finish_file(done_path, future.result(), dry_run=dry_run,
+                                 skip_existing=skip_existing, force=force)
+    
+    def changed_sources(self, sources: Iterable[Path],
+                        force: bool = False) -> Iterator[Path]:
+        """Drop sources whose size and mtime match the source manifest.
+        
+        Archive members that are kept get loaded here, while the archive is
+        still positioned on them.
+        """
+        for source in sources:
+            if not force and self.source_unchanged(source):
+                self.unchanged.append(str(source))
+                self.add_result(source, 'unchanged')
+                continue
+            if isinstance(source, MemorySource):
+                source.load()
+            yield source
+    
+    def partition_sources(self, sources: Iterable[Path],
+                          root: Optional[Path] = None) -> Iterator[Path]:
+        """Keep the sources that belong to this node's partition.
+        
+        A source goes to node ``sha256(key) % n + 1``, where the key is its
+        path relative to the input ``root`` (archive members and chat
+        sessions keep their archive/export name and member/session id), so
+        every node computes the same split wherever the input is mounted.
+        """
+        node, count = self.partition
+        base = ''
+        if root is not None:
+            base = os.path.abspath(root if root.is_dir() else root.parent) + os.sep
+        for source in sources:
+            key = self.source_key(source)
+            if base and key.startswith(base):
+                key = key[len(base):]
+            digest = hashlib.sha256(key.replace(os.sep, '/').encode('utf-8')).digest()
+            self._partition_counts[1] += 1
+            if int.from_bytes(digest[:8], 'big') % count == node - 1:
+                self._partition_counts[0] += 1
+                yield source
+    
+    def expand_session_exports(self, sources: Iterable[Path]) -> Iterator[Path]:
+        """Replace VS Code JSON exports with one source per chat session."""
+        for source in sources:
+            if not (isinstance(source, Path) and source.suffix.lower() == '.json'):
+                yield source
+                continue
+            print(f"\n🗂️  Streaming sessions from: {source.name}")
+            try:
+                yield from iter_session_export(source)
+            except (OSError, ValueError) as e:
+                print(f"   ❌ Error reading chat export: {e}")
+                self.failed.append(str(source))
+    
+    def convert_sources(self, sources: Iterable[Path], dry_run: bool = False,
+                        skip_existing: bool = True, force: bool = False,
+                        jobs: int = 1, io_threads: int = 0, root: Optional[Path] = None):
+        """Convert files, archive members or chat sessions in order.
+        
+        On a partitioned run only this node's share is converted; ``root``
+        is the input the sources were found in (see ``partition_sources``).
+        """
+        sources = self.expand_session_exports(sources)
+        if self.partition is not None:
+            sources = self.partition_sources(sources, root)
+        sources = self.changed_sources(sources, force=force)
+        if jobs > 1:
+            self.convert_files_parallel(sources, jobs, dry_run=dry_run,
+                                        skip_existing=skip_existing, force=force)
+        elif io_threads > 0:
+            self.convert_files_pipelined(sources, io_threads, dry_run=dry_run,
+                                         skip_existing=skip_existing, force=force)
+        else:
+            for filepath in sources:
+                self.finish_file(filepath, self.read_file(filepath),
+                                 dry_run=dry_run, skip_existing=skip_existing,
+                                 force=force)
+    
+    def index_memory_bytes(self) -> int:
+        """Approximate memory held by the per-note indexes, in bytes.
+        
+        Covers the note index and the digest, turn and near-duplicate
+        lookups built from it.
+        """
+        indexes = [self.note_index, self.existing_hashes, self.turn_heads, self.turn_anchors]
+        if self.near_index is not None:
+            indexes.append(self.near_index)
+        return sum(index.memory_bytes() for index in indexes)
+    
+    def convert_directory(self, input_dir: Path, pattern: str = "*.md",
+                         recursive: bool = True, dry_run: bool = False,
+                         skip_existing: bool = True, force: bool = False,
+                         jobs: int = 1, io_threads: int = 0):
+        """Convert all matching files in a directory, archive or JSON export."""
+        if is_archive(input_dir):
+            print(f"\n📦 Reading archive: {input_dir}")
+            sources = iter_archive(input_dir, pattern, recursive)
+        elif is_session_export(input_dir):
+            sources = [input_dir]
+        else:
+            print(f"\n🔍 Scanning: {input_dir}")
+            
+            # Find files (sorted, so the first of several duplicates always wins)
+            if recursive:
+                sources = sorted(input_dir.rglob(pattern))
+            else:
+                sources = sorted(input_dir.glob(pattern))
+            
+            print(f"📊 Found {len(sources)} files matching '{pattern}'")
+            
+            if not sources:
+                print("⚠️  No files found to convert")
+                return
         
         if not dry_run:
             print(f"📂 Existing files indexed: {len(self.existing_hashes)}")
@@ -443,37 +2075,47 @@ tags:
                 print("⏭️  Will skip existing files and duplicates")
         
         # Convert each file
-        for filepath in files:
-            self.convert_file(filepath, dry_run=dry_run, 
-                            skip_existing=skip_existing, force=force)
+        try:
+            self.convert_sources(sources, dry_run=dry_run, skip_existing=skip_existing,
+                                 force=force, jobs=jobs, io_threads=io_threads,
+                                 root=input_dir)
+        except (OSError, ValueError, tarfile.TarError, zipfile.BadZipFile) as e:
+            if not is_archive(input_dir):
+                raise
+            print(f"❌ Error reading archive {input_dir.name}: {e}")
+            self.failed.append(str(input_dir))
         
         # Print summary
         print("\n" + "="*60)
         print("📊 Conversion Summary")
         print("="*60)
+        if self.partition is not None:
+            print(f"🧩 Partition {self.partition[0]}/{self.partition[1]}: "
+                  f"{self._partition_counts[0]} of {self._partition_counts[1]} sources")
         print(f"✅ Successfully converted: {len(self.converted)}")
+        if self.unchanged:
+            print(f"⏩ Unchanged (not re-read): {len(self.unchanged)}")
+        if self.replaced:
+            print(f"♻️  Replaced (source changed): {len(self.replaced)}")
+        if self.grown:
+            print(f"🌱 Updated (conversation grew): {len(self.grown)}")
         print(f"⏭️  Skipped (existing): {len(self.skipped)}")
         print(f"🔁 Skipped (duplicate): {len(self.duplicates)}")
+        if self.near_index is not None:
+            print(f"≈  Skipped (near-duplicate): {len(self.near_duplicates)}")
         print(f"❌ Failed: {len(self.failed)}")
         print(f"📁 Output directory: {self.output_dir}")
+        print(f"🧮 Note index: {len(self.note_index)} notes, {len(self.existing_hashes)} digests, "
+              f"{self.index_memory_bytes() / 1_000_000:.1f} MB in memory")
         
         if self.converted:
             print(f"\n✨ Created {len(self.converted)} notes in {self.output_dir.name}/")
-            # Group by domain tags
+            # Group by domain (from the conversion records, not the files)
             by_domain = {}
-            for path in self.converted:
-                # Read frontmatter to get domain tags
-                try:
-                    with open(path, 'r') as f:
-                        content = f.read()
-                        # Extract domain from tags
-                        for domain in ['grc', 'risk-management', 'threat-intelligence', 
-                                     'security-operations', 'network-security', 'cryptography',
-                                     'application-security', 'cloud-security', 'iam', 'career', 'general']:
-                            if f'- {domain}\n' in content:
-                                by_domain[domain] = by_domain.get(domain, 0) + 1
-                except:
-                    pass
+            for result in self.results:
+                if result.status == 'converted':
+                    for domain in result.domains:
+                        by_domain[domain] = by_domain.get(domain, 0) + 1
             
             if by_domain:
                 print("\nBy domain (via tags):")
@@ -486,9 +2128,363 @@ tags:
                 print(f"   • {Path(orig).name} → {Path(existing).name}")
             if len(self.duplicates) > 5:
                 print(f"   ... and {len(self.duplicates) - 5} more")
+        
+        if self.near_duplicates:
+            print(f"\n≈  Near-duplicate content found:")
+            for orig, similar, similarity in self.near_duplicates[:5]:
+                print(f"   • {Path(orig).name} ≈ {Path(similar).name} ({similarity:.0%})")
+            if len(self.near_duplicates) > 5:
+                print(f"   ... and {len(self.near_duplicates) - 5} more")
+        
+        self.save_index()
+        if self.partition is not None and not dry_run:
+            print(f"🧩 Shard manifest: {self.shard_path.relative_to(self.output_dir)} "
+                  f"(run 'merge' once every partition is done)")
+    
+    def watch(self, input_dir: Path, pattern: str = "*.md", recursive: bool = True,
+              dry_run: bool = False, skip_existing: bool = True, force: bool = False,
+              jobs: int = 1, debounce: float = 2.0, poll_interval: float = 5.0,
+              use_inotify: bool = True, io_threads: int = 0):
+        """Keep the index in memory and convert files as they land in ``input_dir``.
+        
+        Files already present are converted first (unchanged ones are skipped
+        via the source manifest). Runs until interrupted (Ctrl+C or SIGTERM);
+        the index is saved on shutdown and every ``WATCH_SAVE_INTERVAL``
+        seconds while there is activity.
+        """
+        watcher = DirectoryWatcher(input_dir, pattern, recursive, debounce,
+                                   poll_interval, use_inotify)
+        print(f"\n👀 Watching: {input_dir} ({watcher.backend}, pattern '{pattern}')")
+        print(f"📂 Existing files indexed: {len(self.existing_hashes)}")
+        print("   Press Ctrl+C to stop")
+        
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+        try:
+            previous_handler = signal.signal(signal.SIGTERM, stop)
+        except ValueError:
+            previous_handler = None  # not in the main thread
+        
+        last_save = time.monotonic()
+        try:
+            for batch in watcher.batches():
+                self.convert_sources(batch, dry_run=dry_run, skip_existing=skip_existing,
+                                     force=force, jobs=jobs if len(batch) > jobs else 1,
+                                     io_threads=io_threads)
+                self.report_batch(len(batch))
+                if time.monotonic() - last_save >= self.WATCH_SAVE_INTERVAL:
+                    self.save_index()
+                    last_save = time.monotonic()
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping watch")
+        finally:
+            if previous_handler is not None:
+                signal.signal(signal.SIGTERM, previous_handler)
+            self.save_index()
+            print("💾 Index saved")
+    
+    def write_report(self, path: Path, fmt: str = 'json'):
+        """Export the per-source conversion records as JSON or CSV."""
+        if fmt == 'csv':
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=ConversionResult.FIELDS)
+                writer.writeheader()
+                for result in self.results:
+                    row = result.as_dict()
+                    row['domains'] = ';'.join(result.domains)
+                    row['topics'] = ';'.join(result.topics)
+                    row['seconds'] = f"{result.seconds:.6f}"
+                    writer.writerow(row)
+        else:
+            counts = {}
+            for result in self.results:
+                counts[result.status] = counts.get(result.status, 0) + 1
+            report = {
+                'version': 1,
+                'output_dir': str(self.output_dir),
+                'counts': counts,
+                'results': [result.as_dict() for result in self.results],
+            }
+            path.write_text(json.dumps(report, indent=2, ensure_ascii=False) + '\n',
+                            encoding='utf-8')
+    
+    def report_batch(self, files: int):
+        """Print a one-line summary of a watch batch and reset the counters."""
+        counts = [(len(self.converted), 'converted'), (len(self.unchanged), 'unchanged'),
+                  (len(self.replaced), 'replaced'), (len(self.grown), 'grown'),
+                  (len(self.skipped), 'skipped'),
+                  (len(self.duplicates), 'duplicate'),
+                  (len(self.near_duplicates), 'near-duplicate'), (len(self.failed), 'failed')]
+        details = ', '.join(f"{count} {label}" for count, label in counts if count)
+        print(f"\n🕒 {datetime.now().strftime('%H:%M:%S')} "
+              f"{files} file(s): {details or 'nothing to do'}")
+        for results in (self.converted, self.unchanged, self.replaced, self.grown, self.skipped,
+                        self.duplicates, self.near_duplicates, self.failed, self.results):
+            results.clear()
+
+
+class ConversionService:
+    """In-memory conversion API for embedding in long-lived services.
+    
+    Takes conversation text plus metadata and returns the rendered note and
+    its metadata as a dict. Nothing is read from or written to disk and
+    nothing is printed. Exact duplicates are detected through
+    ``dedup_index``, any mapping-like object with ``get`` and item
+    assignment (``digest -> note filename``): a ``dict`` by default, or a
+    ``HashIndex`` or a shared store for a service running several
+    processes. One instance can serve any number of requests, from several
+    threads. ``taxonomy`` (see ``Taxonomy.load``) replaces the built-in
+    classification keywords.
+    """
+    
+    def __init__(self, dedup_index=None, near_duplicate_threshold: Optional[float] = None,
+                 converter_cls=None, taxonomy: Optional[Taxonomy] = None):
+        self.converter = (converter_cls or ConversationConverter)(
+            None, near_duplicate_threshold=near_duplicate_threshold, taxonomy=taxonomy)
+        self.dedup_index = {} if dedup_index is None else dedup_index
+        self._lock = threading.Lock()
+    
+    def convert(self, text: str, name: str = 'conversation.md',
+                source_type: Optional[str] = None, mtime: Optional[float] = None,
+                dedup: bool = True) -> dict:
+        """Convert one conversation.
+        
+        ``name`` stands in for the source filename (frontmatter and output
+        filename), ``mtime`` for its modification time (date fallback,
+        default: now) and ``source_type`` skips source detection. The result
+        has ``status`` ``'converted'``, ``'duplicate'`` or
+        ``'near-duplicate'`` (with ``duplicate_of``), the ``content_hash``,
+        and for rendered notes the ``render_note`` fields (``output`` is the
+        note text). ``dedup=False`` neither checks nor records the note.
+        """
+        converter = self.converter
+        source = MemorySource(name, name, len(text),
+                              time.time() if mtime is None else mtime,
+                              source_type=source_type)
+        doc = converter.parse(text)
+        content_hash = converter.conversation_hash(text, doc)
+        
+        if dedup:
+            existing = self.dedup_index.get(content_hash)
+            if existing is not None:
+                return {'status': 'duplicate', 'source': name,
+                        'content_hash': content_hash, 'duplicate_of': existing}
+        
+        note = converter.render_note(source, doc)
+        result = dict(note, status='converted', source=name, content_hash=content_hash)
+        if not dedup:
+            return result
+        
+        with self._lock:
+            # Re-check: another thread may have recorded the same content meanwhile
+            existing = self.dedup_index.get(content_hash)
+            if existing is not None:
+                return {'status': 'duplicate', 'source': name,
+                        'content_hash': content_hash, 'duplicate_of': existing}
+            if note['signature']:
+                signature = NearDuplicateIndex.decode(note['signature'])
+                match = converter.near_index.query(signature)
+                if match:
+                    result.update(status='near-duplicate', duplicate_of=match[0],
+                                  similarity=match[1])
+                    return result
+                converter.near_index.add(note['filename'], signature)
+            self.dedup_index[content_hash] = note['filename']
+        return result
+    
+    def convert_many(self, items: Iterable) -> Iterator[dict]:
+        """Lazily convert an iterable of texts or ``convert`` keyword dicts."""
+        for item in items:
+            if isinstance(item, str):
+                yield self.convert(item)
+            else:
+                yield self.convert(**item)
+
+
+# Converter used by worker processes in ``convert_files_parallel``
+_worker_converter = None
+
+
+def _init_worker(converter_cls, output_dir: Path, options: dict):
+    """Create the per-process converter (without scanning the output index)."""
+    global _worker_converter
+    options = dict(options)
+    metrics = RunMetrics() if options.pop('metrics', False) else None
+    _worker_converter = converter_cls(output_dir, build_index=False,
+                                      metrics=metrics, **options)
+
+
+def _prepare_in_worker(filepath: Path) -> dict:
+    prepared = _worker_converter.prepare_file(filepath)
+    if _worker_converter.metrics is not None:
+        prepared['metrics'] = _worker_converter.metrics.take_file()
+    return prepared
+
+
+def search_main(argv: List[str]):
+    """The ``search`` subcommand: ranked full-text search over converted notes."""
+    parser = argparse.ArgumentParser(
+        prog='conversation_converter.py search',
+        description="Search the notes in an output directory (BM25-ranked)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python conversation_converter.py search --output-dir Notes/pages/Conversations nist rmf
+  python conversation_converter.py search --output-dir Notes/pages/Conversations \\
+      '"incident response" OR playbook*' --domain security-operations --since 2024-01-01
+        """
+    )
+    parser.add_argument(
+        'query',
+        nargs='+',
+        help='Words, "phrases", prefix*, AND/OR/NOT, or column filters like title: nmap'
+    )
+    parser.add_argument(
+        '--output-dir',
+        type=Path,
+        required=True,
+        help='Output directory holding the notes'
+    )
+    parser.add_argument('--domain', help='Only notes tagged with this domain')
+    parser.add_argument('--since', metavar='YYYY-MM-DD', help='Only notes dated on or after')
+    parser.add_argument('--until', metavar='YYYY-MM-DD', help='Only notes dated on or before')
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=20,
+        help='Maximum number of matches (default: 20)'
+    )
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help='Re-index notes changed outside the converter before searching'
+    )
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help='Print one JSON object per match'
+    )
+    args = parser.parse_args(argv)
+    
+    for value in (args.since, args.until):
+        if value:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                parser.error(f'invalid date {value!r}, expected YYYY-MM-DD')
+    if args.limit < 1:
+        parser.error('--limit must be at least 1')
+    if not args.output_dir.is_dir():
+        print(f"❌ Output directory not found: {args.output_dir}")
+        sys.exit(1)
+    
+    search_path = args.output_dir / ConversationConverter.SEARCH_FILENAME
+    try:
+        if args.refresh or not search_path.exists():
+            # Builds or updates the index; its progress goes to stderr
+            with contextlib.redirect_stdout(sys.stderr):
+                converter = ConversationConverter(args.output_dir, search_index=True)
+                converter.save_index()
+            index = converter.search_index
+        else:
+            index = SearchIndex(search_path)
+        matches = index.search(' '.join(args.query), domain=args.domain,
+                               since=args.since, until=args.until, limit=args.limit)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
+    if args.json:
+        for match in matches:
+            print(json.dumps(match, ensure_ascii=False))
+        return
+    
+    print(f"🔎 {len(matches)} match{'es' if len(matches) != 1 else ''} "
+          f"for {' '.join(args.query)!r}")
+    for rank, match in enumerate(matches, 1):
+        print(f"\n{rank}. {match['date']}  {match['title']}")
+        print(f"   {match['path']}  [{', '.join(match['domains'])}]")
+        print(f"   {' '.join(match['snippet'].split())}")
+
+
+def merge_main(argv: List[str]):
+    """The ``merge`` subcommand: combine the shard manifests of a partitioned run."""
+    parser = argparse.ArgumentParser(
+        prog='conversation_converter.py merge',
+        description="Merge the shard manifests written by --partition runs into "
+                    "the output directory's index",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # On each of three nodes sharing the output directory
+  python conversation_converter.py --input-dir exports --output-dir Notes/pages/Conversations \\
+      --partition 1/3
+  # Once all three are done
+  python conversation_converter.py merge --output-dir Notes/pages/Conversations
+        """
+    )
+    parser.add_argument(
+        '--output-dir',
+        type=Path,
+        required=True,
+        help='Output directory the partitions wrote to'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Report what the merge would do without changing anything'
+    )
+    parser.add_argument(
+        '--fsync-batch',
+        type=int,
+        nargs='?',
+        const=64,
+        default=0,
+        metavar='N',
+        help='Write the merged index durably (fsync)'
+    )
+    args = parser.parse_args(argv)
+    
+    if not args.output_dir.is_dir():
+        print(f"❌ Output directory not found: {args.output_dir}")
+        sys.exit(1)
+    
+    converter = ConversationConverter(args.output_dir, build_index=False,
+                                      fsync_batch=args.fsync_batch)
+    print(f"🧩 Merging shard manifests in {args.output_dir}")
+    try:
+        counts = converter.merge_shards(dry_run=args.dry_run)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
+    print(f"📦 Shards merged: {counts['shards']}")
+    print(f"✅ Notes added or changed: {counts['notes']}")
+    print(f"🗑️  Notes removed: {counts['removed']}")
+    print(f"🔁 Cross-partition duplicates removed: {counts['duplicates']}")
+    if counts['collisions']:
+        print(f"⚠️  Paths written by several partitions: {counts['collisions']} "
+              f"(kept the file on disk)")
+    if args.dry_run:
+        print("\n🔍 Dry run: nothing was changed")
+    else:
+        print(f"\n💾 Index saved: {converter.index_path}")
+
+
+def parse_partition(value: str) -> Tuple[int, int]:
+    """argparse type for ``--partition i/N``."""
+    match = re.fullmatch(r'(\d+)/(\d+)', value)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"expected i/N with 1 <= i <= N, got {value!r}")
+    return int(match.group(1)), int(match.group(2))
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'search':
+        return search_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        return merge_main(sys.argv[2:])
+    
     parser = argparse.ArgumentParser(
         description="Convert conversation files to Logseq-compatible notes",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -506,6 +2502,14 @@ Examples:
   # Convert single file
   python conversation_converter.py --input-file conversation.md \\
                                     --output-dir Notes/pages/Conversations
+  
+  # Search converted notes (see: conversation_converter.py search --help)
+  python conversation_converter.py search --output-dir Notes/pages/Conversations nist rmf
+  
+  # Split a backfill over two nodes, then combine their indexes
+  python conversation_converter.py --input-dir exports --output-dir Notes --partition 1/2
+  python conversation_converter.py --input-dir exports --output-dir Notes --partition 2/2
+  python conversation_converter.py merge --output-dir Notes
         """
     )
     
@@ -513,12 +2517,12 @@ Examples:
     group.add_argument(
         '--input-dir',
         type=Path,
-        help='Input directory containing conversation files'
+        help='Input directory (or .zip/.tar/.tar.gz/.tar.zst export archive)'
     )
     group.add_argument(
         '--input-file',
         type=Path,
-        help='Single conversation file to convert'
+        help='Single conversation file (or export archive) to convert'
     )
     
     parser.add_argument(
@@ -527,6 +2531,31 @@ Examples:
         required=True,
         help='Output directory for converted notes'
     )
+    parser.add_argument(
+        '--search-index',
+        action='store_true',
+        default=None,
+        help='Maintain a full-text index for the search subcommand '
+             '(kept up to date automatically once it exists)'
+    )
+    parser.add_argument(
+        '--hubs',
+        action='store_true',
+        default=None,
+        help='Maintain hub pages listing the notes per domain, activity and topic '
+             '(in hubs/; kept up to date automatically once they exist)'
+    )
+    parser.add_argument(
+        '--layout',
+        choices=ConversationConverter.LAYOUTS,
+        help='Note layout: flat, date (YYYY/MM/ folders) or hash (256 folders); '
+             'default: the layout the output directory already uses, else flat'
+    )
+    parser.add_argument(
+        '--migrate-layout',
+        action='store_true',
+        help='Move the notes of an existing output directory to --layout (one-time)'
+    )
     parser.add_argument(
         '--pattern',
         default='*.md',
@@ -538,6 +2567,106 @@ Examples:
         default=True,
         help='Recursively search input directory (default: True)'
     )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='Number of worker processes for directory conversion (default: 1)'
+    )
+    parser.add_argument(
+        '--io-threads',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Pipeline reads and writes through N reader and N writer threads '
+             '(single process; helps on network storage)'
+    )
+    parser.add_argument(
+        '--fsync-batch',
+        type=int,
+        nargs='?',
+        const=64,
+        default=0,
+        metavar='N',
+        help='Durable writes: fsync notes, then their directory, once per N notes (default N: 64)'
+    )
+    parser.add_argument(
+        '--near-duplicates',
+        type=float,
+        metavar='THRESHOLD',
+        help='Also skip near-duplicates with estimated similarity >= THRESHOLD (0-1)'
+    )
+    parser.add_argument(
+        '--taxonomy',
+        type=Path,
+        metavar='FILE',
+        help='Domain/activity/topic keywords from a TOML or JSON file '
+             '(compiled once and cached; see docs/taxonomy.example.toml)'
+    )
+    parser.add_argument(
+        '--stream-threshold',
+        type=float,
+        metavar='MB',
+        help='Convert source files larger than MB megabytes line by line instead of '
+             f'loading them whole (default: {ConversationConverter.STREAM_THRESHOLD >> 20})'
+    )
+    parser.add_argument(
+        '--partition',
+        type=parse_partition,
+        metavar='i/N',
+        help='Convert only the share of the inputs that node i of N owns and save '
+             'its index to a shard manifest (combine them with the merge subcommand)'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and convert new or modified files in --input-dir as they land'
+    )
+    parser.add_argument(
+        '--debounce',
+        type=float,
+        default=2.0,
+        metavar='SECONDS',
+        help='With --watch, wait until a file is unchanged this long (default: 2)'
+    )
+    parser.add_argument(
+        '--poll',
+        type=float,
+        nargs='?',
+        const=5.0,
+        metavar='SECONDS',
+        help='With --watch, poll instead of using inotify (interval, default: 5)'
+    )
+    parser.add_argument(
+        '--report',
+        choices=['json', 'csv'],
+        help='Export one record per source (status, note, title, date, domains, ...)'
+    )
+    parser.add_argument(
+        '--report-file',
+        type=Path,
+        metavar='FILE',
+        help='Where to write --report (default: conversion-report.json/.csv)'
+    )
+    parser.add_argument(
+        '--metrics-json',
+        type=Path,
+        metavar='FILE',
+        help='Record per-stage and per-file timings and write them to FILE as JSON'
+    )
+    parser.add_argument(
+        '--slowest',
+        type=int,
+        default=10,
+        metavar='N',
+        help='Number of slowest files to list with --metrics-json (default: 10)'
+    )
+    parser.add_argument(
+        '--profile',
+        type=Path,
+        metavar='FILE',
+        help='Run under cProfile and dump pstats to FILE (main process only)'
+    )
     parser.add_argument(
         '--dry-run',
         action='store_true',
@@ -558,6 +2687,38 @@ Examples:
     
     args = parser.parse_args()
     
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.io_threads < 0:
+        parser.error('--io-threads must not be negative')
+    if args.fsync_batch < 0:
+        parser.error('--fsync-batch must not be negative')
+    if args.io_threads and args.jobs > 1:
+        parser.error('--io-threads and --jobs cannot be combined')
+    if args.near_duplicates is not None and not 0 < args.near_duplicates <= 1:
+        parser.error('--near-duplicates must be between 0 and 1')
+    if args.slowest < 0:
+        parser.error('--slowest must not be negative')
+    if args.stream_threshold is not None and args.stream_threshold < 0:
+        parser.error('--stream-threshold must not be negative')
+    if args.watch and not (args.input_dir and args.input_dir.is_dir()):
+        parser.error('--watch needs --input-dir pointing at a directory')
+    if args.watch and args.report:
+        parser.error('--report is not available with --watch')
+    if args.report_file and not args.report:
+        parser.error('--report-file needs --report')
+    if args.migrate_layout and (not args.layout or args.dry_run):
+        parser.error('--migrate-layout needs --layout and cannot be combined with --dry-run')
+    if args.partition and (args.watch or args.migrate_layout or args.search_index
+                           or args.hubs):
+        parser.error('--partition cannot be combined with --watch, --migrate-layout, '
+                     '--search-index or --hubs (merge updates existing ones)')
+    if args.partition and args.input_file and not (is_archive(args.input_file)
+                                                   or is_session_export(args.input_file)):
+        parser.error('--partition needs --input-dir, an export archive or a JSON export')
+    if args.debounce < 0 or (args.poll is not None and args.poll <= 0):
+        parser.error('--debounce must not be negative and --poll must be positive')
+    
     # Validate input
     if args.input_dir:
         if not args.input_dir.exists():
@@ -569,26 +2730,96 @@ Examples:
             print(f"❌ Input file not found: {args.input_file}")
             sys.exit(1)
     
+    taxonomy = None
+    if args.taxonomy:
+        try:
+            taxonomy = Taxonomy.load(args.taxonomy)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    
     # Create converter
-    converter = ConversationConverter(args.output_dir)
+    metrics = RunMetrics() if args.metrics_json else None
+    try:
+        converter = ConversationConverter(
+            args.output_dir, near_duplicate_threshold=args.near_duplicates,
+            metrics=metrics, fsync_batch=args.fsync_batch, taxonomy=taxonomy,
+            layout=args.layout, migrate_layout=args.migrate_layout,
+            search_index=args.search_index, partition=args.partition, hubs=args.hubs,
+            stream_threshold=(None if args.stream_threshold is None
+                              else int(args.stream_threshold * (1 << 20))))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
     
     print("╔═══════════════════════════════════════════════════════════╗")
     print("║       CONVERSATION TO LOGSEQ NOTE CONVERTER               ║")
     print("╚═══════════════════════════════════════════════════════════╝")
     
-    # Convert
-    if args.input_file:
+    # Convert (archives and JSON chat exports are handled like directories)
+    single_file = args.input_file and not (is_archive(args.input_file)
+                                           or is_session_export(args.input_file))
+    if args.watch:
+        converter.watch(
+            args.input_dir,
+            pattern=args.pattern,
+            recursive=args.recursive,
+            dry_run=args.dry_run,
+            skip_existing=args.skip_existing,
+            force=args.force,
+            jobs=args.jobs,
+            debounce=args.debounce,
+            poll_interval=args.poll or 5.0,
+            use_inotify=args.poll is None,
+            io_threads=args.io_threads
+        )
+    elif single_file:
         converter.convert_file(args.input_file, dry_run=args.dry_run,
                              skip_existing=args.skip_existing, force=args.force)
     else:
         converter.convert_directory(
-            args.input_dir,
+            args.input_dir or args.input_file,
             pattern=args.pattern,
             recursive=args.recursive,
             dry_run=args.dry_run,
             skip_existing=args.skip_existing,
-            force=args.force
+            force=args.force,
+            jobs=args.jobs,
+            io_threads=args.io_threads
         )
+    
+    converter.save_index()
+    
+    if args.report:
+        report_file = args.report_file or Path(f"conversion-report.{args.report}")
+        try:
+            converter.write_report(report_file, args.report)
+            print(f"\n📋 Report written to {report_file}")
+        except OSError as e:
+            print(f"⚠️  Could not write report: {e}")
+    
+    if profiler is not None:
+        profiler.disable()
+        import pstats
+        profiler.dump_stats(str(args.profile))
+        print(f"\n🔬 Profile written to {args.profile}")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+    
+    if metrics is not None:
+        report = metrics.report(slowest=args.slowest, jobs=args.jobs)
+        metrics.print_summary(report)
+        try:
+            args.metrics_json.write_text(json.dumps(report, indent=2) + '\n',
+                                         encoding='utf-8')
+            print(f"\n📈 Metrics written to {args.metrics_json}")
+        except OSError as e:
+            print(f"⚠️  Could not write metrics: {e}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,18 @@
+"""Building blocks of ``conversation_converter``.
+
+``conversation_converter`` holds the converter itself and the command
+line, and re-exports everything public from here, so existing imports
+from it keep working.
+
+- ``jsonstream``: incremental JSON reading and writing
+- ``sources``: export archives and chat JSON exports as sources
+- ``taxonomy``: domains, activities and topics, and the keyword matcher
+- ``indexes``: the digest, note and near-duplicate indexes
+- ``search``: the full-text search index
+- ``files``: making directory entries durable
+- ``hubs``: hub pages per domain, activity and topic
+- ``document``: a conversation tokenized once for all extractors
+- ``streaming``: reading and rendering very large sources line by line
+- ``watch``: waiting for new exports (inotify or polling)
+- ``metrics``: per-stage and per-file timing
+"""
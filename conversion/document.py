@@ -0,0 +1,149 @@
+"""A conversation tokenized once for all extractors."""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class ConversationDocument:
+    """A conversation tokenized once into the structure every stage needs.
+    
+    One pass over the lines records headings and speaker turns;
+    the conversation section and a candidate date are located up front.
+    Extractors and the renderer read from here instead of re-scanning the
+    raw text with their own regexes.
+    """
+    
+    # Speaker markers at the start of a line ("User:", "Q:", ...)
+    TURN_MARKER = re.compile(
+        r'(?:(?P<user>User)|(?P<assistant>Assistant)|(?P<q>Q)|(?P<a>A)'
+        r'|(?P<question>Question)):', re.IGNORECASE)
+    TURN_ROLES = {'user': 'user', 'q': 'user', 'question': 'user',
+                  'assistant': 'assistant', 'a': 'assistant'}
+    # Markers rewritten to bold by the renderer (matched case-sensitively)
+    RENDERED_MARKERS = ('User', 'Assistant', 'Q', 'A')
+    
+    DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})')
+    SECTION_MARKER = '## Conversation\n\n'
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.lines = text.split('\n')
+        self.lower = text.lower()
+        # (line number, level, heading text)
+        self.headings: List[Tuple[int, int, str]] = []
+        # line number -> (role, marker as written, offset after the colon)
+        self.turns: Dict[int, Tuple[str, str, int]] = {}
+        
+        for line_no, line in enumerate(self.lines):
+            if line.startswith('#'):
+                heading = self.parse_heading(line)
+                if heading is not None:
+                    self.headings.append((line_no,) + heading)
+            else:
+                turn = self.parse_turn(line)
+                if turn is not None:
+                    self.turns[line_no] = turn
+        
+        date_match = self.DATE_PATTERN.search(text[:500])
+        self.date = date_match.group(1) if date_match else None
+        self.section = self.find_section(text)
+    
+    @staticmethod
+    def parse_heading(line: str) -> Optional[Tuple[int, str]]:
+        """(level, text) of a ``#`` heading line, else None."""
+        level = len(line) - len(line.lstrip('#'))
+        if level and line[level:level + 1] == ' ':
+            return level, line[level + 1:]
+        return None
+    
+    @classmethod
+    def parse_turn(cls, line: str) -> Optional[Tuple[str, str, int]]:
+        """(role, marker as written, offset after the colon) of a turn line.
+        
+        Headings and code fence lines never open a turn.
+        """
+        if line.startswith(('#', '```')):
+            return None
+        match = cls.TURN_MARKER.match(line)
+        if match is None:
+            return None
+        return cls.TURN_ROLES[match.lastgroup], match.group(match.lastgroup), match.end()
+    
+    @classmethod
+    def find_section(cls, text: str) -> Optional[str]:
+        """Text after ``## Conversation`` up to the next ``---`` rule or the end."""
+        start = text.find(cls.SECTION_MARKER)
+        if start == -1:
+            return None
+        start += len(cls.SECTION_MARKER)
+        if start >= len(text):
+            return None
+        end = text.find('\n---', start + 1)
+        return text[start:] if end == -1 else text[start:end]
+    
+    def user_questions(self) -> Iterator[str]:
+        """Yield the text following each user turn marker, in order.
+        
+        Whitespace after a marker may span lines, in which case the question
+        is the next non-blank line (which then can't start a turn itself).
+        """
+        lines = self.lines
+        resume = 0
+        for line_no in sorted(self.turns):
+            role, marker, offset = self.turns[line_no]
+            if line_no < resume or role != 'user':
+                continue
+            question = lines[line_no][offset:].strip()
+            next_line = line_no + 1
+            while not question and next_line < len(lines):
+                question = lines[next_line].strip()
+                next_line += 1
+            if not question:
+                return
+            resume = next_line
+            yield question
+    
+    def clean_lines(self) -> Iterator[str]:
+        """Yield the cleaned conversation text in pieces (see clean_content)."""
+        return clean_conversation_lines(
+            (line, self.turns.get(line_no)) for line_no, line in enumerate(self.lines))
+
+
+def clean_conversation_lines(lines: Iterable[Tuple[str, Optional[tuple]]]) -> Iterator[str]:
+    """Collapse blank-line runs and bold the speaker markers, line by line.
+    
+    ``lines`` pairs each line with its turn marker tuple (or None). Whitespace
+    after a marker is dropped up to the next text, even across lines, and a
+    marker reached that way is rewritten too. Output is not yet stripped.
+    """
+    previous_blank = False
+    absorbing = False
+    first = True
+    for line, turn in lines:
+        if not line:
+            if previous_blank:
+                continue
+            previous_blank = True
+        else:
+            previous_blank = False
+        
+        if absorbing:
+            rest = line.lstrip()
+            if not rest:
+                continue
+            if len(rest) != len(line):
+                absorbing = False
+                yield rest
+                continue
+        elif not first:
+            yield '\n'
+        first = False
+        
+        if turn is not None and turn[1] in ConversationDocument.RENDERED_MARKERS:
+            yield f"**{turn[1]}**: "
+            line = line[turn[2]:].lstrip()
+            absorbing = not line
+        else:
+            absorbing = False
+        if line:
+            yield line
@@ -0,0 +1,18 @@
+"""Filesystem helpers shared by the converter and the pages derived from its notes."""
+
+import os
+from pathlib import Path
+
+
+def fsync_directory(directory: Path):
+    """Flush a directory entry (renames) to disk where the OS allows it."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows, where directories cannot be opened
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
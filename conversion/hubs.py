@@ -0,0 +1,219 @@
+"""Hub pages listing the converted notes per domain, activity and topic."""
+
+import os
+import re
+import hashlib
+import json
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Tuple, Set
+
+from .files import fsync_directory
+from .taxonomy import Taxonomy
+
+
+class HubIndex:
+    """Hub pages listing the converted notes per domain, activity and topic.
+    
+    Membership lives in a JSON state file next to the notes (note path ->
+    size, mtime, date, title, hubs), so adding, replacing or removing a
+    note only marks the hubs it belongs to, and ``commit`` rewrites just
+    those pages from the state without reading any note. Hubs are keyed
+    ``domain/<name>``, ``activity/<name>`` or ``topic/<name>``; each page
+    lists its notes newest first, grouped by year with counts, each linked
+    by its page name (the file stem, since titles repeat) and labelled
+    with its title. The converter keeps it in step with its note index
+    like ``SearchIndex``.
+    """
+    
+    VERSION = 2
+    KINDS = ('domain', 'activity', 'topic')
+    
+    def __init__(self, state_path: Path, hub_dir: Path, taxonomy: Taxonomy,
+                 durable: bool = False):
+        self.state_path = state_path
+        self.hub_dir = hub_dir
+        self.taxonomy = taxonomy
+        self.durable = durable
+        # note path -> [size, mtime_ns, date, title, [hub keys]]
+        self.notes: Dict[str, list] = {}
+        # hub key -> note paths
+        self.hubs: Dict[str, Set[str]] = {}
+        self._dirty: Set[str] = set()
+        self._state_dirty = False
+        # Pages found on disk without a usable state file; dropped unless rewritten
+        self._orphans: Set[Path] = set()
+        self.load()
+    
+    def load(self):
+        try:
+            data = json.loads(self.state_path.read_text(encoding='utf-8'))
+            if not isinstance(data, dict) or data.get('version') != self.VERSION:
+                raise ValueError('unknown version')
+            notes = data['notes']
+            for path, entry in notes.items():
+                size, mtime_ns, date, title, keys = entry
+                self.notes[path] = [int(size), int(mtime_ns), str(date), str(title),
+                                    [str(key) for key in keys]]
+        except FileNotFoundError:
+            self._orphans = set(self.hub_dir.glob('*.md')) if self.hub_dir.is_dir() else set()
+            return
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            print(f"⚠️  Hub state unreadable, rebuilding: {self.state_path.name}")
+            self.notes = {}
+            self._orphans = set(self.hub_dir.glob('*.md')) if self.hub_dir.is_dir() else set()
+            return
+        for path, entry in self.notes.items():
+            for key in entry[4]:
+                self.hubs.setdefault(key, set()).add(path)
+    
+    def entries(self) -> Dict[str, Tuple[int, int]]:
+        """Listed note paths with the size and mtime they were listed at."""
+        return {path: (entry[0], entry[1]) for path, entry in self.notes.items()}
+    
+    def add(self, path: str, fields: dict, size: int, mtime_ns: int):
+        """List (or re-list) one note; ``fields`` come from ``note_fields``."""
+        keys = ([f"domain/{domain}" for domain in fields['domains']]
+                + ([f"activity/{fields['activity']}"] if fields.get('activity') else [])
+                + [f"topic/{topic}" for topic in fields['topics']])
+        keys = list(dict.fromkeys(keys))
+        old = self.notes.get(path)
+        self.notes[path] = [size, mtime_ns, fields['date'], fields['title'], keys]
+        self._state_dirty = True
+        if old is not None:
+            if old[2:] == [fields['date'], fields['title'], keys]:
+                return  # same listing, only the stat changed
+            self._unlink(path, old[4])
+        for key in keys:
+            self.hubs.setdefault(key, set()).add(path)
+        self._dirty.update(keys)
+    
+    def remove(self, path: str):
+        entry = self.notes.pop(path, None)
+        if entry is not None:
+            self._unlink(path, entry[4])
+            self._state_dirty = True
+    
+    def _unlink(self, path: str, keys: List[str]):
+        for key in keys:
+            members = self.hubs.get(key)
+            if members is not None:
+                members.discard(path)
+        self._dirty.update(keys)
+    
+    def rename(self, old_path: str, new_path: str):
+        """Follow a note that moved; its pages change only if its name did."""
+        entry = self.notes.pop(old_path, None)
+        if entry is None:
+            return
+        self.notes[new_path] = entry
+        for key in entry[4]:
+            members = self.hubs[key]
+            members.discard(old_path)
+            members.add(new_path)
+        if PurePosixPath(old_path).stem != PurePosixPath(new_path).stem:
+            self._dirty.update(entry[4])
+        self._state_dirty = True
+    
+    def touch(self, path: str, size: int, mtime_ns: int):
+        """Record the final size and mtime of a note listed before its write landed."""
+        entry = self.notes.get(path)
+        if entry is not None:
+            entry[0], entry[1] = size, mtime_ns
+            self._state_dirty = True
+    
+    def page_path(self, key: str) -> Path:
+        kind, name = key.split('/', 1)
+        slug = re.sub(r'[^\w]+', '_', name.lower()).strip('_')[:50]
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:8]
+        return self.hub_dir / f"{kind}_{slug}_{digest}.md"
+    
+    def label(self, key: str) -> str:
+        kind, name = key.split('/', 1)
+        if kind == 'domain':
+            return self.taxonomy.pages.get(name, name.replace('-', ' ').title())
+        if kind == 'activity':
+            return name.replace('-', ' ').title()
+        return name
+    
+    def render(self, key: str) -> str:
+        """The hub page for ``key``: notes newest first, grouped by year."""
+        kind, name = key.split('/', 1)
+        label = self.label(key)
+        members = sorted(self.hubs[key], key=lambda path: (self.notes[path][3], path))
+        members.sort(key=lambda path: self.notes[path][2], reverse=True)
+        
+        page = f"""---
+title: "Conversations/{kind.title()}/{label}"
+type: "conversation-hub"
+hub: "{kind}"
+notes: {len(members)}
+---
+
+# {label}
+
+**Conversations**: {len(members)}  
+"""
+        if kind == 'domain' and name in self.taxonomy.pages:
+            page += f"**Domain page**: [[{label}]]  \n"
+        elif kind == 'topic':
+            page += f"**Topic page**: [[{label}]]  \n"
+        
+        by_year: Dict[str, List[str]] = {}
+        for path in members:
+            by_year.setdefault(self.notes[path][2][:4] or 'Undated', []).append(path)
+        for year, paths in by_year.items():
+            page += f"\n## {year} ({len(paths)})\n\n"
+            for path in paths:
+                date, title = self.notes[path][2:4]
+                stem = PurePosixPath(path).stem
+                title = re.sub(r'([\[\]])', r'\\\1', title or stem)
+                page += f"- {date} [{title}]([[{stem}]])\n"
+        return page
+    
+    def commit(self) -> int:
+        """Rewrite the hub pages that changed and save the state; returns pages written."""
+        written = 0
+        failed = set()
+        for key in sorted(self._dirty):
+            path = self.page_path(key)
+            self._orphans.discard(path)
+            try:
+                if self.hubs.get(key):
+                    self.write_page(path, self.render(key))
+                    written += 1
+                else:
+                    self.hubs.pop(key, None)
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"⚠️  Could not update hub page {path.name}: {e}")
+                failed.add(key)
+        self._dirty = failed
+        for path in self._orphans:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        self._orphans.clear()
+        if self._state_dirty:
+            try:
+                self.write_page(self.state_path, json.dumps(
+                    {'version': self.VERSION, 'notes': self.notes}, separators=(',', ':')))
+                self._state_dirty = False
+            except OSError as e:
+                print(f"⚠️  Could not save {self.state_path.name}: {e}")
+        if written and self.durable:
+            fsync_directory(self.hub_dir)
+        return written
+    
+    def write_page(self, path: Path, text: str):
+        """Replace a page (or the state file) in one step."""
+        path.parent.mkdir(exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            if self.durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
@@ -0,0 +1,695 @@
+"""Packed in-memory indexes over the notes: digests, note entries and MinHash signatures."""
+
+import base64
+import bisect
+import os
+import re
+import struct
+import sys
+import hashlib
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Set
+from itertools import accumulate
+
+
+class HashIndex:
+    """Compact ``digest -> note path`` index for very large graphs.
+    
+    Behaves like the ``Dict[str, Path]`` it replaces for the operations the
+    converter uses (``in``, ``get``, item assignment and deletion). The
+    16-hex-digit digests are stored as packed 8-byte integers in a sorted
+    array, with a Bloom filter in front to answer most misses without a
+    search. Note paths are kept as one UTF-8 blob, relative to ``root``,
+    and only turned into ``Path`` objects on lookup. Inserts go to a small
+    dict that is merged into the sorted arrays once it grows.
+    """
+    
+    BLOOM_BITS_PER_KEY = 16
+    BLOOM_HASHES = 4
+    MIN_MERGE = 1 << 16
+    
+    def __init__(self, root: Path):
+        self.root = root
+        self._prefix = str(root).rstrip(os.sep) + os.sep
+        self._keys = array('Q')
+        self._offsets = array('Q', [0])
+        self._paths = bytearray()
+        self._bloom = bytearray()
+        self._bloom_bits = 0
+        self._removed: Set[int] = set()
+        self._recent: Dict[int, str] = {}
+    
+    def _relative(self, path: Path) -> str:
+        path = str(path)
+        if path.startswith(self._prefix):
+            path = path[len(self._prefix):]
+            if os.sep != '/':
+                path = path.replace(os.sep, '/')
+        return path
+    
+    def _bloom_positions(self, key: int):
+        h1 = key & 0xFFFFFFFF
+        h2 = (key >> 32) | 1
+        bits = self._bloom_bits
+        return [(h1 + i * h2) % bits for i in range(self.BLOOM_HASHES)]
+    
+    def _find(self, key: int) -> int:
+        """Position of ``key`` in the sorted arrays, or -1."""
+        if key in self._removed or not self._bloom_bits:
+            return -1
+        bloom = self._bloom
+        for bit in self._bloom_positions(key):
+            if not bloom[bit >> 3] & (1 << (bit & 7)):
+                return -1
+        pos = bisect.bisect_left(self._keys, key)
+        if pos < len(self._keys) and self._keys[pos] == key:
+            return pos
+        return -1
+    
+    def _path_at(self, pos: int) -> str:
+        return self._paths[self._offsets[pos]:self._offsets[pos + 1]].decode('utf-8')
+    
+    def __contains__(self, digest: str) -> bool:
+        key = int(digest, 16)
+        return key in self._recent or self._find(key) >= 0
+    
+    def get(self, digest: str, default: Optional[Path] = None) -> Optional[Path]:
+        key = int(digest, 16)
+        rel_path = self._recent.get(key)
+        if rel_path is None:
+            pos = self._find(key)
+            if pos < 0:
+                return default
+            rel_path = self._path_at(pos)
+        return self.root / rel_path
+    
+    def __getitem__(self, digest: str) -> Path:
+        path = self.get(digest)
+        if path is None:
+            raise KeyError(digest)
+        return path
+    
+    def __setitem__(self, digest: str, path: Path):
+        key = int(digest, 16)
+        self._recent[key] = self._relative(path)
+        if len(self._recent) >= max(self.MIN_MERGE, len(self._keys) // 4):
+            self.compact()
+    
+    def __delitem__(self, digest: str):
+        key = int(digest, 16)
+        found = self._recent.pop(key, None) is not None
+        if self._find(key) >= 0:
+            self._removed.add(key)
+            found = True
+        if not found:
+            raise KeyError(digest)
+    
+    def __len__(self) -> int:
+        base = len(self._keys) - len(self._removed)
+        return base + sum(1 for key in self._recent
+                          if key in self._removed or self._find(key) < 0)
+    
+    def load(self, items: Iterable[Tuple[str, Path]]):
+        """Bulk insert (digest, path) pairs with a single merge; later pairs win.
+        
+        Paths may also be given relative to ``root``, as POSIX strings.
+        """
+        self.compact()
+        self._rebuild((int(digest, 16), self._relative(path).encode('utf-8'))
+                      for digest, path in items)
+    
+    def compact(self):
+        """Merge recent inserts and deletions into the sorted arrays."""
+        if not self._recent and not self._removed:
+            return
+        recent, removed = self._recent, self._removed
+        self._recent, self._removed = {}, set()
+        self._rebuild(((key, rel_path.encode('utf-8')) for key, rel_path in recent.items()),
+                      removed)
+    
+    def _rebuild(self, rows: Iterable[Tuple[int, bytes]], removed: Set[int] = frozenset()):
+        """Merge (key, encoded path) rows into the sorted arrays; later rows win.
+        
+        Only a list of positions is sorted; keys and paths are then gathered
+        in that order, so no per-entry objects outlive the merge.
+        """
+        keys, offsets, paths = self._keys, self._offsets, self._paths
+        if removed:
+            kept = [pos for pos, key in enumerate(keys) if key not in removed]
+            pieces = [paths[offsets[pos]:offsets[pos + 1]] for pos in kept]
+            keys = array('Q', map(keys.__getitem__, kept))
+        else:
+            keys = array('Q', keys)
+            pieces = [paths[offsets[pos]:offsets[pos + 1]] for pos in range(len(keys))]
+        for key, encoded in rows:
+            keys.append(key)
+            pieces.append(encoded)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        # Sorting is stable: of equal keys, the last one is the latest row
+        order = [pos for i, pos in enumerate(order, 1)
+                 if i == len(order) or keys[order[i]] != keys[pos]]
+        new_keys = array('Q', map(keys.__getitem__, order))
+        new_paths = bytearray().join(map(pieces.__getitem__, order))
+        new_offsets = array('Q', [0])
+        new_offsets.extend(accumulate(len(pieces[pos]) for pos in order))
+        del pieces
+        
+        self._bloom_bits = max(64, len(new_keys) * self.BLOOM_BITS_PER_KEY)
+        self._bloom = bytearray((self._bloom_bits + 7) // 8)
+        self._keys, self._offsets, self._paths = new_keys, new_offsets, new_paths
+        bloom, bits = self._bloom, self._bloom_bits
+        for key in new_keys:
+            h1 = key & 0xFFFFFFFF
+            h2 = (key >> 32) | 1
+            for i in range(self.BLOOM_HASHES):
+                bit = (h1 + i * h2) % bits
+                bloom[bit >> 3] |= 1 << (bit & 7)
+    
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index, in bytes."""
+        size = sum(sys.getsizeof(part) for part in (
+            self._keys, self._offsets, self._paths, self._bloom,
+            self._removed, self._recent))
+        size += sum(sys.getsizeof(key) + sys.getsizeof(path)
+                    for key, path in self._recent.items())
+        return size
+
+
+class NoteIndex:
+    """Compact ``note path -> cached entry`` map behind the note index file.
+    
+    Stands in for the ``Dict[str, list]`` of ``[digest, size, mtime_ns(,
+    signature)]`` entries, and keeps each note's ``chain_marks`` too. Rows
+    are sorted by a hash of the note path and every column is a packed
+    array aligned with those keys: digests, turn hashes, sizes and mtimes as
+    8-byte integers, MinHash signatures as raw bytes and paths as one UTF-8
+    blob. A note costs about 70 bytes plus its path and signature, instead
+    of a dict slot, a list and a handful of strings.
+    
+    Known notes are updated in place; new ones go to a small dict and
+    removed ones are flagged, both merged into the arrays once they grow
+    (as in ``HashIndex``). ``get`` returns a copy, so a changed entry is
+    stored back with item assignment.
+    """
+    
+    MIN_MERGE = 1 << 14
+    # Row flags
+    DIGEST, SLOT, SIGNATURE, MARKS, HEAD, ANCHOR, REMOVED = (1 << bit for bit in range(7))
+    HEX_DIGEST = re.compile(r'[0-9a-f]{16}')
+    HEX_MARKS = re.compile(r'(?:[0-9a-f]{16}){0,2}')
+    INT64 = range(-1 << 63, 1 << 63)
+    
+    def __init__(self):
+        self._keys = array('Q')
+        self._offsets = array('Q', [0])
+        self._paths = bytearray()
+        self._flags = array('B')
+        self._digests = array('Q')
+        self._sizes = array('q')
+        self._mtimes = array('q')
+        self._heads = array('Q')
+        self._anchors = array('Q')
+        self._signature_at = array('q')
+        self._signatures = bytearray()
+        self._removed = 0
+        # New notes: path -> [entry, marks]
+        self._recent: Dict[str, list] = {}
+    
+    @staticmethod
+    def _key(rel_path: str) -> int:
+        # Keys only live as long as the process, so the string hash will do
+        return hash(rel_path) & 0xFFFFFFFFFFFFFFFF
+    
+    @staticmethod
+    def signature_size() -> int:
+        return NearDuplicateIndex.NUM_PERM * 4
+    
+    @staticmethod
+    def valid_entry(entry, keep_signature: bool = True) -> Optional[list]:
+        """An index file entry as it can be stored, or None if it is malformed.
+        
+        A signature that is not kept (or is not a packed MinHash signature)
+        is dropped, so it is computed again when it is needed.
+        """
+        if not (isinstance(entry, list) and len(entry) in (3, 4)
+                and (entry[0] is None
+                     or isinstance(entry[0], str) and NoteIndex.HEX_DIGEST.fullmatch(entry[0]))
+                and type(entry[1]) is int and entry[1] in NoteIndex.INT64
+                and type(entry[2]) is int and entry[2] in NoteIndex.INT64):
+            return None
+        if len(entry) == 4 and not (keep_signature and (
+                entry[3] is None or NoteIndex._pack_signature(entry[3]) is not None)):
+            return entry[:3]
+        return entry
+    
+    @staticmethod
+    def valid_marks(marks) -> bool:
+        """True for a ``chain_marks`` string: '', or one or two 16-hex-digit hashes."""
+        return isinstance(marks, str) and NoteIndex.HEX_MARKS.fullmatch(marks) is not None
+    
+    @staticmethod
+    def _pack_signature(signature) -> Optional[bytes]:
+        if not isinstance(signature, str):
+            return None
+        try:
+            packed = base64.b64decode(signature, validate=True)
+        except ValueError:
+            return None
+        if (len(packed) != NoteIndex.signature_size()
+                or base64.b64encode(packed).decode('ascii') != signature):
+            return None
+        return packed
+    
+    def _find(self, rel_path: str) -> int:
+        """Row of a note in the sorted arrays, or -1."""
+        keys = self._keys
+        key = self._key(rel_path)
+        pos = bisect.bisect_left(keys, key)
+        encoded = None
+        while pos < len(keys) and keys[pos] == key:
+            if not self._flags[pos] & self.REMOVED:
+                if encoded is None:
+                    encoded = rel_path.encode('utf-8')
+                if self._paths[self._offsets[pos]:self._offsets[pos + 1]] == encoded:
+                    return pos
+            pos += 1
+        return -1
+    
+    def _path_at(self, pos: int) -> str:
+        return self._paths[self._offsets[pos]:self._offsets[pos + 1]].decode('utf-8')
+    
+    def _entry_at(self, pos: int) -> list:
+        flags = self._flags[pos]
+        entry = [f'{self._digests[pos]:016x}' if flags & self.DIGEST else None,
+                 self._sizes[pos], self._mtimes[pos]]
+        if flags & self.SLOT:
+            signature = None
+            if flags & self.SIGNATURE:
+                start = self._signature_at[pos]
+                signature = base64.b64encode(
+                    self._signatures[start:start + self.signature_size()]).decode('ascii')
+            entry.append(signature)
+        return entry
+    
+    def _marks_at(self, pos: int) -> Optional[str]:
+        flags = self._flags[pos]
+        if not flags & self.MARKS:
+            return None
+        if not flags & self.HEAD:
+            return ''
+        marks = f'{self._heads[pos]:016x}'
+        if flags & self.ANCHOR:
+            marks += f'{self._anchors[pos]:016x}'
+        return marks
+    
+    def _encode_marks(self, marks: Optional[str]) -> Tuple[int, int, int]:
+        """(flags, head, anchor) columns for a ``chain_marks`` value."""
+        if marks is None:
+            return 0, 0, 0
+        if not marks:
+            return self.MARKS, 0, 0
+        if len(marks) > 16:
+            return self.MARKS | self.HEAD | self.ANCHOR, int(marks[:16], 16), int(marks[16:], 16)
+        return self.MARKS | self.HEAD, int(marks, 16), 0
+    
+    def _set_entry(self, pos: int, entry: list):
+        flags = self._flags[pos] & (self.MARKS | self.HEAD | self.ANCHOR)
+        if entry[0] is not None:
+            flags |= self.DIGEST
+            self._digests[pos] = int(entry[0], 16)
+        self._sizes[pos] = entry[1]
+        self._mtimes[pos] = entry[2]
+        if len(entry) > 3:
+            flags |= self.SLOT
+            if entry[3] is not None:
+                flags |= self.SIGNATURE
+                packed = base64.b64decode(entry[3])
+                start = self._signature_at[pos]
+                if start < 0:
+                    # Signatures have a fixed size, so later ones overwrite this slot
+                    self._signature_at[pos] = len(self._signatures)
+                    self._signatures += packed
+                else:
+                    self._signatures[start:start + len(packed)] = packed
+        self._flags[pos] = flags
+    
+    def _set_marks(self, pos: int, marks: Optional[str]):
+        flags, head, anchor = self._encode_marks(marks)
+        self._flags[pos] = self._flags[pos] & ~(self.MARKS | self.HEAD | self.ANCHOR) | flags
+        self._heads[pos] = head
+        self._anchors[pos] = anchor
+    
+    def _append(self, rel_path: str, entry: list, marks: Optional[str]):
+        """Add a row after the sorted ones (``_rebuild`` puts it in place)."""
+        self._keys.append(self._key(rel_path))
+        self._paths += rel_path.encode('utf-8')
+        self._offsets.append(len(self._paths))
+        flags, head, anchor = self._encode_marks(marks)
+        self._heads.append(head)
+        self._anchors.append(anchor)
+        digest = entry[0]
+        if digest is not None:
+            flags |= self.DIGEST
+        self._digests.append(0 if digest is None else int(digest, 16))
+        self._sizes.append(entry[1])
+        self._mtimes.append(entry[2])
+        signature_at = -1
+        if len(entry) > 3:
+            flags |= self.SLOT
+            if entry[3] is not None:
+                flags |= self.SIGNATURE
+                signature_at = len(self._signatures)
+                self._signatures += base64.b64decode(entry[3])
+        self._signature_at.append(signature_at)
+        self._flags.append(flags)
+    
+    def __contains__(self, rel_path: str) -> bool:
+        return rel_path in self._recent or self._find(rel_path) >= 0
+    
+    def __len__(self) -> int:
+        return len(self._keys) - self._removed + len(self._recent)
+    
+    def __iter__(self) -> Iterator[str]:
+        for pos in range(len(self._keys)):
+            if not self._flags[pos] & self.REMOVED:
+                yield self._path_at(pos)
+        yield from list(self._recent)
+    
+    def get(self, rel_path: str, default: Optional[list] = None) -> Optional[list]:
+        found = self.get_with_marks(rel_path)
+        return default if found is None else found[0]
+    
+    def get_with_marks(self, rel_path: str) -> Optional[Tuple[list, Optional[str]]]:
+        """A note's entry and ``chain_marks`` in one lookup (None if unknown)."""
+        recent = self._recent.get(rel_path)
+        if recent is not None:
+            return list(recent[0]), recent[1]
+        pos = self._find(rel_path)
+        if pos < 0:
+            return None
+        return self._entry_at(pos), self._marks_at(pos)
+    
+    def marks(self, rel_path: str) -> Optional[str]:
+        """A note's ``chain_marks`` (None if unknown or never computed)."""
+        recent = self._recent.get(rel_path)
+        if recent is not None:
+            return recent[1]
+        pos = self._find(rel_path)
+        return self._marks_at(pos) if pos >= 0 else None
+    
+    def digest(self, rel_path: str) -> Optional[str]:
+        """A note's digest (None if unknown or unreadable), without the rest of its entry."""
+        recent = self._recent.get(rel_path)
+        if recent is not None:
+            return recent[0][0]
+        pos = self._find(rel_path)
+        if pos < 0 or not self._flags[pos] & self.DIGEST:
+            return None
+        return f'{self._digests[pos]:016x}'
+    
+    def items(self) -> Iterator[Tuple[str, list]]:
+        """(path, entry) pairs, one at a time."""
+        flags = self._flags
+        for pos in range(len(self._keys)):
+            if not flags[pos] & self.REMOVED:
+                yield self._path_at(pos), self._entry_at(pos)
+        for rel_path, (entry, _) in list(self._recent.items()):
+            yield rel_path, list(entry)
+    
+    def turn_items(self) -> Iterator[Tuple[str, str]]:
+        """(path, chain_marks) pairs of the notes that have them."""
+        flags = self._flags
+        for pos in range(len(self._keys)):
+            if flags[pos] & self.MARKS and not flags[pos] & self.REMOVED:
+                yield self._path_at(pos), self._marks_at(pos)
+        for rel_path, (_, marks) in list(self._recent.items()):
+            if marks is not None:
+                yield rel_path, marks
+    
+    def __setitem__(self, rel_path: str, entry: list):
+        """Add or replace a note's entry; its turn marks are kept."""
+        recent = self._recent.get(rel_path)
+        if recent is not None:
+            recent[0] = list(entry)
+            return
+        pos = self._find(rel_path)
+        if pos >= 0:
+            self._set_entry(pos, entry)
+            return
+        self._recent[rel_path] = [list(entry), None]
+        if len(self._recent) >= max(self.MIN_MERGE, len(self._keys) // 4):
+            self.compact()
+    
+    def pop(self, rel_path: str, default: Optional[list] = None) -> Optional[list]:
+        """Remove a note (turn marks included) and return its entry."""
+        recent = self._recent.pop(rel_path, None)
+        if recent is not None:
+            return recent[0]
+        pos = self._find(rel_path)
+        if pos < 0:
+            return default
+        entry = self._entry_at(pos)
+        self._flags[pos] |= self.REMOVED
+        self._removed += 1
+        if self._removed >= max(self.MIN_MERGE, len(self._keys) // 4):
+            self.compact()
+        return entry
+    
+    def set_stat(self, rel_path: str, size: int, mtime_ns: int):
+        """Record the size and mtime a note has on disk."""
+        recent = self._recent.get(rel_path)
+        if recent is not None:
+            recent[0][1:3] = size, mtime_ns
+            return
+        pos = self._find(rel_path)
+        if pos >= 0:
+            self._sizes[pos] = size
+            self._mtimes[pos] = mtime_ns
+    
+    def set_marks(self, rel_path: str, marks: Optional[str]):
+        """Set (``None``: forget) a note's ``chain_marks``; unknown notes are ignored."""
+        recent = self._recent.get(rel_path)
+        if recent is not None:
+            recent[1] = marks
+            return
+        pos = self._find(rel_path)
+        if pos >= 0:
+            self._set_marks(pos, marks)
+    
+    def load(self, rows: Iterable[Tuple[str, list, Optional[str]]]):
+        """Bulk insert (path, entry, chain_marks) rows with a single merge.
+        
+        A later row for the same path wins.
+        """
+        self.compact()
+        count = len(self._keys)
+        for rel_path, entry, marks in rows:
+            self._append(rel_path, entry, marks)
+        if len(self._keys) > count:
+            self._rebuild()
+    
+    def compact(self):
+        """Merge new notes and removals into the sorted arrays."""
+        if not self._recent and not self._removed:
+            return
+        recent, self._recent = self._recent, {}
+        for rel_path, (entry, marks) in recent.items():
+            self._append(rel_path, entry, marks)
+        self._rebuild()
+    
+    def _rebuild(self):
+        """Sort the rows by key, dropping removed and superseded ones.
+        
+        As in ``HashIndex``, only a list of positions is sorted and each
+        column is then gathered in that order.
+        """
+        keys, flags = self._keys, self._flags
+        order = [pos for pos in sorted(range(len(keys)), key=keys.__getitem__)
+                 if not flags[pos] & self.REMOVED]
+        # Rows sharing a key: a later one for the same path supersedes the
+        # earlier (sorting is stable); other paths just share the key
+        superseded = set()
+        offsets, paths = self._offsets, self._paths
+        start = 0
+        for i in range(1, len(order) + 1):
+            if i < len(order) and keys[order[i]] == keys[order[start]]:
+                continue
+            if i - start > 1:
+                seen = set()
+                for pos in reversed(order[start:i]):
+                    path = bytes(paths[offsets[pos]:offsets[pos + 1]])
+                    if path in seen:
+                        superseded.add(pos)
+                    seen.add(path)
+            start = i
+        if superseded:
+            order = [pos for pos in order if pos not in superseded]
+        
+        def take(column: array) -> array:
+            return array(column.typecode, map(column.__getitem__, order))
+        
+        pieces = [paths[offsets[pos]:offsets[pos + 1]] for pos in order]
+        self._paths = bytearray().join(pieces)
+        self._offsets = array('Q', [0])
+        self._offsets.extend(accumulate(map(len, pieces)))
+        del pieces
+        signatures, signature_at = bytearray(), array('q')
+        size = self.signature_size()
+        for pos in order:
+            start = self._signature_at[pos]
+            if not flags[pos] & self.SIGNATURE:
+                signature_at.append(-1)
+            else:
+                signature_at.append(len(signatures))
+                signatures += self._signatures[start:start + size]
+        self._signatures, self._signature_at = signatures, signature_at
+        self._keys, self._flags = take(keys), take(flags)
+        self._digests, self._sizes, self._mtimes = (
+            take(self._digests), take(self._sizes), take(self._mtimes))
+        self._heads, self._anchors = take(self._heads), take(self._anchors)
+        self._removed = 0
+    
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index, in bytes."""
+        size = sum(sys.getsizeof(part) for part in (
+            self._keys, self._offsets, self._paths, self._flags, self._digests,
+            self._sizes, self._mtimes, self._heads, self._anchors,
+            self._signature_at, self._signatures, self._recent))
+        size += sum(sys.getsizeof(rel_path) + sys.getsizeof(recent) + sys.getsizeof(recent[0])
+                    + sum(sys.getsizeof(value) for value in recent[0])
+                    for rel_path, recent in self._recent.items())
+        return size
+
+
+def _minhash_permutations(count: int, prime: int) -> List[Tuple[int, int]]:
+    """Deterministic (a, b) coefficients for MinHash permutations."""
+    def coefficient(label: str, modulus: int) -> int:
+        digest = hashlib.sha256(label.encode('ascii')).digest()
+        return int.from_bytes(digest[:8], 'big') % modulus
+    return [(coefficient(f'minhash-a-{i}', prime - 1) + 1,
+             coefficient(f'minhash-b-{i}', prime))
+            for i in range(count)]
+
+
+class NearDuplicateIndex:
+    """MinHash signatures with LSH banding for near-duplicate lookup.
+    
+    Each conversation is reduced to word shingles and a fixed-size MinHash
+    signature. Signatures are split into bands, and only notes sharing a
+    band bucket are compared, so a lookup does not touch every note.
+    """
+    
+    NUM_PERM = 64
+    SHINGLE_SIZE = 5
+    # Identifies the signature scheme; stored signatures with another tag are dropped
+    SCHEME = f'minhash-{NUM_PERM}-{SHINGLE_SIZE}'
+    
+    _MERSENNE_PRIME = (1 << 61) - 1
+    # Fixed hash permutations (a*x + b) mod p, derived so they never change
+    _PERMUTATIONS = _minhash_permutations(NUM_PERM, _MERSENNE_PRIME)
+    
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.bands, self.rows = self.choose_bands(threshold, self.NUM_PERM)
+        self.signatures: Dict[str, Tuple[int, ...]] = {}
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+    
+    @staticmethod
+    def choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+        """Pick bands x rows whose LSH cut-off is closest below the threshold.
+        
+        Candidates are verified against the threshold afterwards, so erring
+        low only costs a few extra comparisons.
+        """
+        best = (num_perm, 1)
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            if (1 / bands) ** (1 / rows) <= threshold:
+                best = (bands, rows)
+        return best
+    
+    @classmethod
+    def signature(cls, text: str) -> Optional[Tuple[int, ...]]:
+        """MinHash signature of the text's word shingles.
+        
+        Texts shorter than one shingle get no signature; they are too short
+        to judge similarity and are left to the exact hash check.
+        """
+        words = re.findall(r'\w+', text.lower())
+        size = cls.SHINGLE_SIZE
+        if len(words) < size:
+            return None
+        shingles = {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+                    for i in range(len(words) - size + 1)}
+        return tuple(value & 0xFFFFFFFF for value in cls.min_hashes(shingles))
+    
+    @classmethod
+    def min_hashes(cls, shingles: Set[int],
+                   previous: Optional[List[int]] = None) -> List[int]:
+        """Per-permutation minimum over the shingles (and ``previous`` minimums).
+        
+        Folding shingles in batches gives the same minimums as one big set,
+        which lets ``StreamedBody`` sign text it never holds at once.
+        """
+        prime = cls._MERSENNE_PRIME
+        values = [min((a * x + b) % prime for x in shingles) for a, b in cls._PERMUTATIONS]
+        return values if previous is None else [min(pair) for pair in zip(values, previous)]
+    
+    @classmethod
+    def encode(cls, signature: Tuple[int, ...]) -> str:
+        return base64.b64encode(struct.pack(f'<{cls.NUM_PERM}I', *signature)).decode('ascii')
+    
+    @classmethod
+    def decode(cls, encoded: str) -> Tuple[int, ...]:
+        return struct.unpack(f'<{cls.NUM_PERM}I', base64.b64decode(encoded))
+    
+    def _band_keys(self, signature: Tuple[int, ...]):
+        rows = self.rows
+        for band in range(self.bands):
+            yield band, signature[band * rows:(band + 1) * rows]
+    
+    def add(self, key: str, signature: Tuple[int, ...]):
+        self.remove(key)
+        self.signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self.buckets.setdefault(band_key, set()).add(key)
+    
+    def remove(self, key: str):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self.buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band_key]
+    
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index, in bytes."""
+        size = sys.getsizeof(self.signatures) + sys.getsizeof(self.buckets)
+        for key, signature in self.signatures.items():
+            size += (sys.getsizeof(key) + sys.getsizeof(signature)
+                     + sum(map(sys.getsizeof, signature)))
+        for band_key, bucket in self.buckets.items():
+            # Band slices share their ints with the signatures
+            size += sys.getsizeof(band_key) + sys.getsizeof(band_key[1]) + sys.getsizeof(bucket)
+        return size
+    
+    def query(self, signature: Tuple[int, ...]) -> Optional[Tuple[str, float]]:
+        """Most similar indexed key at or above the threshold, with its score."""
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+        best = None
+        for key in candidates:
+            other = self.signatures[key]
+            similarity = sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+            if similarity >= self.threshold and (best is None or similarity > best[1]
+                                                 or (similarity == best[1] and key < best[0])):
+                best = (key, similarity)
+        return best
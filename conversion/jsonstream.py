@@ -0,0 +1,137 @@
+"""Incremental JSON reading and writing for files too large to hold at once."""
+
+import re
+import json
+from typing import Iterator
+
+
+class JsonStream:
+    """Incremental JSON reader that decodes one value at a time from a file.
+    
+    Only the value being decoded is held in memory, so arrays of any length
+    can be walked element by element. The read size doubles while a single
+    value keeps overrunning the buffer, which keeps large values linear.
+    """
+    
+    WHITESPACE = re.compile(r'[ \t\r\n]*')
+    
+    def __init__(self, fp, chunk_size: int = 1 << 16):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+    
+    def _fill(self, size: int) -> bool:
+        chunk = self.fp.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self) -> str:
+        """Return the next non-whitespace character ('' at end of input)."""
+        while True:
+            buf, pos = self.buf, self.pos
+            if pos < len(buf) and buf[pos] not in ' \t\r\n':
+                return buf[pos]
+            self.pos = pos = self.WHITESPACE.match(buf, pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill(self.chunk_size):
+                return ''
+    
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos} of buffer")
+        self.pos += 1
+    
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        read_size = self.chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill(read_size):
+                    raise
+                read_size = max(read_size, len(self.buf))
+                continue
+            # A number running to the end of the buffer may still be incomplete
+            # (the "1" of "1.5" decodes fine on its own)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                tail = end
+                while tail < len(self.buf) and self.buf[tail] in '0123456789+-.eE':
+                    tail += 1
+                if tail == len(self.buf) and not self.eof and self._fill(read_size):
+                    continue
+            self.pos = end
+            return value
+    
+    def array_items(self) -> Iterator:
+        """Yield the elements of the array starting at the current position."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect(']')
+                return
+    
+    def object_keys(self) -> Iterator[str]:
+        """Yield the keys of the object starting at the current position.
+        
+        The caller reads each key's value (with ``value`` or another walk)
+        before asking for the next key.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError(f"expected an object key at offset {self.pos} of buffer")
+            self.expect(':')
+            yield key
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect('}')
+                return
+
+
+def json_chunks(data: dict, batch: int = 4096) -> Iterator[str]:
+    """Encode a state file's top-level object as compact JSON, piece by piece.
+    
+    Values that are iterators of (key, value) pairs are written as objects
+    without being built first, so a large index is never held as one dict
+    or one string. The output matches ``json.dumps`` of the equivalent dict.
+    """
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    yield '{'
+    for i, (key, value) in enumerate(data.items()):
+        yield (',' if i else '') + encode(key) + ':'
+        if not isinstance(value, Iterator):
+            yield encode(value)
+            continue
+        yield '{'
+        pieces = []
+        separator = ''
+        for item_key, item in value:
+            pieces.append(encode(item_key) + ':' + encode(item))
+            if len(pieces) == batch:
+                yield separator + ','.join(pieces)
+                pieces, separator = [], ','
+        if pieces:
+            yield separator + ','.join(pieces)
+        yield '}'
+    yield '}'
@@ -0,0 +1,197 @@
+"""Per-stage and per-file timing for --metrics-json."""
+
+import threading
+import time
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class RunMetrics:
+    """Per-stage and per-file timing for ``--metrics-json``.
+    
+    Converter methods are wrapped by ``instrument`` only when metrics are
+    enabled, so an uninstrumented run pays nothing. Stage times are
+    exclusive: a stage nested in another (``classify`` inside ``render``)
+    is subtracted from its parent, so the stages add up to the total. Work
+    done in worker processes travels back with the prepared result and is
+    merged here, which makes stage seconds CPU-style sums when ``jobs > 1``.
+    Reads and writes done by the ``--io-threads`` pools count towards the
+    stage totals but not towards a file record.
+    """
+    
+    # method name -> stage; (args, result) -> bytes processed
+    STAGES = {
+        'build_existing_index': ('index', None),
+        'read_source': ('read', lambda args, result: result[1]),
+        'parse': ('parse', lambda args, result: len(args[0])),
+        'parse_stream': ('parse', lambda args, result: result.chars),
+        'conversation_hash': ('hash', lambda args, result: len(args[0])),
+        'detect_source_type': ('detect', None),
+        'extract_title': ('title', None),
+        'extract_date': ('date', None),
+        'scan_keywords': ('classify', lambda args, result: len(args[0])),
+        'classify_domains': ('classify', None),
+        'classify_activity': ('classify', None),
+        'extract_key_topics': ('classify', None),
+        'note_signature': ('minhash', None),
+        'render_note': ('render', None),
+        'finish_file': ('finish', None),
+        'write_note': ('write', lambda args, result: result.st_size),
+        'sync_notes': ('sync', None),
+        'sync_note_views': ('views', None),
+        'index_note': ('views', None),
+        'save_index': ('save-index', None),
+    }
+    
+    def __init__(self):
+        self.started = time.time()
+        self.stages: Dict[str, List[float]] = {}
+        self.files: Dict[str, dict] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def instrument(self, converter):
+        """Wrap the converter's stage methods on the instance."""
+        for method, (stage, size) in self.STAGES.items():
+            setattr(converter, method, self.timed(getattr(converter, method), stage, size))
+        converter.read_file = self.file_scope(converter.read_file)
+        converter.finish_file = self.finish_scope(converter.finish_file)
+    
+    @property
+    def current(self) -> Optional[dict]:
+        """The file record being filled on this thread."""
+        return getattr(self._local, 'current', None)
+    
+    @current.setter
+    def current(self, record: Optional[dict]):
+        self._local.current = record
+    
+    def timed(self, func, stage: str, size=None):
+        local = self._local
+        
+        def wrapper(*args, **kwargs):
+            children = getattr(local, 'children', None)
+            if children is None:
+                children = local.children = []
+            children.append(0.0)
+            start = time.perf_counter()
+            result = done = None
+            try:
+                result = func(*args, **kwargs)
+                done = True
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = children.pop()
+                if children:
+                    children[-1] += elapsed
+                nbytes = size(args, result) if size and done else 0
+                self.add(stage, elapsed - nested, 1, nbytes)
+        return wrapper
+    
+    def file_scope(self, read_file):
+        """Start a per-file record whenever a source is read."""
+        def wrapper(filepath, *args, **kwargs):
+            self.begin_file(str(filepath))
+            return read_file(filepath, *args, **kwargs)
+        return wrapper
+    
+    def finish_scope(self, finish_file):
+        """Close the per-file record once the file is written or skipped."""
+        def wrapper(filepath, prepared, *args, **kwargs):
+            record = prepared.pop('metrics', None)
+            if record is not None:
+                self.begin_file(str(filepath))
+                for stage, (seconds, calls, nbytes) in record['stages'].items():
+                    self.add(stage, seconds, calls, nbytes)
+            try:
+                return finish_file(filepath, prepared, *args, **kwargs)
+            finally:
+                self.end_file()
+        return wrapper
+    
+    def add(self, stage: str, seconds: float, calls: int = 1, nbytes: int = 0):
+        with self._lock:
+            totals = self.stages.get(stage)
+            if totals is None:
+                totals = self.stages[stage] = [0.0, 0, 0]
+            totals[0] += seconds
+            totals[1] += calls
+            totals[2] += nbytes
+        current = self.current
+        if current is not None:
+            totals = current['stages'].get(stage)
+            if totals is None:
+                totals = current['stages'][stage] = [0.0, 0, 0]
+            totals[0] += seconds
+            totals[1] += calls
+            totals[2] += nbytes
+    
+    def begin_file(self, key: str):
+        self.end_file()
+        self.current = {'file': key, 'stages': {}}
+    
+    def end_file(self) -> Optional[dict]:
+        record, self.current = self.current, None
+        if record is not None:
+            self.files[record['file']] = record
+        return record
+    
+    def take_file(self) -> Optional[dict]:
+        """Detach the current file record (worker side, sent to the parent)."""
+        record = self.end_file()
+        if record is not None:
+            del self.files[record['file']]
+        return record
+    
+    @staticmethod
+    def file_summary(record: dict) -> dict:
+        stages = record['stages']
+        return {
+            'file': record['file'],
+            'seconds': round(sum(totals[0] for totals in stages.values()), 6),
+            'bytes': stages.get('read', (0, 0, 0))[2],
+        }
+    
+    def report(self, slowest: int = 10, jobs: int = 1) -> dict:
+        """Machine-readable summary of the run."""
+        wall = time.time() - self.started
+        stages = {}
+        for stage, (seconds, calls, nbytes) in sorted(
+                self.stages.items(), key=lambda item: -item[1][0]):
+            stages[stage] = {
+                'seconds': round(seconds, 6),
+                'calls': calls,
+                'bytes': nbytes,
+                'mb_per_sec': round(nbytes / seconds / 1_000_000, 3) if nbytes and seconds else None,
+            }
+        files = [self.file_summary(record) for record in self.files.values()]
+        ranked = sorted(self.files.values(), key=lambda record: -self.file_summary(record)['seconds'])
+        slow = []
+        for record in ranked[:slowest]:
+            entry = self.file_summary(record)
+            entry['stages'] = {stage: round(totals[0], 6)
+                               for stage, totals in record['stages'].items()}
+            slow.append(entry)
+        return {
+            'version': 1,
+            'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'wall_seconds': round(wall, 6),
+            'jobs': jobs,
+            'stages': stages,
+            'slowest_files': slow,
+            'files': files,
+        }
+    
+    def print_summary(self, report: dict):
+        print("\n⏱️  Stage timings (exclusive):")
+        for stage, stats in report['stages'].items():
+            rate = f", {stats['mb_per_sec']:.1f} MB/s" if stats['mb_per_sec'] else ''
+            print(f"   • {stage}: {stats['seconds']:.3f}s over {stats['calls']} calls{rate}")
+        if report['slowest_files']:
+            print("\n🐢 Slowest files:")
+            for entry in report['slowest_files']:
+                top = max(entry['stages'].items(), key=lambda item: item[1])[0]
+                print(f"   • {Path(entry['file']).name}: {entry['seconds'] * 1000:.1f} ms "
+                      f"({entry['bytes']} bytes, mostly {top})")
@@ -0,0 +1,142 @@
+"""SQLite FTS5 full-text index over the converted notes."""
+
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import sqlite3
+except ImportError:  # optional, only needed for the search index
+    sqlite3 = None
+
+
+class SearchIndex:
+    """SQLite FTS5 full-text index over the converted notes.
+    
+    One row per note: ``notes`` holds the path, date, domains and the size
+    and mtime the row was built from; ``notes_fts`` holds the searchable
+    title, date, domains, topics and conversation body. The converter keeps
+    it in step with its note index: notes written during a run are added
+    as they are written, and at startup only notes whose size or mtime
+    changed are re-read (see ``ConversationConverter.sync_note_views``).
+    Changes are committed with the note index in ``save_index``.
+    """
+    
+    SCHEMA_VERSION = 1
+    # Relative weights of title, date, domains, topics, body for ranking
+    WEIGHTS = (10.0, 1.0, 4.0, 6.0, 1.0)
+    
+    def __init__(self, path: Path, durable: bool = False):
+        if sqlite3 is None:
+            raise ValueError("the search index needs Python's sqlite3 module")
+        self.path = path
+        self.db = sqlite3.connect(str(path))
+        try:
+            if self.db.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                self.db.executescript("""
+                    DROP TABLE IF EXISTS notes;
+                    DROP TABLE IF EXISTS notes_fts;
+                """)
+            self.db.executescript(f"""
+                PRAGMA journal_mode = WAL;
+                PRAGMA synchronous = {'FULL' if durable else 'NORMAL'};
+                CREATE TABLE IF NOT EXISTS notes (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL UNIQUE,
+                    date TEXT,
+                    domains TEXT,
+                    size INTEGER,
+                    mtime_ns INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS notes_date ON notes (date);
+                CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                    title, date, domains, topics, body,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                );
+                PRAGMA user_version = {self.SCHEMA_VERSION};
+            """)
+        except sqlite3.Error as e:
+            self.db.close()
+            raise ValueError(f"cannot open search index {path.name}: {e}")
+    
+    def entries(self) -> Dict[str, Tuple[int, int]]:
+        """Indexed note paths with the size and mtime they were indexed at."""
+        return {path: (size, mtime_ns) for path, size, mtime_ns
+                in self.db.execute("SELECT path, size, mtime_ns FROM notes")}
+    
+    def add(self, path: str, fields: dict, size: int, mtime_ns: int):
+        """Index (or re-index) one note; ``fields`` come from ``note_fields``."""
+        self.remove(path)
+        cursor = self.db.execute(
+            "INSERT INTO notes (path, date, domains, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+            (path, fields['date'], f" {' '.join(fields['domains'])} ", size, mtime_ns))
+        self.db.execute(
+            "INSERT INTO notes_fts (rowid, title, date, domains, topics, body) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (cursor.lastrowid, fields['title'], fields['date'], ' '.join(fields['domains']),
+             ' '.join(fields['topics']), fields['body']))
+    
+    def remove(self, path: str):
+        row = self.db.execute("SELECT id FROM notes WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            self.db.execute("DELETE FROM notes_fts WHERE rowid = ?", row)
+            self.db.execute("DELETE FROM notes WHERE id = ?", row)
+    
+    def rename(self, old_path: str, new_path: str):
+        self.db.execute("UPDATE notes SET path = ? WHERE path = ?", (new_path, old_path))
+    
+    def touch(self, path: str, size: int, mtime_ns: int):
+        """Record the final size and mtime of a note indexed before its write landed."""
+        self.db.execute("UPDATE notes SET size = ?, mtime_ns = ? WHERE path = ?",
+                        (size, mtime_ns, path))
+    
+    def commit(self):
+        self.db.commit()
+    
+    def close(self):
+        self.db.commit()
+        self.db.close()
+    
+    def search(self, query: str, domain: Optional[str] = None, since: Optional[str] = None,
+               until: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Best matches first (BM25, titles and topics weighted up).
+        
+        ``query`` uses FTS5 syntax (``AND``/``OR``/``NOT``, ``"phrases"``,
+        ``prefix*``, ``title: word``); if it does not parse, each word is
+        searched for literally instead. ``domain`` and the inclusive
+        ``since``/``until`` dates (``YYYY-MM-DD``) filter the matches.
+        """
+        sql = (f"SELECT notes.path, notes_fts.title, notes.date, notes.domains, "
+               f"snippet(notes_fts, 4, '[', ']', '…', 16), "
+               f"bm25(notes_fts, {', '.join(map(str, self.WEIGHTS))}) AS score "
+               f"FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid "
+               f"WHERE notes_fts MATCH ?")
+        params = []
+        if domain:
+            # Domains from a custom taxonomy may contain LIKE wildcards
+            sql += " AND notes.domains LIKE ? ESCAPE '\\'"
+            escaped = re.sub(r'([\\%_])', r'\\\1', domain)
+            params.append(f"% {escaped} %")
+        if since:
+            sql += " AND notes.date >= ?"
+            params.append(since)
+        if until:
+            sql += " AND notes.date <= ?"
+            params.append(until)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        
+        try:
+            rows = self.db.execute(sql, [query] + params).fetchall()
+        except sqlite3.OperationalError:
+            literal = ' '.join('"{}"'.format(word.replace('"', '""'))
+                               for word in query.split())
+            if not literal:
+                return []
+            try:
+                rows = self.db.execute(sql, [literal] + params).fetchall()
+            except sqlite3.Error as e:
+                raise ValueError(f"search failed: {e}")
+        return [{'path': path, 'title': title, 'date': date,
+                 'domains': domains.split(), 'snippet': snippet, 'score': -score}
+                for path, title, date, domains, snippet, score in rows]
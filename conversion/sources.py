@@ -0,0 +1,225 @@
+"""Conversation sources that are not loose files: export archives and chat JSON exports."""
+
+import fnmatch
+import os
+import tarfile
+import time
+import zipfile
+from pathlib import Path, PurePosixPath
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for .tar.zst archives
+    zstandard = None
+
+from .jsonstream import JsonStream
+
+
+# Export archives that can be converted without extracting them to disk
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.zst', '.tzst')
+
+
+def is_archive(path: Path) -> bool:
+    """True if a path names a supported export archive."""
+    return path.name.lower().endswith(ARCHIVE_SUFFIXES) and path.is_file()
+
+
+def is_session_export(path: Path) -> bool:
+    """True if a path looks like a VS Code chat JSON export."""
+    return path.suffix.lower() == '.json' and path.is_file()
+
+
+class MemorySource:
+    """A conversation source that is not a file on disk, e.g. an archive member.
+    
+    Offers the parts of the ``Path`` interface the converter uses (``name``,
+    ``stat()``, ``read_text()``), so it flows through the same pipeline as a
+    loose file. Data is loaded on demand via ``load()``.
+    """
+    
+    def __init__(self, key: str, name: str, size: int, mtime: float,
+                 data: Optional[bytes] = None, loader=None,
+                 source_type: Optional[str] = None):
+        self.key = key
+        self.name = name
+        self.size = size
+        self.mtime = mtime
+        self.data = data
+        self._loader = loader
+        # Known source type (skips detect_source_type), e.g. for JSON sessions
+        self.source_type = source_type
+    
+    def load(self):
+        """Read the member's bytes now (required before handing it off)."""
+        if self.data is None:
+            self.data = self._loader()
+        self._loader = None
+    
+    def read_text(self, encoding: str = 'utf-8') -> str:
+        """Decode like ``Path.read_text``, translating '\\r\\n' and '\\r' to '\\n'."""
+        self.load()
+        return self.data.decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+    
+    def stat(self):
+        return SimpleNamespace(st_size=self.size, st_mtime=self.mtime,
+                               st_mtime_ns=int(self.mtime * 1_000_000_000))
+    
+    def __str__(self) -> str:
+        return self.key
+
+
+def iter_archive(archive: Path, pattern: str = "*.md",
+                 recursive: bool = True) -> Iterator[MemorySource]:
+    """Yield archive members matching ``pattern`` without extracting them.
+    
+    Zip members are yielded in name order; tar archives are streamed in
+    archive order, so a member must be loaded before the next is requested.
+    """
+    archive_key = os.path.abspath(archive)
+    
+    def wanted(member_path: str) -> bool:
+        member_path = member_path.strip('/')
+        if not recursive and '/' in member_path:
+            return False
+        return fnmatch.fnmatchcase(PurePosixPath(member_path).name, pattern)
+    
+    name = archive.name.lower()
+    if name.endswith('.zip'):
+        with zipfile.ZipFile(archive) as zf:
+            infos = sorted((info for info in zf.infolist()
+                            if not info.is_dir() and wanted(info.filename)),
+                           key=lambda info: info.filename)
+            for info in infos:
+                yield MemorySource(
+                    f"{archive_key}::{info.filename}",
+                    PurePosixPath(info.filename).name,
+                    info.file_size,
+                    time.mktime(info.date_time + (0, 0, -1)),
+                    loader=lambda info=info: zf.read(info))
+        return
+    
+    if name.endswith(('.tar.zst', '.tzst')):
+        if zstandard is None:
+            raise ValueError(".tar.zst archives need the 'zstandard' package")
+        raw = open(archive, 'rb')
+        stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        tar = tarfile.open(fileobj=stream, mode='r|')
+    else:
+        raw = stream = None
+        tar = tarfile.open(archive, mode='r|*')
+    try:
+        for member in tar:
+            if not member.isfile() or not wanted(member.name):
+                continue
+            yield MemorySource(
+                f"{archive_key}::{member.name}",
+                PurePosixPath(member.name).name,
+                member.size,
+                member.mtime,
+                loader=lambda member=member: tar.extractfile(member).read())
+    finally:
+        tar.close()
+        if stream is not None:
+            stream.close()
+            raw.close()
+
+
+# Keys under which bulk chat exports keep their list of sessions
+SESSION_LIST_KEYS = ('sessions', 'chatSessions', 'conversations')
+
+
+def iter_json_sessions(fp) -> Iterator[dict]:
+    """Yield chat sessions from a VS Code chat export one at a time.
+    
+    Accepts a top-level array of sessions, an object holding the array under
+    one of ``SESSION_LIST_KEYS``, or a single exported session (an object
+    with ``requests``).
+    """
+    stream = JsonStream(fp)
+    start = stream.peek()
+    if start == '[':
+        for session in stream.array_items():
+            if isinstance(session, dict):
+                yield session
+        return
+    
+    single = {}
+    found_list = False
+    for key in stream.object_keys():
+        if key in SESSION_LIST_KEYS and stream.peek() == '[':
+            found_list = True
+            for session in stream.array_items():
+                if isinstance(session, dict):
+                    yield session
+        else:
+            single[key] = stream.value()
+    if not found_list and isinstance(single.get('requests'), list):
+        yield single
+
+
+def render_vscode_session(session: dict) -> Tuple[str, Optional[float]]:
+    """Render one VS Code chat session as conversation markdown.
+    
+    Returns the text and the session's last activity time (epoch seconds),
+    if the export records one.
+    """
+    timestamps = []
+    turns = []
+    for request in session.get('requests') or []:
+        if not isinstance(request, dict):
+            continue
+        message = request.get('message')
+        if isinstance(message, dict):
+            message = message.get('text')
+        response = request.get('response')
+        if isinstance(response, list):
+            response = ''.join(part.get('value', '') for part in response
+                               if isinstance(part, dict)
+                               and isinstance(part.get('value'), str))
+        elif isinstance(response, dict):
+            response = response.get('value')
+        if isinstance(request.get('timestamp'), (int, float)):
+            timestamps.append(request['timestamp'])
+        if isinstance(message, str) and message.strip():
+            turns.append(f"User: {message.strip()}")
+        if isinstance(response, str) and response.strip():
+            turns.append(f"Assistant: {response.strip()}")
+    
+    for key in ('creationDate', 'lastMessageDate'):
+        if isinstance(session.get(key), (int, float)):
+            timestamps.append(session[key])
+    # Exports store milliseconds since the epoch
+    mtime = max(timestamps) / 1000 if timestamps else None
+    
+    header = []
+    title = session.get('customTitle') or session.get('title')
+    if isinstance(title, str) and title.strip():
+        header.append(f"# {title.strip()}")
+    if timestamps:
+        started = datetime.fromtimestamp(min(timestamps) / 1000)
+        header.append(f"Date: {started.strftime('%Y-%m-%d')}")
+    responder = session.get('responderUsername')
+    if isinstance(responder, str) and responder:
+        header.append(f"Source: {responder} (VS Code chat export)")
+    
+    text = '\n\n'.join(header + turns) + '\n'
+    return text, mtime
+
+
+def iter_session_export(export: Path) -> Iterator[MemorySource]:
+    """Yield one source per chat session in a VS Code JSON export."""
+    export_key = os.path.abspath(export)
+    with open(export, 'r', encoding='utf-8') as fp:
+        for index, session in enumerate(iter_json_sessions(fp)):
+            session_id = session.get('sessionId') or str(index)
+            text, mtime = render_vscode_session(session)
+            if mtime is None:
+                mtime = export.stat().st_mtime
+            data = text.encode('utf-8')
+            yield MemorySource(
+                f"{export_key}::{session_id}",
+                f"{export.name}#{session_id}",
+                len(data), mtime, data=data, source_type='vscode_copilot')
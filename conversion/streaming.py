@@ -0,0 +1,306 @@
+"""Line-by-line reading and rendering of sources too large to load at once."""
+
+import os
+import re
+import hashlib
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Tuple, Set
+from collections import deque
+
+from .document import clean_conversation_lines, ConversationDocument
+from .indexes import NearDuplicateIndex
+from .taxonomy import KeywordMatcher
+
+
+def strip_pieces(pieces: Iterable[str]) -> Iterator[str]:
+    """Yield ``''.join(pieces).strip()`` in pieces.
+    
+    Only whitespace is held back: a run of it is passed on once more text
+    follows, so nothing but the trailing whitespace is left out.
+    """
+    pending = ''
+    started = False
+    for piece in pieces:
+        if not started:
+            piece = piece.lstrip()
+            if not piece:
+                continue
+            started = True
+        text = piece.rstrip()
+        if not text:
+            pending += piece
+            continue
+        yield pending + text
+        pending = piece[len(text):]
+
+
+class StreamedBody:
+    """Digest, turn chain and MinHash signature of a note body fed in pieces.
+    
+    The streaming counterparts of ``note_digest``, ``turn_chain`` and
+    ``note_signature`` for a body that never exists as one string: lines
+    are hashed as they complete and only the current line, the current
+    turn's trailing whitespace, a batch of shingles and the per-turn chain
+    are held. The first
+    ``keep`` characters are kept as ``text`` (what the search index gets).
+    """
+    
+    SHINGLE_BATCH = 1 << 16
+    
+    def __init__(self, user_turn_line: Pattern, signature: bool, keep: int):
+        self.digest: Optional[str] = None
+        self.chain: List[Tuple[str, int]] = []
+        self.signature: Optional[str] = None
+        self.text = ''
+        self._keep = keep
+        self._user_turn_line = user_turn_line
+        self._partial: List[str] = []
+        self._lines = 0
+        # Section digest: stops at the first line starting with "---"
+        self._section = hashlib.sha256()
+        self._section_open = True
+        # Running turn: hash seeded with the previous chain digest
+        self._turn = None
+        self._turn_space = ''
+        self._turn_chars = 0
+        self._chain_digest = b''
+        self._chain_chars = 0
+        # Shingles of the last SHINGLE_SIZE words, folded into minimums per batch
+        self._words = deque(maxlen=NearDuplicateIndex.SHINGLE_SIZE) if signature else None
+        self._word_count = 0
+        self._shingles: Set[int] = set()
+        self._mins: Optional[List[int]] = None
+    
+    def feed(self, piece: str):
+        if len(self.text) < self._keep:
+            self.text += piece[:self._keep - len(self.text)]
+        *complete, rest = piece.split('\n')
+        for line in complete:
+            self._partial.append(line)
+            self._add_line(''.join(self._partial))
+            self._partial = []
+        if rest:
+            self._partial.append(rest)
+    
+    def close(self):
+        """Finish the last line; the results are set from here on."""
+        self._add_line(''.join(self._partial))
+        self._partial = []
+        if self._section_open:
+            # The note goes on with "\n\n---": the section takes the first newline
+            self._section.update(b'\n')
+        self.digest = self._section.hexdigest()[:16]
+        self._end_turn()
+        if self._words is not None and self._word_count >= NearDuplicateIndex.SHINGLE_SIZE:
+            self._fold_shingles()
+            self.signature = NearDuplicateIndex.encode(
+                tuple(value & 0xFFFFFFFF for value in self._mins))
+        # Hash objects don't pickle (results travel back from worker processes)
+        self._section = self._turn = self._words = None
+        self._shingles = set()
+    
+    def _add_line(self, line: str):
+        if self._section_open:
+            if self._lines and line.startswith('---'):
+                self._section_open = False
+            else:
+                self._section.update((('\n' if self._lines else '') + line).encode('utf-8'))
+        
+        if self._user_turn_line.match(line):
+            self._end_turn()
+            self._turn = hashlib.sha256(self._chain_digest)
+            self._turn_space = ''
+            self._turn_chars = 0
+            self._add_turn_text(line)
+        elif self._turn is not None:
+            self._add_turn_text('\n' + line)
+        
+        if self._words is not None:
+            for word in re.findall(r'\w+', line.lower()):
+                self._words.append(word)
+                self._word_count += 1
+                if self._word_count >= NearDuplicateIndex.SHINGLE_SIZE:
+                    self._shingles.add(zlib.crc32(' '.join(self._words).encode('utf-8')))
+                    if len(self._shingles) >= self.SHINGLE_BATCH:
+                        self._fold_shingles()
+        self._lines += 1
+    
+    def _add_turn_text(self, text: str):
+        # A turn opens with its marker, so only its end needs stripping
+        stripped = text.rstrip()
+        if not stripped:
+            self._turn_space += text
+            return
+        chunk = self._turn_space + stripped
+        self._turn.update(chunk.encode('utf-8'))
+        self._turn_chars += len(chunk)
+        self._turn_space = text[len(stripped):]
+    
+    def _end_turn(self):
+        if self._turn is None:
+            return
+        self._chain_digest = self._turn.digest()
+        self._chain_chars += self._turn_chars
+        self.chain.append((self._chain_digest.hex()[:16], self._chain_chars))
+        self._turn = None
+    
+    def _fold_shingles(self):
+        if self._shingles:
+            self._mins = NearDuplicateIndex.min_hashes(self._shingles, self._mins)
+            self._shingles = set()
+
+
+class StreamedDocument:
+    """A conversation file too large to load, summarized in one pass.
+    
+    Stands in for ``ConversationDocument`` in ``render_note``. The head of
+    the file (first ``HEAD_CHARS`` characters and ``HEAD_LINES`` lines) is
+    kept for the title, date and source extractors. Keyword hits, the
+    conversation hash and the rendered body's ``StreamedBody`` are
+    accumulated line by line. ``user_questions`` and ``clean_lines`` read
+    the file again. Memory use is bounded by the longest line.
+    """
+    
+    HEAD_CHARS = 500
+    HEAD_LINES = 30
+    HEADING_LINES = 20
+    
+    def __init__(self, path: Path, matcher: KeywordMatcher, body: StreamedBody):
+        self.path = path
+        self.text = None
+        self.head = ''
+        self.lower = ''
+        self.lines: List[str] = []
+        self.headings: List[Tuple[int, int, str]] = []
+        self.hits: Dict[str, List[int]] = {}
+        self.chars = 0
+        self.content_hash = ''
+        # '```json' in the text and 'conversation' in its lowercase form
+        self.json_fence = self.mentions_conversation = False
+        self.body = body
+        with open(path, encoding='utf-8') as f:
+            stat = os.fstat(f.fileno())
+            self.stat = (stat.st_size, stat.st_mtime_ns)
+            for piece in strip_pieces(clean_conversation_lines(self._scan(f, matcher))):
+                body.feed(piece)
+        body.close()
+        date_match = ConversationDocument.DATE_PATTERN.search(self.head)
+        self.date = date_match.group(1) if date_match else None
+    
+    def _scan(self, f, matcher: KeywordMatcher) -> Iterator[Tuple[str, Optional[tuple]]]:
+        """Yield (line, turn) pairs while hashing, scanning and keeping the head."""
+        text_hash = hashlib.sha256()
+        # Conversation section, as ConversationDocument.find_section cuts it
+        marker_line = False
+        section = None
+        section_lines = 0
+        section_newline = first_blank = False
+        offset = 0
+        line_no = 0
+        raw = ''
+        for raw in f:
+            self.chars += len(raw)
+            text_hash.update(raw.encode('utf-8'))
+            lower = raw.lower()
+            if len(self.head) < self.HEAD_CHARS:
+                self.head += raw[:self.HEAD_CHARS - len(self.head)]
+            if len(self.lower) < self.HEAD_CHARS:
+                self.lower += lower[:self.HEAD_CHARS - len(self.lower)]
+            matcher.scan_chunk(lower, self.hits, offset)
+            offset += len(lower)
+            self.json_fence = self.json_fence or '```json' in raw
+            self.mentions_conversation = self.mentions_conversation or 'conversation' in lower
+            
+            line = raw[:-1] if raw.endswith('\n') else raw
+            if section is None:
+                if marker_line and raw == '\n':
+                    section = hashlib.sha256()
+                else:
+                    marker_line = raw.endswith('## Conversation\n')
+            elif section_lines >= 0:
+                # '\n---' only counts from one character into the section
+                if (section_lines and line.startswith('---')
+                        and not (section_lines == 1 and first_blank)):
+                    section_lines = -1
+                else:
+                    if section_newline:
+                        section.update(b'\n')
+                    elif not section_lines:
+                        first_blank = raw == '\n'
+                    section.update(line.encode('utf-8'))
+                    section_newline = raw.endswith('\n')
+                    section_lines += 1
+            
+            if line_no < self.HEAD_LINES:
+                self.lines.append(line)
+                if line_no < self.HEADING_LINES and line.startswith('#'):
+                    heading = ConversationDocument.parse_heading(line)
+                    if heading is not None:
+                        self.headings.append((line_no,) + heading)
+            line_no += 1
+            yield line, ConversationDocument.parse_turn(line)
+        # text.split('\n') ends with an empty line after a final newline
+        if not raw or raw.endswith('\n'):
+            if line_no < self.HEAD_LINES:
+                self.lines.append('')
+            yield '', None
+        
+        if section is not None and section_lines:
+            if section_lines > 0 and section_newline:
+                section.update(b'\n')
+            text_hash = section
+        self.content_hash = text_hash.hexdigest()[:16]  # as hash_content
+    
+    def iter_lines(self) -> Iterator[Tuple[str, Optional[tuple]]]:
+        """Read the file again as (line, turn) pairs."""
+        with open(self.path, encoding='utf-8') as f:
+            stat = os.fstat(f.fileno())
+            if (stat.st_size, stat.st_mtime_ns) != self.stat:
+                raise OSError(f"{self.path.name} changed while it was being converted")
+            raw = ''
+            for raw in f:
+                line = raw[:-1] if raw.endswith('\n') else raw
+                yield line, ConversationDocument.parse_turn(line)
+            if not raw or raw.endswith('\n'):
+                yield '', None
+    
+    def user_questions(self) -> Iterator[str]:
+        """Same as ``ConversationDocument.user_questions``, from the file."""
+        lines = self.iter_lines()
+        for line, turn in lines:
+            if turn is None or turn[0] != 'user':
+                continue
+            question = line[turn[2]:].strip()
+            while not question:
+                following = next(lines, None)
+                if following is None:
+                    return
+                question = following[0].strip()
+            yield question
+    
+    def clean_lines(self) -> Iterator[str]:
+        """Yield the cleaned conversation text in pieces, from the file."""
+        return clean_conversation_lines(self.iter_lines())
+
+
+class NoteStream:
+    """A rendered note whose conversation is streamed from its source.
+    
+    ``render_note`` returns one as the note ``output`` for a
+    ``StreamedDocument``. Header and footer are small strings; the body is
+    rendered again, line by line, while ``write_note`` writes it. ``body``
+    carries what the index needs from it (see ``StreamedBody``).
+    """
+    
+    def __init__(self, doc: StreamedDocument, header: str, footer: str,
+                 body: StreamedBody):
+        self.doc = doc
+        self.header = header
+        self.footer = footer
+        self.body = body
+    
+    def pieces(self) -> Iterator[str]:
+        yield self.header
+        yield from strip_pieces(self.doc.clean_lines())
+        yield self.footer
@@ -0,0 +1,278 @@
+"""Classification keywords: the taxonomy and the matcher that finds its keywords."""
+
+import re
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Pattern, Tuple
+from collections import Counter
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: TOML taxonomies need the tomli backport
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+class KeywordHits(Mapping):
+    """Which keywords occur in a text, worked out as classification asks.
+    
+    Maps each keyword found to ``[first offset, count]``, where the count
+    includes overlapping occurrences. Membership costs one ``str.find``,
+    which stops at the first occurrence like the ``in`` checks it stands
+    for, and is remembered, so a keyword shared by several domains,
+    activities or topics is looked up once. The count is only taken when
+    an entry is read; iterating checks every keyword of the matcher.
+    """
+    
+    def __init__(self, text: str, keywords: List[str]):
+        self.text = text
+        self._keywords = keywords
+        self._first: Dict[str, int] = {}
+        self._counts: Dict[str, int] = {}
+    
+    def __contains__(self, keyword) -> bool:
+        first = self._first.get(keyword)
+        if first is None:
+            first = self._first[keyword] = self.text.find(keyword)
+        return first >= 0
+    
+    def __getitem__(self, keyword: str) -> List[int]:
+        if keyword not in self:
+            raise KeyError(keyword)
+        count = self._counts.get(keyword)
+        if count is None:
+            count = len(re.findall(f"(?={re.escape(keyword)})", self.text))
+            self._counts[keyword] = count
+        return [self._first[keyword], count]
+    
+    def __iter__(self) -> Iterator[str]:
+        return (keyword for keyword in self._keywords if keyword in self)
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class KeywordMatcher:
+    """Finds the keywords of a taxonomy in conversation text.
+    
+    A loaded text is answered lazily by ``KeywordHits``: classification
+    stops at the first keyword of each group that matches, and nothing in
+    the standard library beats ``str.find`` at telling whether one keyword
+    occurs. Scanning every keyword up front costs a full pass however
+    early the keywords turn up.
+    
+    Text read line by line (``scan_chunk``) is matched in one pass per line
+    instead, where a ``find`` per keyword and line would cost far more.
+    The keywords are compiled into one regular expression shaped like a
+    trie, inside a lookahead so ``findall`` reports the longest keyword
+    starting at every offset without a Python-level step per match; the
+    keywords that are prefixes of it come from a table. Hits are the same
+    as for the whole text. The expression is compiled on first use, since
+    tens of thousands of keywords take a second or more.
+    """
+    
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(dict.fromkeys(keywords))
+        trie: dict = {}
+        for keyword in self.keywords:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+        self._trie = trie
+        self._pattern: Optional[Pattern[str]] = None
+        known = set(self.keywords)
+        self._prefixes: Dict[str, Tuple[str, ...]] = {
+            keyword: tuple(keyword[:end] for end in range(len(keyword), 0, -1)
+                           if keyword[:end] in known)
+            for keyword in self.keywords}
+    
+    @classmethod
+    def _trie_pattern(cls, node: dict) -> str:
+        """Regex for one trie node: its branches, optional where a keyword ends."""
+        branches = [re.escape(ch) + cls._trie_pattern(child)
+                    for ch, child in node.items() if ch]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{pattern})?" if '' in node else pattern
+    
+    def scan(self, text: str) -> KeywordHits:
+        """The keywords in a loaded text, each ``[first offset, count]``."""
+        return KeywordHits(text, self.keywords)
+    
+    def scan_chunk(self, text: str, hits: Dict[str, List[int]], offset: int = 0) -> None:
+        """Scan one piece of a longer text into ``hits``.
+        
+        ``offset`` is the number of characters before the piece; matches
+        never span pieces, so callers split text at line breaks. A keyword
+        keeps the first offset it was seen at and adds up its counts.
+        """
+        if self._pattern is None:
+            self._pattern = re.compile(f"(?=({self._trie_pattern(self._trie) or '(?!)'}))")
+        longest = self._pattern.findall(text)
+        if not longest:
+            return
+        for match, count in Counter(longest).items():
+            for keyword in self._prefixes[match]:
+                hit = hits.get(keyword)
+                if hit is None:
+                    hits[keyword] = [text.find(keyword) + offset, count]
+                else:
+                    hit[1] += count
+
+
+class Taxonomy:
+    """Domains, activities and topics used to classify conversations.
+    
+    The built-in taxonomy comes from ``ConversationConverter``'s class
+    constants; a larger one can be loaded from a TOML or JSON file::
+    
+        default_domain = "general"
+        default_activity = "reference"
+        
+        [domains.grc]
+        page = "Governance, Risk, and Compliance"
+        keywords = ["risk", "compliance", "governance"]
+        
+        [activities]            # first match wins, in file order
+        learning = ["how to", "what is", "explain"]
+        
+        [[topics]]              # all of `all` and (if given) any of `any`
+        name = "NIST-RMF"
+        all = ["nist"]
+        any = ["rmf"]
+    
+    Every keyword from all three sections goes into one ``KeywordMatcher``.
+    """
+    
+    def __init__(self, domains: Dict[str, List[str]], activities: Dict[str, List[str]],
+                 topics: List[Tuple[str, Tuple[str, ...], Tuple[str, ...]]],
+                 pages: Optional[Dict[str, str]] = None,
+                 default_domain: str = 'general', default_activity: str = 'reference'):
+        self.domains = domains
+        self.activities = activities
+        # (topic name, keywords that must all match, keywords of which one must)
+        self.topics = topics
+        self.pages = pages or {}
+        self.default_domain = default_domain
+        self.default_activity = default_activity
+        self.source: Optional[str] = None
+        self._matcher: Optional[KeywordMatcher] = None
+    
+    @classmethod
+    def load(cls, path: Path) -> 'Taxonomy':
+        """Load a TOML/JSON taxonomy.
+        
+        Raises ``ValueError`` for unreadable or invalid files.
+        """
+        try:
+            raw = path.read_bytes()
+        except OSError as e:
+            raise ValueError(f"cannot read taxonomy {path}: {e}")
+        
+        if path.suffix.lower() == '.toml':
+            if tomllib is None:
+                raise ValueError("TOML taxonomies need Python 3.11+ or the 'tomli' "
+                                 "package; use a .json taxonomy instead")
+            try:
+                data = tomllib.loads(raw.decode('utf-8'))
+            except (UnicodeDecodeError, tomllib.TOMLDecodeError) as e:
+                raise ValueError(f"invalid TOML in {path}: {e}")
+        else:
+            try:
+                data = json.loads(raw.decode('utf-8'))
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise ValueError(f"invalid JSON in {path}: {e}")
+        taxonomy = cls.from_dict(data, str(path))
+        taxonomy.source = str(path)
+        return taxonomy
+    
+    @classmethod
+    def from_dict(cls, data: dict, origin: str = 'taxonomy') -> 'Taxonomy':
+        """Validate and normalize a parsed taxonomy (keywords are lowercased)."""
+        def keyword_list(value, where: str) -> List[str]:
+            if isinstance(value, dict):
+                value = value.get('keywords')
+            if not isinstance(value, list) or not all(isinstance(k, str) and k.strip()
+                                                      for k in value):
+                raise ValueError(f"{origin}: {where} needs a list of non-empty keywords")
+            if any('\n' in k or '\r' in k for k in value):
+                raise ValueError(f"{origin}: {where} has a keyword spanning lines")
+            return [keyword.lower() for keyword in value]
+        
+        if not isinstance(data, dict) or not isinstance(data.get('domains'), dict):
+            raise ValueError(f"{origin}: missing [domains] table")
+        domains, pages = {}, {}
+        for name, value in data['domains'].items():
+            domains[name] = keyword_list(value, f"domain '{name}'")
+            if isinstance(value, dict) and value.get('page'):
+                pages[name] = str(value['page'])
+        
+        activities = {}
+        raw_activities = data.get('activities', {})
+        if not isinstance(raw_activities, dict):
+            raise ValueError(f"{origin}: [activities] must be a table")
+        for name, value in raw_activities.items():
+            activities[name] = keyword_list(value, f"activity '{name}'")
+        
+        topics = []
+        raw_topics = data.get('topics', [])
+        if isinstance(raw_topics, dict):  # shorthand: name = [any of these]
+            raw_topics = [{'name': name, 'any': value} for name, value in raw_topics.items()]
+        if not isinstance(raw_topics, list):
+            raise ValueError(f"{origin}: topics must be a list of tables")
+        for rule in raw_topics:
+            if not isinstance(rule, dict) or not rule.get('name'):
+                raise ValueError(f"{origin}: every topic needs a name")
+            required = keyword_list(rule['all'], f"topic '{rule['name']}' all") if 'all' in rule else []
+            options = keyword_list(rule['any'], f"topic '{rule['name']}' any") if 'any' in rule else []
+            if not required and not options:
+                raise ValueError(f"{origin}: topic '{rule['name']}' has no keywords")
+            topics.append((str(rule['name']), tuple(required), tuple(options)))
+        
+        return cls(domains, activities, topics, pages,
+                   str(data.get('default_domain', 'general')),
+                   str(data.get('default_activity', 'reference')))
+    
+    def keywords(self) -> List[str]:
+        keywords = []
+        for group in (self.domains, self.activities):
+            for group_keywords in group.values():
+                keywords.extend(group_keywords)
+        for _, required, options in self.topics:
+            keywords.extend(required)
+            keywords.extend(options)
+        return keywords
+    
+    def matcher(self) -> KeywordMatcher:
+        """The compiled matcher for every keyword, built on first use."""
+        if self._matcher is None:
+            self._matcher = KeywordMatcher(self.keywords())
+        return self._matcher
+    
+    def domain_scores(self, hits: Mapping[str, List[int]]) -> Dict[str, int]:
+        scores = {}
+        for domain, keywords in self.domains.items():
+            count = sum(hits[keyword][1] for keyword in keywords if keyword in hits)
+            if count:
+                scores[domain] = count
+        return scores
+    
+    def classify_domains(self, hits: Mapping[str, List[int]]) -> List[str]:
+        matched = [domain for domain, keywords in self.domains.items()
+                   if any(keyword in hits for keyword in keywords)]
+        return matched or [self.default_domain]
+    
+    def classify_activity(self, hits: Mapping[str, List[int]]) -> str:
+        for activity, keywords in self.activities.items():
+            if any(keyword in hits for keyword in keywords):
+                return activity
+        return self.default_activity
+    
+    def match_topics(self, hits: Mapping[str, List[int]]) -> List[str]:
+        return [name for name, required, options in self.topics
+                if all(keyword in hits for keyword in required)
+                and (not options or any(keyword in hits for keyword in options))]
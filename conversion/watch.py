@@ -0,0 +1,215 @@
+"""Watching an input directory for exports that have finished landing."""
+
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class Inotify:
+    """Minimal Linux inotify binding (via ctypes) for ``DirectoryWatcher``."""
+    
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT = struct.Struct('iIII')
+    
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: Dict[int, Path] = {}
+    
+    def add(self, directory: Path):
+        wd = self._add_watch(self.fd, os.fsencode(str(directory)), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {directory}")
+        self.watches[wd] = directory
+    
+    def read(self, timeout: Optional[float]) -> List[Tuple[Optional[Path], int]]:
+        """Wait up to ``timeout`` seconds and return (path, mask) events."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + self.EVENT.size <= len(data):
+            wd, mask, _cookie, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            path = directory / os.fsdecode(name) if directory is not None and name else None
+            events.append((path, mask))
+        return events
+    
+    def close(self):
+        os.close(self.fd)
+
+
+class DirectoryWatcher:
+    """Yield batches of new or modified files in a directory as they settle.
+    
+    Uses inotify where available and falls back to polling ``stat`` snapshots
+    otherwise. A file is only yielded once its size and mtime have stayed the
+    same for ``debounce`` seconds, so exports that are still being written
+    are not picked up half-way.
+    """
+    
+    def __init__(self, root: Path, pattern: str = "*.md", recursive: bool = True,
+                 debounce: float = 2.0, poll_interval: float = 5.0,
+                 use_inotify: bool = True):
+        self.root = root
+        self.pattern = pattern
+        self.recursive = recursive
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.inotify: Optional[Inotify] = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError):
+                self.inotify = None
+        self.backend = 'inotify' if self.inotify else 'polling'
+        self.known: Dict[Path, Tuple[int, int]] = {}
+        # path -> (size, mtime_ns, time of last observed change)
+        self.pending: Dict[Path, Tuple[int, int, float]] = {}
+    
+    def wanted(self, path: Path) -> bool:
+        return fnmatch.fnmatch(path.name, self.pattern)
+    
+    def directories(self, top: Path) -> Iterator[Path]:
+        yield top
+        if self.recursive:
+            for dirpath, dirnames, _ in os.walk(top):
+                dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+                for name in dirnames:
+                    yield Path(dirpath) / name
+    
+    def scan(self, top: Optional[Path] = None) -> Dict[Path, Tuple[int, int]]:
+        """Stat every matching file under ``top`` (default: the root)."""
+        snapshot = {}
+        for directory in self.directories(top or self.root):
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if fnmatch.fnmatch(entry.name, self.pattern):
+                    try:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            snapshot[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        return snapshot
+    
+    def stat(self, path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+    
+    def touch(self, path: Path, now: float):
+        """Note that ``path`` changed; it becomes ready after ``debounce``."""
+        state = self.stat(path)
+        if state is not None and self.known.get(path) != state:
+            self.pending[path] = state + (now,)
+    
+    def settled(self, now: float) -> List[Path]:
+        ready = []
+        for path, (size, mtime_ns, changed) in list(self.pending.items()):
+            if now - changed < self.debounce:
+                continue
+            state = self.stat(path)
+            if state is None:
+                del self.pending[path]
+            elif state != (size, mtime_ns):
+                self.pending[path] = state + (now,)
+            else:
+                del self.pending[path]
+                self.known[path] = state
+                ready.append(path)
+        return sorted(ready)
+    
+    def timeout(self, now: float) -> Optional[float]:
+        """How long to wait for events before re-checking pending files."""
+        if not self.pending:
+            return self.poll_interval if self.inotify is None else None
+        wait = min(changed + self.debounce for _, _, changed in self.pending.values()) - now
+        return max(0.05, min(wait, self.poll_interval))
+    
+    def batches(self) -> Iterator[List[Path]]:
+        """Yield the files already present, then each batch of settled changes."""
+        if self.inotify is not None:
+            for directory in self.directories(self.root):
+                self.inotify.add(directory)
+        self.known = self.scan()
+        initial = sorted(self.known)
+        if initial:
+            yield initial
+        try:
+            while True:
+                now = time.monotonic()
+                if self.inotify is not None:
+                    self.read_events(self.inotify.read(self.timeout(now)))
+                else:
+                    time.sleep(self.timeout(now))
+                    now = time.monotonic()
+                    for path, state in self.scan().items():
+                        if self.known.get(path) != state and (
+                                path not in self.pending or self.pending[path][:2] != state):
+                            self.pending[path] = state + (now,)
+                ready = self.settled(time.monotonic())
+                if ready:
+                    yield ready
+        finally:
+            if self.inotify is not None:
+                self.inotify.close()
+    
+    def read_events(self, events: List[Tuple[Optional[Path], int]]):
+        now = time.monotonic()
+        for path, mask in events:
+            if mask & Inotify.IN_Q_OVERFLOW:
+                # Events were lost; fall back to a full rescan
+                for path in self.scan():
+                    self.touch(path, now)
+            elif path is None:
+                continue
+            elif mask & Inotify.IN_ISDIR:
+                if self.recursive and mask & (Inotify.IN_CREATE | Inotify.IN_MOVED_TO):
+                    for directory in self.directories(path):
+                        try:
+                            self.inotify.add(directory)
+                        except OSError:
+                            continue
+                    for new_path in self.scan(path):
+                        self.touch(new_path, now)
+            elif self.wanted(path):
+                self.touch(path, now)
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Conversation Converter Benchmark
+Generates a reproducible synthetic corpus and measures converter throughput.
+
+Each ConversationConverter stage (read, parse, hash, title, date, classify,
+render, write) is timed over the whole corpus with the converter's own
+methods, followed by an end-to-end convert_directory run. Results are written as JSON and can be compared
+against a stored baseline to catch regressions, e.g. after editing
+the taxonomy (--taxonomy) or the extraction regexes.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from conversation_converter import (  # noqa: E402
+    ConversationConverter, StreamedDocument, Taxonomy)
+
+RESULTS_VERSION = 1
+# Generation settings and stats, kept next to a generated corpus
+CORPUS_STATS = '.corpus.json'
+STYLES = ('perplexity', 'copilot', 'general')
+
+FILLER_WORDS = (
+    "the a of and to in is it that for on with as this be are from at by "
+    "we you can should would which when then also more most how what why "
+    "use using used set up step first next check make sure value example "
+    "system data team process approach option case result change current"
+).split()
+
+QUESTION_OPENERS = [
+    "How do I", "What is the best way to", "Can you explain how to",
+    "Why does", "What are the steps to", "Help me understand how to",
+    "Compare approaches to", "Give me a checklist to",
+]
+
+
+class CorpusGenerator:
+    """Build reproducible synthetic conversation files.
+
+    Vocabulary is drawn from the taxonomy's keywords (the converter's
+    built-in one by default), so classification does real work and tracks
+    taxonomy changes.
+    """
+
+    def __init__(self, seed: int = 42, median_kb: float = 8.0,
+                 size_sigma: float = 1.0, styles=STYLES,
+                 taxonomy: Optional[Taxonomy] = None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.median_kb = median_kb
+        self.size_sigma = size_sigma
+        self.styles = list(styles)
+        taxonomy = taxonomy or ConversationConverter.default_taxonomy()
+        self.keywords = sorted(set(taxonomy.keywords()))
+
+    def params(self, files: int, duplicate_ratio: float) -> dict:
+        """Everything that shapes the generated corpus, to tell whether a kept one fits."""
+        vocabulary = hashlib.sha256('\n'.join(self.keywords).encode('utf-8')).hexdigest()
+        return {'files': files, 'duplicate_ratio': duplicate_ratio, 'seed': self.seed,
+                'median_kb': self.median_kb, 'size_sigma': self.size_sigma,
+                'styles': self.styles, 'vocabulary': vocabulary[:16]}
+
+    def sentence(self, words: int) -> str:
+        rng = self.rng
+        parts = [rng.choice(self.keywords) if rng.random() < 0.15
+                 else rng.choice(FILLER_WORDS) for _ in range(words)]
+        text = ' '.join(parts)
+        return text[0].upper() + text[1:] + '.'
+
+    def paragraph(self) -> str:
+        return ' '.join(self.sentence(self.rng.randint(8, 24))
+                        for _ in range(self.rng.randint(2, 5)))
+
+    def question(self) -> str:
+        rng = self.rng
+        topic = ' '.join(rng.choice(self.keywords) for _ in range(rng.randint(2, 4)))
+        return f"{rng.choice(QUESTION_OPENERS)} {topic} {rng.choice(FILLER_WORDS)}?"
+
+    def answer(self, style: str) -> str:
+        rng = self.rng
+        blocks = [self.paragraph() for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.4:
+            blocks.append('\n'.join(f"- {self.sentence(rng.randint(4, 10))}"
+                                    for _ in range(rng.randint(2, 6))))
+        if style == 'copilot' and rng.random() < 0.6:
+            blocks.append("```python\n" + '\n'.join(
+                f"value_{i} = check('{rng.choice(self.keywords)}')"
+                for i in range(rng.randint(2, 8))) + "\n```")
+        if style == 'perplexity':
+            blocks[0] += ''.join(f" [{i}]" for i in range(1, rng.randint(2, 5)))
+        return '\n\n'.join(blocks)
+
+    def conversation(self, style: str, target_bytes: int, date: str) -> str:
+        rng = self.rng
+        first_question = self.question()
+        if style == 'perplexity':
+            parts = [f"# {first_question}\n\nPerplexity AI export\nDate: {date}\n"]
+            user, assistant = 'Question:', 'Answer:'
+        elif style == 'copilot':
+            parts = ["## Chat Session\n\nGitHub Copilot chat in VS Code\n"]
+            user, assistant = 'User:', 'Assistant:'
+        else:
+            parts = []
+            user, assistant = 'Q:', 'A:'
+
+        question = first_question
+        size = sum(len(part) for part in parts)
+        while True:
+            turn = f"{user} {question}\n\n{assistant} {self.answer(style)}\n"
+            parts.append(turn)
+            size += len(turn)
+            if size >= target_bytes:
+                break
+            question = self.question()
+
+        if style == 'perplexity':
+            parts.append("Sources:\n" + '\n'.join(
+                f"[{i}] https://example.com/{rng.choice(self.keywords).replace(' ', '-')}"
+                for i in range(1, 4)) + '\n')
+        return '\n'.join(parts)
+
+    def target_size(self) -> int:
+        size = self.rng.lognormvariate(0, self.size_sigma) * self.median_kb * 1024
+        return max(256, int(size))
+
+    def generate(self, out_dir: Path, files: int, duplicate_ratio: float = 0.0) -> dict:
+        """Write ``files`` conversations (a share of them exact duplicates)."""
+        out_dir.mkdir(parents=True, exist_ok=True)
+        rng = self.rng
+        start = datetime(2024, 1, 1)
+        duplicates = int(files * duplicate_ratio)
+        originals: List[Path] = []
+        stats = {'files': files, 'bytes': 0, 'duplicates': duplicates,
+                 'styles': {style: 0 for style in self.styles}}
+
+        for i in range(files - duplicates):
+            style = self.styles[i % len(self.styles)]
+            date = (start + timedelta(days=rng.randint(0, 700))).strftime('%Y-%m-%d')
+            text = self.conversation(style, self.target_size(), date)
+            name = (f"{date}_{style}_{i:06d}.md" if style == 'general'
+                    else f"{style}_{i:06d}.md")
+            path = out_dir / name
+            path.write_text(text, encoding='utf-8')
+            originals.append(path)
+            stats['styles'][style] += 1
+
+        for i in range(duplicates):
+            source = rng.choice(originals)
+            path = out_dir / f"zz_duplicate_{i:06d}_{source.name}"
+            shutil.copyfile(source, path)
+
+        for i, path in enumerate(sorted(out_dir.glob('*.md'))):
+            mtime = 1700000000 + i * 3600
+            os.utime(path, (mtime, mtime))
+            stats['bytes'] += path.stat().st_size
+        return stats
+
+
+def load_corpus_stats(corpus_dir: Path) -> Optional[dict]:
+    """Stats of a corpus this script generated in ``corpus_dir``, or None."""
+    try:
+        stats = json.loads((corpus_dir / CORPUS_STATS).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        return {}
+    return stats if isinstance(stats, dict) else {}
+
+
+class StageTimer:
+    """Accumulate wall time per named stage."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+
+def rate(seconds: float, files: int, total_bytes: int) -> dict:
+    seconds = max(seconds, 1e-9)
+    return {
+        'seconds': round(seconds, 6),
+        'files_per_sec': round(files / seconds, 2),
+        'mb_per_sec': round(total_bytes / seconds / 1_000_000, 3),
+    }
+
+
+def time_stages(corpus: List[Path], scratch: Path,
+                taxonomy: Optional[Taxonomy] = None) -> Dict[str, float]:
+    """Run each converter stage over the whole corpus, one stage at a time.
+
+    Every stage calls the converter method a conversion uses. ``render``
+    times ``render_note`` as a whole, so it repeats the title, date and
+    classify work that is also timed on its own; ``write`` is
+    ``write_note`` (temp file and rename).
+    """
+    converter = ConversationConverter(scratch, build_index=False, taxonomy=taxonomy)
+    timer = StageTimer()
+
+    with timer.stage('read'):
+        sources = [converter.read_source(path) for path in corpus]
+    with timer.stage('parse'):
+        # Files over the stream threshold are parsed and hashed in one pass (see read_file)
+        docs = [converter.parse_stream(path) if content is None else converter.parse(content)
+                for path, (content, _, _) in zip(corpus, sources)]
+    with timer.stage('hash'):
+        for (content, _, _), doc in zip(sources, docs):
+            if content is not None:
+                converter.conversation_hash(content, doc)
+    with timer.stage('title'):
+        for doc in docs:
+            converter.extract_title(doc.text, doc)
+    with timer.stage('date'):
+        for path, doc in zip(corpus, docs):
+            converter.extract_date(path, doc.text, doc)
+    with timer.stage('classify'):
+        for doc in docs:
+            converter.detect_source_type(doc.text, doc)
+            hits = (doc.hits if isinstance(doc, StreamedDocument)
+                    else converter.scan_keywords(doc.text, doc))
+            converter.classify_domains(doc.text, hits)
+            converter.classify_activity(doc.text, hits)
+            converter.extract_key_topics(doc.text, hits)
+    with timer.stage('render'):
+        notes = [converter.render_note(path, doc) for path, doc in zip(corpus, docs)]
+    with timer.stage('write'):
+        for note in notes:
+            converter.write_note(scratch / note['filename'], note['output'])
+    return timer.seconds
+
+
+def time_end_to_end(corpus_dir: Path, scratch: Path, jobs: int,
+                    taxonomy: Optional[Taxonomy] = None) -> float:
+    """Time a full convert_directory run into an empty output directory."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        converter = ConversationConverter(scratch, taxonomy=taxonomy)
+        converter.convert_directory(corpus_dir, jobs=jobs)
+        converter.save_index()
+        return time.perf_counter() - start
+
+
+def run_benchmark(corpus_dir: Path, corpus_stats: dict, repeat: int, jobs: int,
+                  taxonomy: Optional[Taxonomy] = None) -> dict:
+    corpus = sorted(corpus_dir.glob('*.md'))
+    files, total_bytes = len(corpus), corpus_stats['bytes']
+    best_stages: Dict[str, float] = {}
+    best_total = None
+
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as scratch:
+            for name, seconds in time_stages(corpus, Path(scratch), taxonomy).items():
+                best_stages[name] = min(seconds, best_stages.get(name, seconds))
+        with tempfile.TemporaryDirectory() as scratch:
+            seconds = time_end_to_end(corpus_dir, Path(scratch), jobs, taxonomy)
+            best_total = seconds if best_total is None else min(best_total, seconds)
+
+    return {
+        'version': RESULTS_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': corpus_stats,
+        'repeat': repeat,
+        'jobs': jobs,
+        'taxonomy': taxonomy.source if taxonomy is not None else None,
+        'stages': {name: rate(seconds, files, total_bytes)
+                   for name, seconds in best_stages.items()},
+        'end_to_end': rate(best_total, files, total_bytes),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float,
+            min_seconds: float = 0.05) -> List[str]:
+    """Return a line per regression (files/sec below baseline by > tolerance).
+
+    Stages that take less than ``min_seconds`` in both runs are shown but
+    never flagged, since timer noise dominates at that scale.
+    """
+    if baseline.get('corpus', {}).get('params') != results['corpus'].get('params'):
+        print("⚠️  Baseline was recorded on a different corpus; "
+              "rates are compared anyway")
+
+    rows = [(name, stats, baseline.get('stages', {}).get(name))
+            for name, stats in results['stages'].items()]
+    rows.append(('end_to_end', results['end_to_end'], baseline.get('end_to_end')))
+
+    regressions = []
+    print(f"\n{'Stage':<12} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, stats, base in rows:
+        if not base:
+            print(f"{name:<12} {'-':>12} {stats['files_per_sec']:>12.1f}")
+            continue
+        change = stats['files_per_sec'] / max(base['files_per_sec'], 1e-9) - 1
+        flag = ''
+        if max(stats['seconds'], base['seconds']) < min_seconds:
+            flag = ' ~'
+        elif change < -tolerance:
+            flag = ' ❌'
+            regressions.append(f"{name}: {change:+.1%} files/sec")
+        print(f"{name:<12} {base['files_per_sec']:>12.1f} "
+              f"{stats['files_per_sec']:>12.1f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def print_results(results: dict):
+    corpus = results['corpus']
+    print(f"\n📊 {corpus['files']} files, {corpus['bytes'] / 1_000_000:.1f} MB "
+          f"({corpus['duplicates']} duplicates), best of {results['repeat']}")
+    print(f"\n{'Stage':<12} {'seconds':>10} {'files/sec':>12} {'MB/sec':>10}")
+    for name, stats in list(results['stages'].items()) + [('end_to_end', results['end_to_end'])]:
+        print(f"{name:<12} {stats['seconds']:>10.3f} "
+              f"{stats['files_per_sec']:>12.1f} {stats['mb_per_sec']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the conversation converter on a synthetic corpus'
+    )
+    parser.add_argument('--files', type=int, default=500,
+                        help='Number of conversation files to generate (default: 500)')
+    parser.add_argument('--median-kb', type=float, default=8.0,
+                        help='Median file size in KB (default: 8)')
+    parser.add_argument('--size-sigma', type=float, default=1.0,
+                        help='Log-normal spread of file sizes (default: 1.0)')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.1,
+                        help='Share of files that are exact duplicates (default: 0.1)')
+    parser.add_argument('--styles', default=','.join(STYLES),
+                        help='Comma-separated conversation styles (default: all)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed for the corpus (default: 42)')
+    parser.add_argument('--corpus-dir', type=Path,
+                        help='Keep the generated corpus here (reused while the corpus '
+                             'options match, regenerated otherwise)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Runs per measurement; the fastest is kept (default: 3)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Worker processes for the end-to-end run (default: 1)')
+    parser.add_argument('--output', type=Path, default=Path('benchmark-results.json'),
+                        help='Where to write the JSON results')
+    parser.add_argument('--baseline', type=Path,
+                        help='Baseline JSON to compare against')
+    parser.add_argument('--taxonomy', type=Path,
+                        help='Classify with this TOML/JSON taxonomy (default: built-in)')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed slowdown versus the baseline (default: 0.10)')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='Ignore stages faster than this in both runs (default: 0.05)')
+
+    args = parser.parse_args()
+
+    styles = [style.strip() for style in args.styles.split(',') if style.strip()]
+    unknown = set(styles) - set(STYLES)
+    if unknown or not styles:
+        parser.error(f"--styles must be drawn from {', '.join(STYLES)}")
+    if args.files < 1 or args.repeat < 1 or args.jobs < 1:
+        parser.error("--files, --repeat and --jobs must be at least 1")
+    if not 0 <= args.duplicate_ratio < 1:
+        parser.error("--duplicate-ratio must be in [0, 1)")
+
+    taxonomy = None
+    if args.taxonomy:
+        try:
+            taxonomy = Taxonomy.load(args.taxonomy)
+        except ValueError as e:
+            parser.error(str(e))
+
+    generator = CorpusGenerator(args.seed, args.median_kb, args.size_sigma, styles, taxonomy)
+    cleanup: Optional[tempfile.TemporaryDirectory] = None
+    if args.corpus_dir is None:
+        cleanup = tempfile.TemporaryDirectory()
+        corpus_dir = Path(cleanup.name)
+    else:
+        corpus_dir = args.corpus_dir
+
+    try:
+        params = generator.params(args.files, args.duplicate_ratio)
+        corpus_stats = load_corpus_stats(corpus_dir)
+        if corpus_stats is not None and corpus_stats.get('params') == params:
+            print(f"♻️  Reusing corpus: {corpus_dir}")
+        else:
+            if corpus_stats is not None:
+                # Generated by this script for other settings: replace it
+                print(f"🧹 Corpus in {corpus_dir} was generated with other settings")
+                for path in corpus_dir.glob('*.md'):
+                    path.unlink()
+            print(f"🧪 Generating {args.files} conversations in {corpus_dir}")
+            corpus_stats = generator.generate(corpus_dir, args.files, args.duplicate_ratio)
+            corpus_stats['params'] = params
+            (corpus_dir / CORPUS_STATS).write_text(json.dumps(corpus_stats, indent=2),
+                                                   encoding='utf-8')
+
+        results = run_benchmark(corpus_dir, corpus_stats, args.repeat, args.jobs, taxonomy)
+    finally:
+        if cleanup is not None:
+            cleanup.cleanup()
+
+    print_results(results)
+    args.output.write_text(json.dumps(results, indent=2) + '\n', encoding='utf-8')
+    print(f"\n💾 Results written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   - {line}")
+            return 1
+        print(f"\n✅ Within {args.tolerance:.0%} of baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
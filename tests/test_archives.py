@@ -0,0 +1,110 @@
+"""Zip and tar exports are converted member by member, like loose files."""
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import unittest
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+from conversation_converter import iter_archive
+
+from tests.test_document import FIXTURES
+from tests.test_manifest import statuses
+from tests.test_partition import run
+
+# An export with no date in its text or name: the member's mtime dates it
+UNDATED = '\n'.join(['# Undated chat', '', '## Conversation', '',
+                     'User: what is the difference between an ids and an ips?', '',
+                     'Assistant: an ips sits inline and can block traffic.', ''])
+MEMBER_TIME = datetime(2021, 6, 15, 12, 0, 0)
+
+
+def members() -> dict:
+    """Archive member name -> bytes: the fixture corpus and an undated export."""
+    files = {f'export/{path.name}': path.read_bytes()
+             for path in sorted((FIXTURES / 'corpus').iterdir())}
+    files['export/nested/undated.md'] = UNDATED.encode('utf-8')
+    files['export/readme.txt'] = b'not a conversation'
+    return files
+
+
+def write_zip(path: Path, files: dict):
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr(zipfile.ZipInfo('export/', MEMBER_TIME.timetuple()[:6]), b'')
+        for name, data in files.items():
+            zf.writestr(zipfile.ZipInfo(name, MEMBER_TIME.timetuple()[:6]), data)
+
+
+def write_tar(path: Path, files: dict):
+    with tarfile.open(path, 'w:gz') as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = time.mktime(MEMBER_TIME.timetuple())
+            tar.addfile(info, io.BytesIO(data))
+
+
+def notes(output_dir: Path) -> dict:
+    return {path.name: path.read_bytes() for path in output_dir.glob('*.md')}
+
+
+class ArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        # The same export unpacked, as the reference
+        self.loose = self.tmp / 'loose'
+        for name, data in members().items():
+            path = self.loose / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            stamp = time.mktime(MEMBER_TIME.timetuple())
+            os.utime(path, (stamp, stamp))
+        run(self.loose, self.tmp / 'expected')
+        self.expected = notes(self.tmp / 'expected')
+
+    def test_members_convert_like_loose_files(self):
+        for name, writer in (('export.zip', write_zip), ('export.tar.gz', write_tar)):
+            with self.subTest(name):
+                archive = self.tmp / name
+                writer(archive, members())
+                output_dir = self.tmp / f'{name}-notes'
+                converter = run(archive, output_dir)
+                self.assertEqual(notes(output_dir), self.expected)
+                self.assertEqual(len(converter.results), len(members()) - 1)
+                self.assertTrue(all(str(result.source).startswith(f'{archive}::export/')
+                                    for result in converter.results))
+                # Members are matched by size and mtime on the next run
+                converter = run(archive, output_dir)
+                self.assertEqual(set(statuses(converter).values()), {'unchanged'})
+
+    def test_member_mtime_dates_an_undated_export(self):
+        archive = self.tmp / 'export.tar.gz'
+        write_tar(archive, members())
+        converter = run(archive, self.tmp / 'notes')
+        undated, = [result for result in converter.results
+                    if Path(result.source).name == 'undated.md']
+        self.assertEqual(undated.date, '2021-06-15')
+        self.assertTrue(Path(undated.path).name.startswith('2021-06-15_'))
+
+    def test_pattern_and_recursion(self):
+        archive = self.tmp / 'export.zip'
+        write_zip(archive, dict(members(), **{'top.md': UNDATED.encode('utf-8')}))
+        names = [source.name for source in iter_archive(archive, '*.md', recursive=False)]
+        self.assertEqual(names, ['top.md'])
+        names = [source.name for source in iter_archive(archive, 'undated*')]
+        self.assertEqual(names, ['undated.md'])
+        # Members are read while the archive is open
+        read = [(source.read_text(), source.stat().st_mtime)
+                for source in iter_archive(archive, '*.txt')]
+        self.assertEqual(read, [('not a conversation', time.mktime(MEMBER_TIME.timetuple()))])
+
+
+if __name__ == '__main__':
+    unittest.main()
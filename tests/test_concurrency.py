@@ -0,0 +1,91 @@
+"""Runs with --jobs and --io-threads convert a corpus exactly as a serial run does."""
+
+import random
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from conversation_converter import ConversationConverter
+
+from tests.test_document import FIXTURES
+from tests.test_manifest import thread, write
+from tests.test_partition import run, state
+from tests.test_streaming import random_conversation, write_source
+
+
+def outcome(converter: ConversationConverter, input_dir: Path) -> dict:
+    """Results and skip lists, with paths relative to the run's directories."""
+    def rel(path) -> str:
+        path = Path(path)
+        for root in (converter.output_dir, input_dir):
+            if root in path.parents:
+                return path.relative_to(root).as_posix()
+        return path.as_posix()
+    return {
+        # Read-ahead may record unchanged sources early: compare statuses, not their order
+        'results': {rel(result.source): result.status for result in converter.results},
+        'converted': [rel(path) for path in converter.converted],
+        'grown': [rel(path) for path in converter.grown],
+        'duplicates': [(rel(source), rel(note)) for source, note in converter.duplicates],
+        'skipped': [rel(path) for path in converter.skipped],
+        'failed': converter.failed,
+    }
+
+
+class ConcurrentRunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.input_dir = self.tmp / 'input'
+        self.input_dir.mkdir()
+        for source in (FIXTURES / 'corpus').iterdir():
+            write_source(self.input_dir / source.name, source.read_bytes().decode('utf-8'))
+        rng = random.Random(31)
+        for i in range(30):
+            text = random_conversation(rng)
+            write_source(self.input_dir / f'random-{i:02d}.md', text)
+            if i % 3 == 0:
+                write_source(self.input_dir / f'random-{i:02d}-copy.md', text)
+        # Exports of one thread at growing (and shrinking) lengths
+        for name, turns in (('thread-a.md', 3), ('thread-b.md', 6), ('thread-c.md', 4),
+                            ('thread-d.md', 8)):
+            write(self.input_dir / name, thread(turns))
+        # A note edited by hand keeps its source from being converted again
+        edited = self.tmp / 'edited'
+        edited.mkdir()
+        write(edited / 'other.md', thread(3, title='Edited chat', topic='cvss'))
+        write(self.input_dir / 'other.md', thread(3, title='Edited chat', topic='cvss'))
+        run(edited, edited / 'notes')
+        self.edited_note = next((edited / 'notes').glob('*.md'))
+        self.edited_note.write_text(self.edited_note.read_text(encoding='utf-8') + '\nMy notes.\n',
+                                    encoding='utf-8')
+
+    def convert(self, name: str, **kwargs) -> ConversationConverter:
+        output_dir = self.tmp / name
+        output_dir.mkdir()
+        shutil.copy2(self.edited_note, output_dir)
+        return run(self.input_dir, output_dir, **kwargs)
+
+    def test_jobs_and_io_threads_match_serial_run(self):
+        modes = {'serial': {}, 'jobs': {'jobs': 4}, 'io': {'io_threads': 3}}
+        first = {name: outcome(self.convert(name, **kwargs), self.input_dir)
+                 for name, kwargs in modes.items()}
+        expected = first['serial']
+        self.assertTrue(expected['duplicates'])
+        self.assertTrue(expected['grown'])
+        self.assertTrue(expected['skipped'])
+        # A longer export on the next run grows the note again
+        write(self.input_dir / 'thread-f.md', thread(10), mtime=1_700_000_100)
+        second = {name: outcome(run(self.input_dir, self.tmp / name, **kwargs), self.input_dir)
+                  for name, kwargs in modes.items()}
+        self.assertEqual(second['serial']['grown'], expected['grown'][-1:])
+        for name in ('jobs', 'io'):
+            with self.subTest(name):
+                self.assertEqual(first[name], expected)
+                self.assertEqual(second[name], second['serial'])
+                self.assertEqual(state(self.tmp / name), state(self.tmp / 'serial'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""ConversationDocument rendering parity with the original regex implementation.
+
+``fixtures/expected`` holds the notes the regex-based converter wrote for
+``fixtures/corpus`` before conversations were tokenized into a
+``ConversationDocument``; the regex functions below are that converter's
+extractors, kept verbatim so randomized inputs can be checked too.
+"""
+
+import contextlib
+import io
+import random
+import re
+import tempfile
+import unittest
+from pathlib import Path
+
+from conversation_converter import ConversationConverter
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+
+def regex_clean_content(content: str) -> str:
+    content = re.sub(r'\n{3,}', '\n\n', content)
+    content = re.sub(r'^(User|Assistant|Q|A):\s*', r'**\1**: ',
+                     content, flags=re.MULTILINE)
+    return content.strip()
+
+
+def regex_extract_title(content: str) -> str:
+    lines = content.split('\n')
+    for line in lines[:20]:
+        if line.startswith('# '):
+            title = line[2:].strip()
+            if title.lower() not in ['chat session', 'conversation', 'untitled']:
+                return title
+        elif line.startswith('## '):
+            title = line[3:].strip()
+            if title.lower() not in ['chat session', 'conversation', 'untitled']:
+                return title
+    for match in re.finditer(r'^(?:User|Q|Question):\s*(.+?)(?:\n|$)',
+                             content, re.MULTILINE | re.IGNORECASE):
+        question = match.group(1).strip()
+        if len(question) > 20 and not any(skip in question.lower()
+                                          for skip in ['how are you', 'hello', 'hi ', 'test']):
+            title = re.sub(r'[*_`]', '', question)
+            return title[:80] + ('...' if len(title) > 80 else '')
+    for line in lines[:30]:
+        line = line.strip()
+        if (len(line) > 20 and
+                not line.startswith(('---', '```', '>', '#', 'Date:', 'Source:')) and
+                line.lower() not in ['chat session', 'conversation']):
+            return line[:80] + ('...' if len(line) > 80 else '')
+    return "Conversation"
+
+
+def regex_detect_source_type(content: str) -> str:
+    if 'perplexity' in content.lower()[:500]:
+        return 'perplexity'
+    elif 'github copilot' in content.lower()[:500]:
+        return 'vscode_copilot'
+    elif '```json' in content and 'conversation' in content.lower():
+        return 'vscode_export'
+    return 'general'
+
+
+FRAGMENTS = [
+    '', ' ', '\t', '# Title here', '## Chat session', '## Conversation', '# Untitled',
+    '### Deeper heading', '#NoSpace', '---', '--- x', '```', '```json', '```python',
+    'User: hello there how are you doing today friend', 'User:', 'User:   ', 'user: lower case',
+    'Q: what is nist rmf and how does it apply here', 'A: answer text', 'Question: why test?',
+    'question: why is the sky blue and what is risk', 'Assistant: sure thing', 'Assistant:',
+    '**User**: already bold', '  User: indented', 'Date: 2023-01-01', 'Source: perplexity',
+    '> quote line long enough to be a title maybe', 'perplexity', 'github copilot',
+    'conversation', 'lorem ipsum dolor sit amet consectetur', 'Σίσυφος İstanbul ſtop',
+    'User: fix the `parse` *error* in __main__ please, it keeps failing',
+]
+
+
+def random_conversation(rng: random.Random) -> str:
+    lines = [rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 30))]
+    text = '\n'.join(lines)
+    if rng.random() < 0.3:
+        text += '\n' * rng.randint(1, 4)
+    return text
+
+
+class RenderParityTest(unittest.TestCase):
+
+    def test_corpus_renders_like_regex_converter(self):
+        expected_dir = FIXTURES / 'expected'
+        with tempfile.TemporaryDirectory() as tmp:
+            output_dir = Path(tmp)
+            converter = ConversationConverter(output_dir)
+            with contextlib.redirect_stdout(io.StringIO()):
+                converter.convert_directory(FIXTURES / 'corpus')
+            expected = sorted(path.name for path in expected_dir.glob('*.md'))
+            self.assertEqual(sorted(path.name for path in output_dir.glob('*.md')), expected)
+            for name in expected:
+                self.assertEqual((output_dir / name).read_bytes(),
+                                 (expected_dir / name).read_bytes(), name)
+
+    def test_extractors_match_regex_on_random_text(self):
+        converter = ConversationConverter(None)
+        rng = random.Random(5)
+        for _ in range(3000):
+            text = random_conversation(rng)
+            doc = converter.parse(text)
+            self.assertEqual(converter.clean_content(text, doc), regex_clean_content(text),
+                             repr(text))
+            self.assertEqual(converter.extract_title(text, doc), regex_extract_title(text),
+                             repr(text))
+            self.assertEqual(converter.detect_source_type(text, doc),
+                             regex_detect_source_type(text), repr(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
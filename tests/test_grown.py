@@ -0,0 +1,106 @@
+"""Exports of one conversation at different lengths keep a single, longest note."""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.test_manifest import manifest, statuses, thread, write
+from tests.test_partition import run
+
+
+class GrownConversationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.input_dir = self.tmp / 'input'
+        self.input_dir.mkdir()
+        self.output_dir = self.tmp / 'output'
+        self.mtime = 1_700_000_000
+
+    def export(self, name: str, turns: int, **kwargs):
+        # Every export is a change the manifest has to notice
+        self.mtime += 100
+        write(self.input_dir / name, thread(turns, **kwargs), mtime=self.mtime)
+
+    def notes(self) -> dict:
+        """Note name -> number of user turns in it."""
+        return {path.name: path.read_text(encoding='utf-8').count('**User**:')
+                for path in self.output_dir.glob('*.md')}
+
+    def test_longer_export_updates_the_note(self):
+        self.export('a.md', 3)
+        run(self.input_dir, self.output_dir)
+        note = manifest(self.output_dir)['a.md'][2]
+        self.export('b.md', 6)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'unchanged', 'b.md': 'grown'})
+        self.assertEqual(converter.grown, [str(self.output_dir / note)])
+        self.assertEqual(converter.converted, [])
+        self.assertEqual(self.notes(), {note: 6})
+        self.assertEqual(manifest(self.output_dir)['b.md'][2], note)
+
+    def test_note_grown_in_the_same_run_is_counted_once(self):
+        self.export('a.md', 3)
+        self.export('b.md', 6)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'converted', 'b.md': 'grown'})
+        note = str(self.output_dir / manifest(self.output_dir)['a.md'][2])
+        self.assertEqual((converter.converted, converter.grown), ([note], [note]))
+        # Only the longer conversation is left to deduplicate against
+        first, second = converter.results
+        self.assertEqual(len(converter.existing_hashes), 1)
+        self.assertIsNone(converter.existing_hashes.get(first.content_hash))
+        self.assertEqual(str(converter.existing_hashes.get(second.content_hash)), note)
+
+    def test_shorter_export_is_a_duplicate(self):
+        self.export('a.md', 6)
+        self.export('b.md', 3)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'converted', 'b.md': 'duplicate'})
+        note = manifest(self.output_dir)['a.md'][2]
+        self.assertEqual(self.notes(), {note: 6})
+        self.assertEqual(manifest(self.output_dir)['b.md'][2], note)
+
+    def test_short_conversations_are_not_merged(self):
+        # One turn is under GROWN_MIN_CHARS: too little to tell threads apart
+        self.export('a.md', 1)
+        self.export('b.md', 2)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'converted', 'b.md': 'converted'})
+        self.assertEqual(sorted(self.notes().values()), [1, 2])
+
+    def test_source_may_shrink_the_note_it_wrote(self):
+        self.export('a.md', 5)
+        run(self.input_dir, self.output_dir)
+        self.export('a.md', 4)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'converted'})
+        self.assertEqual(self.notes(), {manifest(self.output_dir)['a.md'][2]: 4})
+
+    def test_stale_export_does_not_overwrite_a_note_grown_elsewhere(self):
+        self.export('a.md', 3)
+        run(self.input_dir, self.output_dir)
+        note = manifest(self.output_dir)['a.md'][2]
+        # a.md re-exported: replaces its own note
+        self.export('a.md', 5)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'converted'})
+        self.assertEqual(self.notes(), {note: 5})
+        # b.md, a longer export of the thread, grows that note
+        self.export('b.md', 7)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'unchanged', 'b.md': 'grown'})
+        self.assertEqual(self.notes(), {note: 7})
+        # a.md re-exported again, still shorter than the note: turn 7 stays
+        self.export('a.md', 6)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'duplicate', 'b.md': 'unchanged'})
+        self.assertEqual(self.notes(), {note: 7})
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'unchanged', 'b.md': 'unchanged'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""Hub pages: created with the notes, updated and removed incrementally."""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from conversation_converter import ConversationConverter, HubIndex
+
+from tests.test_manifest import thread, write
+from tests.test_partition import quietly
+from tests.test_search import fields
+
+
+class HubPagesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.input_dir = self.tmp / 'input'
+        self.input_dir.mkdir()
+        self.output_dir = self.tmp / 'output'
+        self.hub_dir = self.output_dir / ConversationConverter.HUB_DIRNAME
+
+    def convert(self, **kwargs) -> ConversationConverter:
+        converter = quietly(ConversationConverter, self.output_dir, **kwargs)
+        quietly(converter.convert_directory, self.input_dir)
+        quietly(converter.save_index)
+        return converter
+
+    def pages(self) -> dict:
+        """Hub page name -> (text, mtime_ns)."""
+        return {path.name: (path.read_text(encoding='utf-8'), path.stat().st_mtime_ns)
+                for path in self.hub_dir.glob('*.md')}
+
+    def page(self, converter: ConversationConverter, key: str) -> str:
+        return converter.hub_index.page_path(key).read_text(encoding='utf-8')
+
+    def test_pages_follow_the_notes(self):
+        write(self.input_dir / 'a.md', thread(2, title='Log pipeline', topic='splunk'))
+        write(self.input_dir / 'b.md', thread(2, title='Risk register', topic='nist rmf'))
+        converter = self.convert(hubs=True)
+        stems = {Path(result.source).name: Path(result.path).stem for result in converter.results}
+        page = self.page(converter, 'topic/Splunk')
+        self.assertIn(f"[Log pipeline]([[{stems['a.md']}]])", page)
+        self.assertNotIn(stems['b.md'], page)
+        self.assertIn('notes: 1', page)
+        self.assertIn('## 2024 (1)', page)
+        self.assertIn('notes: 2', self.page(converter, 'domain/grc'))
+        # Notes are not taken for hub pages or the other way round
+        self.assertEqual(len(list(self.output_dir.glob('*.md'))), 2)
+        self.assertTrue(all(name.startswith(('domain_', 'activity_', 'topic_'))
+                            for name in self.pages()))
+
+        # A new note rewrites only the pages it is listed on
+        before = self.pages()
+        write(self.input_dir / 'c.md', thread(2, title='More logs', topic='splunk'))
+        converter = self.convert()
+        after = self.pages()
+        splunk = converter.hub_index.page_path('topic/Splunk').name
+        self.assertIn('notes: 2', after[splunk][0])
+        keys = converter.hub_index.notes[Path(converter.converted[0]).name][4]
+        changed = {converter.hub_index.page_path(key).name for key in keys}
+        self.assertEqual({name for name in after if after[name] != before.get(name)}, changed)
+
+        # A note deleted by hand is dropped when the notes are next opened,
+        # and pages left empty go
+        (self.output_dir / f"{stems['b.md']}.md").unlink()
+        converter = quietly(ConversationConverter, self.output_dir)
+        quietly(converter.save_index)
+        self.assertFalse(converter.hub_index.page_path('topic/NIST-RMF').exists())
+        self.assertIn('notes: 2', self.page(converter, 'domain/grc'))
+        self.assertNotIn(stems['b.md'], self.page(converter, 'domain/grc'))
+
+    def test_index_rewrites_only_what_changed(self):
+        taxonomy = ConversationConverter.default_taxonomy()
+        state, hub_dir = self.tmp / 'hubs.json', self.tmp / 'hubs'
+        hubs = HubIndex(state, hub_dir, taxonomy)
+        hubs.add('a.md', dict(fields('Alpha', '', ['grc']), activity='learning'), 1, 1)
+        hubs.add('b.md', dict(fields('Beta', '', ['grc'], date='2023-01-05'), activity=''), 1, 1)
+        self.assertEqual(hubs.commit(), 2)
+        page = hubs.page_path('domain/grc').read_text(encoding='utf-8')
+        self.assertLess(page.index('## 2024 (1)'), page.index('## 2023 (1)'))
+        self.assertIn('[[Governance, Risk, and Compliance]]', page)
+        # Same listing with a new stat: state only
+        hubs.add('a.md', dict(fields('Alpha', '', ['grc']), activity='learning'), 2, 2)
+        self.assertEqual(hubs.commit(), 0)
+        # Same name in another folder: links by name are unchanged
+        hubs.rename('b.md', 'sub/b.md')
+        self.assertEqual(hubs.commit(), 0)
+        hubs.rename('sub/b.md', 'sub/beta.md')
+        self.assertEqual(hubs.commit(), 1)
+        hubs.remove('a.md')
+        self.assertEqual(hubs.commit(), 1)
+        self.assertFalse(hubs.page_path('activity/learning').exists())
+
+        reloaded = HubIndex(state, hub_dir, taxonomy)
+        self.assertEqual(reloaded.notes, hubs.notes)
+        self.assertEqual(reloaded.entries(), {'sub/beta.md': (1, 1)})
+        self.assertEqual(reloaded.commit(), 0)
+
+    def test_unreadable_state_rebuilds_the_pages(self):
+        write(self.input_dir / 'a.md', thread(2, title='Log pipeline', topic='splunk'))
+        self.convert(hubs=True)
+        before = {name: text for name, (text, _) in self.pages().items()}
+        stray = self.hub_dir / 'topic_gone_00000000.md'
+        stray.write_text('stale', encoding='utf-8')
+        (self.output_dir / ConversationConverter.HUB_STATE_FILENAME).write_text('{', encoding='utf-8')
+        self.convert()
+        self.assertEqual({name: text for name, (text, _) in self.pages().items()}, before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,300 @@
+"""The packed in-memory indexes (HashIndex, NoteIndex) and the index file."""
+
+import base64
+import contextlib
+import io
+import json
+import random
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from conversation_converter import (ConversationConverter, HashIndex, JsonStream,
+                                    NearDuplicateIndex, NoteIndex, json_chunks)
+
+from tests.test_manifest import statuses, thread, write
+from tests.test_partition import quietly, run
+
+
+def digest(rng: random.Random) -> str:
+    return f'{rng.getrandbits(64):016x}'
+
+
+def signature(rng: random.Random) -> str:
+    return base64.b64encode(rng.randbytes(NearDuplicateIndex.NUM_PERM * 4)).decode('ascii')
+
+
+def random_entry(rng: random.Random) -> list:
+    entry = [digest(rng) if rng.random() < 0.9 else None,
+             rng.randrange(1 << 20), rng.randrange(-1 << 62, 1 << 62)]
+    if rng.random() < 0.5:
+        entry.append(signature(rng) if rng.random() < 0.8 else None)
+    return entry
+
+
+def random_marks(rng: random.Random):
+    return rng.choice([None, '', digest(rng), digest(rng) + digest(rng)])
+
+
+class HashIndexTest(unittest.TestCase):
+
+    def test_matches_dict_through_merges(self):
+        rng = random.Random(9)
+        root = Path('/notes')
+        index, model = HashIndex(root), {}
+        digests = [digest(rng) for _ in range(300)]
+        with mock.patch.object(HashIndex, 'MIN_MERGE', 16):
+            for step in range(3000):
+                key = rng.choice(digests)
+                action = rng.random()
+                if action < 0.5:
+                    path = root / f'note-{step}.md'
+                    index[key] = path
+                    model[key] = path
+                elif action < 0.8 and key in model:
+                    del index[key]
+                    del model[key]
+                elif action < 0.81:
+                    rows = [(rng.choice(digests), f'sub/bulk-{step}-{i}.md') for i in range(20)]
+                    index.load(rows)
+                    model.update((key, root / rel_path) for key, rel_path in rows)
+                else:
+                    self.assertEqual(key in index, key in model)
+                    self.assertEqual(index.get(key), model.get(key))
+                self.assertEqual(len(index), len(model))
+            index.compact()
+            for key in digests:
+                self.assertEqual(index.get(key), model.get(key))
+
+    def test_missing_digest_raises_key_error(self):
+        index = HashIndex(Path('/notes'))
+        with self.assertRaises(KeyError):
+            index['0123456789abcdef']
+        with self.assertRaises(KeyError):
+            del index['0123456789abcdef']
+
+
+class NoteIndexTest(unittest.TestCase):
+
+    def check(self, index: NoteIndex, entries: dict, marks: dict):
+        self.assertEqual(len(index), len(entries))
+        self.assertEqual(dict(index.items()), entries)
+        self.assertEqual(dict(index.turn_items()),
+                         {rel_path: value for rel_path, value in marks.items() if value is not None})
+        self.assertEqual(sorted(index), sorted(entries))
+
+    def exercise(self, seed: int):
+        rng = random.Random(seed)
+        index, entries, marks = NoteIndex(), {}, {}
+        paths = [f'{rng.choice("abc")}/note é {i}.md' for i in range(200)]
+        for step in range(2500):
+            rel_path = rng.choice(paths)
+            action = rng.random()
+            if action < 0.35:
+                entry = random_entry(rng)
+                index[rel_path] = entry
+                entries[rel_path] = entry
+                marks.setdefault(rel_path, None)
+            elif action < 0.5 and rel_path in entries:
+                value = random_marks(rng)
+                index.set_marks(rel_path, value)
+                marks[rel_path] = value
+            elif action < 0.6 and rel_path in entries:
+                size, mtime_ns = rng.randrange(1000), rng.randrange(1000)
+                index.set_stat(rel_path, size, mtime_ns)
+                entries[rel_path][1:3] = size, mtime_ns
+            elif action < 0.75:
+                self.assertEqual(index.pop(rel_path), entries.pop(rel_path, None))
+                marks.pop(rel_path, None)
+            elif action < 0.76:
+                rows = [(rng.choice(paths), random_entry(rng), random_marks(rng))
+                        for _ in range(30)]
+                index.load(rows)
+                for row_path, entry, value in rows:
+                    entries[row_path], marks[row_path] = entry, value
+            else:
+                self.assertEqual(rel_path in index, rel_path in entries)
+                self.assertEqual(index.get(rel_path), entries.get(rel_path))
+                self.assertEqual(index.marks(rel_path), marks.get(rel_path))
+            if step % 250 == 0:
+                self.check(index, entries, marks)
+        index.compact()
+        self.check(index, entries, marks)
+
+    def test_matches_dicts_through_merges(self):
+        with mock.patch.object(NoteIndex, 'MIN_MERGE', 16):
+            self.exercise(11)
+
+    def test_paths_sharing_a_key(self):
+        with mock.patch.object(NoteIndex, 'MIN_MERGE', 16), \
+                mock.patch.object(NoteIndex, '_key', staticmethod(lambda rel_path: len(rel_path) % 3)):
+            self.exercise(12)
+
+    def test_get_returns_a_copy(self):
+        index = NoteIndex()
+        index['a.md'] = ['0123456789abcdef', 1, 2]
+        index.get('a.md')[1] = 99
+        index.compact()
+        index.get('a.md')[1] = 99
+        self.assertEqual(index.get('a.md'), ['0123456789abcdef', 1, 2])
+
+    def test_malformed_entries_and_marks_are_rejected(self):
+        good = ['0123456789abcdef', 10, 20]
+        self.assertEqual(NoteIndex.valid_entry(good), good)
+        self.assertEqual(NoteIndex.valid_entry([None, 1, 2, None]), [None, 1, 2, None])
+        for entry in (['0123456789ABCDEF', 1, 2], ['abc', 1, 2], [None, True, 2],
+                      [None, 1, 1 << 63], [None, 1], {'a': 1}, None):
+            self.assertIsNone(NoteIndex.valid_entry(entry), entry)
+        # Unusable signatures are dropped, keeping the entry
+        self.assertEqual(NoteIndex.valid_entry(good + ['not base64!']), good)
+        self.assertEqual(NoteIndex.valid_entry(good + [base64.b64encode(b'x').decode()]), good)
+        self.assertEqual(NoteIndex.valid_entry(good + [None], keep_signature=False), good)
+        for marks in ('', '0123456789abcdef', '0123456789abcdef' * 2):
+            self.assertTrue(NoteIndex.valid_marks(marks))
+        for marks in (None, 'xyz', '0123456789abcdef0', '0123456789abcdef' * 3):
+            self.assertFalse(NoteIndex.valid_marks(marks))
+
+
+class IndexFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.converter = ConversationConverter(self.tmp, build_index=False)
+
+    def load(self, data) -> NoteIndex:
+        text = data if isinstance(data, str) else json.dumps(data)
+        self.converter.index_path.write_text(text, encoding='utf-8')
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.converter.load_index_file()
+
+    def header(self) -> dict:
+        return {'version': ConversationConverter.INDEX_VERSION,
+                'signatures': NearDuplicateIndex.SCHEME, 'layout': 'flat'}
+
+    def test_json_chunks_match_json_dumps(self):
+        rng = random.Random(3)
+        notes = {f'n{i} "é".md': random_entry(rng) for i in range(50)}
+        data = {'version': 1, 'notes': notes, 'empty': {}, 'list': [1, None]}
+        streamed = dict(data, notes=iter(notes.items()), empty=iter(()))
+        self.assertEqual(''.join(json_chunks(streamed, batch=7)),
+                         json.dumps(data, separators=(',', ':')))
+
+    def test_object_keys_walk(self):
+        stream = JsonStream(io.StringIO('{"a": [1, {"b": 2}], "c" : {}, "d": "x"}'), chunk_size=2)
+        seen = {}
+        for key in stream.object_keys():
+            seen[key] = list(stream.object_keys()) if key == 'c' else stream.value()
+        self.assertEqual(seen, {'a': [1, {'b': 2}], 'c': [], 'd': 'x'})
+
+    def test_save_and_load_round_trip(self):
+        rng = random.Random(4)
+        entries = {f'sub/note-{i}.md': random_entry(rng) for i in range(100)}
+        marks = {rel_path: random_marks(rng) for rel_path in entries}
+        self.converter.note_index.load((rel_path, entry, marks[rel_path])
+                                       for rel_path, entry in entries.items())
+        self.converter._index_dirty = True
+        self.converter.save_index()
+        data = json.loads(self.converter.index_path.read_text(encoding='utf-8'))
+        self.assertEqual(data['notes'], entries)
+        self.assertEqual(data['turns'], {rel_path: value for rel_path, value in marks.items()
+                                         if value is not None})
+        loaded = self.load(self.converter.index_path.read_text(encoding='utf-8'))
+        self.assertEqual(dict(loaded.items()), entries)
+        self.assertEqual(dict(loaded.turn_items()), data['turns'])
+
+    def test_bad_entries_are_dropped(self):
+        data = dict(self.header(),
+                    notes={'a.md': ['0123456789abcdef', 1, 2], 'b.md': ['nope', 1, 2],
+                           'c.md': [None, 1, 2, 'bad signature']},
+                    turn_scheme=ConversationConverter.TURN_SCHEME,
+                    turns={'a.md': 'bad', 'c.md': '', 'gone.md': ''})
+        index = self.load(data)
+        self.assertEqual(dict(index.items()), {'a.md': ['0123456789abcdef', 1, 2],
+                                               'c.md': [None, 1, 2]})
+        self.assertEqual(dict(index.turn_items()), {'c.md': ''})
+
+    def test_other_signature_scheme_drops_signatures(self):
+        entry = ['0123456789abcdef', 1, 2, signature(random.Random(1))]
+        data = dict(self.header(), signatures='minhash-old', notes={'a.md': entry})
+        self.assertEqual(self.load(data).get('a.md'), entry[:3])
+        data['signatures'] = NearDuplicateIndex.SCHEME
+        self.assertEqual(self.load(data).get('a.md'), entry)
+
+    def test_invalid_files_load_empty(self):
+        notes = {'a.md': ['0123456789abcdef', 1, 2]}
+        for text in ('[]', '{"notes": {}', 'not json',
+                     json.dumps({'notes': notes, **self.header()}),
+                     json.dumps(dict(self.header(), version=-1, notes=notes)),
+                     json.dumps(self.header())):
+            self.assertEqual(len(self.load(text)), 0, text)
+        self.assertEqual(len(self.load(dict(self.header(), notes=notes))), 1)
+
+
+class IndexRebuildTest(unittest.TestCase):
+    """The index file against the notes actually on disk."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.input_dir = self.tmp / 'input'
+        self.input_dir.mkdir()
+        self.output_dir = self.tmp / 'output'
+        write(self.input_dir / 'a.md', thread(3))
+        write(self.input_dir / 'b.md', thread(2, title='Other chat', topic='splunk'))
+        self.converter = run(self.input_dir, self.output_dir)
+        self.index_path = self.output_dir / ConversationConverter.INDEX_FILENAME
+        self.entries = json.loads(self.index_path.read_text(encoding='utf-8'))['notes']
+
+    def reopen(self) -> ConversationConverter:
+        converter = quietly(ConversationConverter, self.output_dir)
+        self.assertEqual(json.loads(self.index_path.read_text(encoding='utf-8'))['notes'],
+                         dict(converter.note_index.items()))
+        return converter
+
+    def test_truncated_or_corrupt_file_is_rebuilt(self):
+        text = self.index_path.read_text(encoding='utf-8')
+        for damaged in (text[:len(text) // 2], text[:-1], '\x00' * 100, ''):
+            with self.subTest(damaged=damaged[:20]):
+                self.index_path.write_text(damaged, encoding='utf-8')
+                converter = self.reopen()
+                self.assertEqual(dict(converter.note_index.items()), self.entries)
+                for rel_path, entry in self.entries.items():
+                    self.assertEqual(converter.existing_hashes.get(entry[0]),
+                                     self.output_dir / rel_path)
+
+    def test_notes_changed_on_disk_are_read_again(self):
+        rel_path = sorted(self.entries)[0]
+        note = self.output_dir / rel_path
+        with mock.patch.object(ConversationConverter, 'note_digest',
+                               side_effect=AssertionError('note read')):
+            self.reopen()
+        note.write_text(note.read_text(encoding='utf-8').replace('answer 1', 'answer one'),
+                        encoding='utf-8')
+        converter = self.reopen()
+        entry = converter.note_index.get(rel_path)
+        self.assertNotEqual(entry[0], self.entries[rel_path][0])
+        self.assertEqual(entry[1], note.stat().st_size)
+
+    def test_renamed_and_deleted_notes(self):
+        old = self.output_dir / self.converter.converted[0]
+        new = self.output_dir / 'sub' / 'renamed.md'
+        new.parent.mkdir()
+        old.rename(new)
+        gone = Path(self.converter.converted[1])
+        gone.unlink()
+        converter = self.reopen()
+        self.assertEqual(sorted(converter.note_index), ['sub/renamed.md'])
+        self.assertEqual(converter.note_index.get('sub/renamed.md')[0],
+                         self.entries[old.name][0])
+        self.assertEqual(converter.existing_hashes.get(self.entries[old.name][0]), new)
+        self.assertEqual(len(converter.existing_hashes), 1)
+        # Sources whose notes are gone from where they were written are read again
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'converted', 'b.md': 'converted'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Incremental decoding of VS Code chat JSON exports (JsonStream)."""
+
+import io
+import json
+import random
+import unittest
+
+from conversation_converter import JsonStream, iter_json_sessions
+
+
+class TrickleReader(io.StringIO):
+    """A file that returns at most ``limit`` characters per read."""
+
+    def __init__(self, text: str, limit: int):
+        super().__init__(text)
+        self.limit = limit
+
+    def read(self, size: int = -1) -> str:
+        return super().read(min(size, self.limit) if size >= 0 else self.limit)
+
+
+def session(n: int) -> dict:
+    return {'sessionId': f's{n}', 'creationDate': 1700000000000 + n,
+            'requests': [{'message': {'text': f'question {n} "quoted" \\ é 🚀'},
+                          'response': [{'value': f'answer {n}'}], 'timestamp': 1.5e12 + n}]}
+
+
+class JsonStreamTest(unittest.TestCase):
+
+    def test_array_items_across_chunk_boundaries(self):
+        rng = random.Random(7)
+        values = [0, -12, 3.25e-7, 12345678901234567890, True, None, '', 'a\nbé🚀',
+                  [], {}, [1, [2, [3]]], {'k': 'v' * 50, 'n': [1.0, 2]}]
+        for _ in range(200):
+            items = [rng.choice(values) for _ in range(rng.randint(0, 8))]
+            text = json.dumps(items, indent=rng.choice([None, 1]), ensure_ascii=rng.random() < 0.5)
+            for chunk_size in (1, 2, 3, 7):
+                stream = JsonStream(io.StringIO(text), chunk_size=chunk_size)
+                self.assertEqual(list(stream.array_items()), items, (text, chunk_size))
+                self.assertEqual(stream.peek(), '')
+
+    def test_number_at_buffer_end_is_not_cut_short(self):
+        stream = JsonStream(io.StringIO('[12345, 678]'), chunk_size=3)
+        self.assertEqual(list(stream.array_items()), [12345, 678])
+
+    def test_invalid_json_raises_value_error(self):
+        for text in ('[1, 2', '[1 2]', '[{"a": }]'):
+            with self.assertRaises(ValueError):
+                list(JsonStream(io.StringIO(text), chunk_size=2).array_items())
+
+
+class IterJsonSessionsTest(unittest.TestCase):
+
+    def sessions(self, data, limit: int = 5) -> list:
+        return list(iter_json_sessions(TrickleReader(json.dumps(data), limit)))
+
+    def test_top_level_array(self):
+        data = [session(1), 'not a session', session(2)]
+        self.assertEqual(self.sessions(data), [session(1), session(2)])
+
+    def test_session_list_under_known_keys(self):
+        for key in ('sessions', 'chatSessions', 'conversations'):
+            data = {'version': 3, key: [session(1), session(2)], 'extra': {'requests': []}}
+            self.assertEqual(self.sessions(data), [session(1), session(2)], key)
+
+    def test_single_exported_session(self):
+        self.assertEqual(self.sessions(session(4)), [session(4)])
+
+    def test_object_without_sessions_yields_nothing(self):
+        self.assertEqual(self.sessions({'version': 3, 'requests': 'none'}), [])
+        self.assertEqual(self.sessions({}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Keyword hits and classification match the per-keyword ``in`` checks they replace."""
+
+import random
+import unittest
+
+from conversation_converter import ConversationConverter, KeywordMatcher
+
+from tests.test_document import FIXTURES
+
+C = ConversationConverter
+
+
+def in_classify_domains(content: str) -> list:
+    content_lower = content.lower()
+    matched_domains = []
+    for domain, keywords in C.DOMAIN_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in content_lower:
+                matched_domains.append(domain)
+                break
+    return matched_domains if matched_domains else ['general']
+
+
+def in_classify_activity(content: str) -> str:
+    content_lower = content.lower()
+    for activity, keywords in C.ACTIVITY_KEYWORDS.items():
+        for keyword in keywords:
+            if keyword in content_lower:
+                return activity
+    return 'reference'
+
+
+def in_extract_key_topics(content: str) -> list:
+    topics = []
+    content_lower = content.lower()
+    if 'nist' in content_lower:
+        if 'rmf' in content_lower:
+            topics.append('NIST-RMF')
+        if '800-53' in content_lower:
+            topics.append('NIST-800-53')
+        if 'csf' in content_lower or 'cybersecurity framework' in content_lower:
+            topics.append('NIST-CSF')
+    if 'mitre' in content_lower or 'att&ck' in content_lower:
+        topics.append('MITRE ATT&CK')
+    if 'cvss' in content_lower:
+        topics.append('CVSS')
+    if 'iso 27001' in content_lower or 'iso27001' in content_lower:
+        topics.append('ISO 27001')
+    tools = ['wireshark', 'nmap', 'splunk', 'metasploit', 'burp suite',
+             'snort', 'suricata', 'zeek', 'elk', 'siem']
+    for tool in tools:
+        if tool in content_lower:
+            topics.append(tool.title())
+    return topics
+
+
+def expected_hits(keywords: list, text: str) -> dict:
+    """First offset and number of (possibly overlapping) occurrences, one ``find`` at a time."""
+    hits = {}
+    for keyword in keywords:
+        start = text.find(keyword)
+        if start >= 0:
+            hits[keyword] = [start, 0]
+        while start >= 0:
+            hits[keyword][1] += 1
+            start = text.find(keyword, start + 1)
+    return hits
+
+
+def chunked(matcher: KeywordMatcher, text: str) -> dict:
+    hits, offset = {}, 0
+    for line in text.splitlines(keepends=True):
+        matcher.scan_chunk(line, hits, offset)
+        offset += len(line)
+    return hits
+
+
+class KeywordMatcherTest(unittest.TestCase):
+
+    def test_overlapping_keywords(self):
+        rng = random.Random(2)
+        for _ in range(3000):
+            # A small alphabet makes keywords overlap, nest and repeat
+            keywords = [''.join(rng.choice('ab c') for _ in range(rng.randint(1, 4)))
+                        for _ in range(rng.randint(1, 8))]
+            text = ''.join(rng.choice('ab c\n') for _ in range(rng.randint(0, 60)))
+            matcher = KeywordMatcher(keywords)
+            expected = expected_hits(matcher.keywords, text)
+            self.assertEqual(dict(matcher.scan(text)), expected, (keywords, text))
+            self.assertEqual(chunked(matcher, text), expected, (keywords, text))
+
+    def test_built_in_taxonomy(self):
+        converter = ConversationConverter(None)
+        keywords = converter.taxonomy.matcher().keywords
+        rng = random.Random(3)
+        texts = [path.read_text(encoding='utf-8') for path in (FIXTURES / 'corpus').iterdir()]
+        texts += [' '.join(rng.choice(keywords + ['x', 'the', '\n']) for _ in range(30))
+                  for _ in range(500)]
+        for text in texts:
+            lower = text.lower()
+            hits = converter.scan_keywords(text)
+            self.assertEqual(dict(hits), expected_hits(keywords, lower))
+            self.assertEqual(chunked(converter.taxonomy.matcher(), lower), dict(hits))
+            self.assertEqual(converter.classify_domains(text, hits), in_classify_domains(text))
+            self.assertEqual(converter.classify_activity(text, hits), in_classify_activity(text))
+            self.assertEqual(converter.extract_key_topics(text, hits), in_extract_key_topics(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""Sharded note layouts and --migrate-layout."""
+
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from conversation_converter import ConversationConverter, SearchIndex
+
+from tests.test_manifest import manifest, statuses, thread, write
+from tests.test_partition import quietly
+
+
+class LayoutTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.input_dir = self.tmp / 'input'
+        self.input_dir.mkdir()
+        self.output_dir = self.tmp / 'output'
+        write(self.input_dir / 'a.md', thread(3))
+        write(self.input_dir / 'b.md', thread(2, title='Other chat', topic='splunk'))
+
+    def convert(self, **kwargs) -> ConversationConverter:
+        converter = quietly(ConversationConverter, self.output_dir, **kwargs)
+        quietly(converter.convert_directory, self.input_dir)
+        quietly(converter.save_index)
+        if converter.search_index is not None:
+            self.addCleanup(converter.search_index.close)
+        return converter
+
+    def index(self) -> dict:
+        return json.loads((self.output_dir / ConversationConverter.INDEX_FILENAME).read_text())
+
+    def notes(self) -> list:
+        return sorted(path.relative_to(self.output_dir).as_posix()
+                      for path in self.output_dir.rglob('*.md')
+                      if ConversationConverter.HUB_DIRNAME not in path.parts)
+
+    def test_new_notes_follow_the_layout(self):
+        self.convert(layout='hash')
+        self.assertEqual(self.index()['layout'], 'hash')
+        for rel_path in self.notes():
+            shard, name = rel_path.split('/')
+            self.assertEqual(shard, name[-11:-9])
+        # The recorded layout is kept without asking again
+        write(self.input_dir / 'c.md', thread(2, title='Third chat', topic='cvss'))
+        converter = self.convert()
+        self.assertEqual(converter.layout, 'hash')
+        self.assertEqual(len(self.notes()), 3)
+        self.assertTrue(all('/' in rel_path for rel_path in self.notes()))
+
+    def test_changing_layout_needs_migration(self):
+        self.convert()
+        with self.assertRaises(ValueError):
+            quietly(ConversationConverter, self.output_dir, layout='date')
+        self.assertEqual(self.index()['layout'], 'flat')
+
+    def test_migration_moves_notes_and_their_entries(self):
+        self.output_dir.mkdir()
+        (self.output_dir / 'my-page.md').write_text('# Kept where it is\n', encoding='utf-8')
+        self.convert(search_index=True, hubs=True)
+        before = self.index()['notes']
+        owners = {source: entry[2] for source, entry in manifest(self.output_dir).items()}
+        hub_pages = {path.name: path.read_bytes()
+                     for path in (self.output_dir / ConversationConverter.HUB_DIRNAME).glob('*.md')}
+
+        with mock.patch.object(ConversationConverter, 'note_digest',
+                               side_effect=AssertionError('note read')):
+            converter = quietly(ConversationConverter, self.output_dir, layout='date',
+                                migrate_layout=True)
+            quietly(converter.save_index)
+            converter.search_index.close()
+        moved = {rel_path: f'2024/03/{rel_path}' for rel_path in before if rel_path != 'my-page.md'}
+        self.assertEqual(self.notes(), sorted([*moved.values(), 'my-page.md']))
+        after = self.index()
+        self.assertEqual(after['layout'], 'date')
+        # Renames keep size and mtime: entries move unchanged
+        self.assertEqual(after['notes'], {moved.get(rel_path, rel_path): entry
+                                          for rel_path, entry in before.items()})
+        self.assertEqual({source: entry[2] for source, entry in manifest(self.output_dir).items()},
+                         {source: moved[rel_path] for source, rel_path in owners.items()})
+        index = SearchIndex(self.output_dir / ConversationConverter.SEARCH_FILENAME)
+        self.addCleanup(index.close)
+        self.assertEqual(sorted(index.entries()), sorted(moved.values()))
+        # Hub pages link notes by name, which did not change
+        self.assertEqual({path.name: path.read_bytes() for path in
+                          (self.output_dir / ConversationConverter.HUB_DIRNAME).glob('*.md')},
+                         hub_pages)
+
+        converter = self.convert()
+        self.assertEqual(statuses(converter), {'a.md': 'unchanged', 'b.md': 'unchanged'})
+
+        # Migrating on drops the directories it empties
+        converter = quietly(ConversationConverter, self.output_dir, layout='flat',
+                            migrate_layout=True)
+        quietly(converter.save_index)
+        self.assertEqual(self.notes(), sorted(before))
+        self.assertFalse((self.output_dir / '2024').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""The source manifest: unchanged sources are skipped, changed ones replace their note."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from conversation_converter import ConversationConverter
+
+from tests.test_partition import quietly, run
+
+
+def thread(turns: int, title: str = 'Chat about risk', topic: str = 'nist rmf') -> str:
+    """A conversation export with ``turns`` user turns (long enough to compare)."""
+    lines = [f'# {title}', '', 'Date: 2024-03-01', '', '## Conversation', '']
+    for turn in range(turns):
+        lines += [f'User: question number {turn} about {topic} and how the controls '
+                  f'map to risk in a cloud deployment', '',
+                  f'Assistant: answer {turn} with plenty of explanation text to make '
+                  f'it long enough', '']
+    return '\n'.join(lines)
+
+
+def write(path: Path, text: str, mtime: int = 1_700_000_000):
+    path.write_text(text, encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+
+
+def statuses(converter: ConversationConverter) -> dict:
+    return {Path(result.source).name: result.status for result in converter.results}
+
+
+def manifest(output_dir: Path) -> dict:
+    data = json.loads((output_dir / ConversationConverter.MANIFEST_FILENAME).read_text())
+    return {Path(source).name: entry for source, entry in data['sources'].items()}
+
+
+def conversations(output_dir: Path) -> list:
+    return sorted(path.read_text(encoding='utf-8').split('## Conversation', 1)[1]
+                  for path in output_dir.glob('*.md'))
+
+
+class ManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.input_dir = self.tmp / 'input'
+        self.input_dir.mkdir()
+        self.output_dir = self.tmp / 'output'
+
+    def test_unchanged_sources_are_skipped_by_stat(self):
+        write(self.input_dir / 'a.md', thread(3))
+        write(self.input_dir / 'b.md', thread(2, title='Other chat', topic='splunk'))
+        run(self.input_dir, self.output_dir)
+        before = conversations(self.output_dir)
+        with mock.patch.object(ConversationConverter, 'read_source',
+                               side_effect=AssertionError('source read')):
+            converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'unchanged', 'b.md': 'unchanged'})
+        self.assertEqual(conversations(self.output_dir), before)
+
+    def test_changed_source_replaces_its_note(self):
+        write(self.input_dir / 'a.md', thread(3))
+        run(self.input_dir, self.output_dir)
+        old_note = manifest(self.output_dir)['a.md'][2]
+        write(self.input_dir / 'a.md', thread(3, title='Renamed chat', topic='cvss'),
+              mtime=1_700_000_100)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'converted'})
+        self.assertEqual(converter.replaced, [str(self.output_dir / old_note)])
+        new_note = manifest(self.output_dir)['a.md'][2]
+        self.assertNotEqual(new_note, old_note)
+        self.assertEqual([path.name for path in self.output_dir.glob('*.md')], [new_note])
+
+    def test_sources_sharing_a_rewritten_note_are_converted_again(self):
+        write(self.input_dir / 'a.md', thread(3))
+        write(self.input_dir / 'b.md', thread(3))
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'converted', 'b.md': 'duplicate'})
+        entries = manifest(self.output_dir)
+        self.assertEqual(entries['b.md'][2], entries['a.md'][2])
+        # Same title, new content: a.md's note is rewritten in place
+        write(self.input_dir / 'a.md', thread(3, topic='cvss'), mtime=1_700_000_100)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'converted', 'b.md': 'converted'})
+        # Both conversations are kept, as a first run would keep them
+        run(self.input_dir, self.tmp / 'fresh')
+        self.assertEqual(conversations(self.output_dir), conversations(self.tmp / 'fresh'))
+        self.assertEqual(len(conversations(self.output_dir)), 2)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'unchanged', 'b.md': 'unchanged'})
+
+    def test_deduplicated_source_leaves_the_note_alone_when_it_changes(self):
+        write(self.input_dir / 'a.md', thread(3))
+        write(self.input_dir / 'b.md', thread(3))
+        run(self.input_dir, self.output_dir)
+        shared = manifest(self.output_dir)['a.md'][2]
+        # b.md only pointed at a.md's note: neither rewriting nor shrinking it touches that note
+        for text in (thread(2, title='Other chat', topic='splunk'), thread(2)):
+            write(self.input_dir / 'b.md', text, mtime=1_700_000_100 + len(text))
+            converter = run(self.input_dir, self.output_dir)
+            self.assertEqual(converter.replaced, [])
+            self.assertEqual(manifest(self.output_dir)['a.md'][2], shared)
+            self.assertIn('question number 2 about nist rmf',
+                          (self.output_dir / shared).read_text(encoding='utf-8'))
+
+    def test_manifest_without_note_digests_is_still_used(self):
+        write(self.input_dir / 'a.md', thread(3))
+        run(self.input_dir, self.output_dir)
+        path = self.output_dir / ConversationConverter.MANIFEST_FILENAME
+        data = json.loads(path.read_text())
+        data['sources'] = {source: entry[:3] for source, entry in data['sources'].items()}
+        path.write_text(json.dumps(data))
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'unchanged'})
+        write(self.input_dir / 'a.md', thread(4), mtime=1_700_000_100)
+        converter = run(self.input_dir, self.output_dir)
+        self.assertEqual(statuses(converter), {'a.md': 'converted'})
+        self.assertEqual(len(list(self.output_dir.glob('*.md'))), 1)
+        self.assertEqual(quietly(ConversationConverter, self.output_dir).source_manifest,
+                         converter.source_manifest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""Near-duplicate detection: MinHash signatures compared against a threshold."""
+
+import json
+import random
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Optional
+
+from conversation_converter import ConversationConverter, NearDuplicateIndex
+
+from tests.test_manifest import statuses, write
+from tests.test_partition import quietly
+
+RNG = random.Random(8)
+WORDS = [''.join(RNG.choice('abcdefghijklmnop') for _ in range(6)) for _ in range(2000)]
+BODY = [RNG.choice(WORDS) for _ in range(600)]
+
+
+def edited(edits: int) -> list:
+    """BODY with ``edits`` words replaced."""
+    words = list(BODY)
+    for i in random.Random(edits).sample(range(len(words)), edits):
+        words[i] = f'edit{i}'
+    return words
+
+
+def export(title: str, words: list) -> str:
+    half = len(words) // 2
+    return '\n'.join([f'# {title}', '', 'Date: 2024-03-01', '', '## Conversation', '',
+                      f"User: {' '.join(words[:half])}", '',
+                      f"Assistant: {' '.join(words[half:])}", ''])
+
+
+class NearDuplicateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.input_dir = self.tmp / 'input'
+        self.input_dir.mkdir()
+        self.output_dir = self.tmp / 'output'
+
+    def convert(self, threshold: Optional[float]) -> ConversationConverter:
+        converter = quietly(ConversationConverter, self.output_dir,
+                            near_duplicate_threshold=threshold)
+        quietly(converter.convert_directory, self.input_dir)
+        quietly(converter.save_index)
+        return converter
+
+    def test_bands_cut_off_below_the_threshold(self):
+        for threshold in (0.3, 0.5, 0.8, 0.9, 0.95):
+            bands, rows = NearDuplicateIndex.choose_bands(threshold, NearDuplicateIndex.NUM_PERM)
+            self.assertEqual(bands * rows, NearDuplicateIndex.NUM_PERM)
+            self.assertLessEqual((1 / bands) ** (1 / rows), threshold)
+
+    def test_similar_exports_are_near_duplicates(self):
+        write(self.input_dir / 'a.md', export('Original', BODY))
+        write(self.input_dir / 'b.md', export('Touched up', edited(3)))
+        write(self.input_dir / 'c.md', export('Rewritten', edited(150)))
+        converter = self.convert(0.8)
+        self.assertEqual(statuses(converter),
+                         {'a.md': 'converted', 'b.md': 'near-duplicate', 'c.md': 'converted'})
+        (source, note, similarity), = converter.near_duplicates
+        self.assertEqual(Path(source).name, 'b.md')
+        self.assertEqual(note, converter.converted[0])
+        self.assertGreaterEqual(similarity, 0.8)
+        self.assertEqual(len(list(self.output_dir.glob('*.md'))), 2)
+
+    def test_threshold_decides(self):
+        write(self.input_dir / 'a.md', export('Original', BODY))
+        write(self.input_dir / 'b.md', export('Edited', edited(10)))
+        similarity = self.convert(0.5).near_duplicates[0][2]
+        self.assertLess(similarity, 0.95)
+        for threshold, status in ((similarity, 'near-duplicate'), (0.95, 'converted'),
+                                  (None, 'converted')):
+            with self.subTest(threshold=threshold):
+                shutil.rmtree(self.output_dir)
+                self.assertEqual(statuses(self.convert(threshold))['b.md'], status)
+
+    def test_signatures_persist_across_runs(self):
+        write(self.input_dir / 'a.md', export('Original', BODY))
+        self.convert(0.8)
+        data = json.loads((self.output_dir / ConversationConverter.INDEX_FILENAME).read_text())
+        self.assertEqual(data['signatures'], NearDuplicateIndex.SCHEME)
+        (entry,) = data['notes'].values()
+        # The next run compares against the stored signature
+        converter = quietly(ConversationConverter, self.output_dir, near_duplicate_threshold=0.8)
+        self.assertEqual(list(converter.near_index.signatures.values()),
+                         [NearDuplicateIndex.decode(entry[3])])
+        write(self.input_dir / 'b.md', export('Touched up', edited(3)))
+        converter = self.convert(0.8)
+        self.assertEqual(statuses(converter), {'a.md': 'unchanged', 'b.md': 'near-duplicate'})
+        self.assertEqual(len(converter.near_index.signatures), 1)
+        converter = self.convert(0.8)
+        self.assertEqual(statuses(converter), {'a.md': 'unchanged', 'b.md': 'unchanged'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Partitioned runs (--partition i/N) merged with merge_shards match a serial run."""
+
+import contextlib
+import io
+import json
+import random
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from conversation_converter import ConversationConverter
+
+from tests.test_document import FIXTURES
+from tests.test_streaming import random_conversation, write_source
+
+NODES = 3
+
+
+def quietly(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def run(input_dir: Path, output_dir: Path, partition=None, **kwargs) -> ConversationConverter:
+    converter = quietly(ConversationConverter, output_dir, partition=partition)
+    quietly(converter.convert_directory, input_dir, **kwargs)
+    quietly(converter.save_index)
+    return converter
+
+
+def state(output_dir: Path) -> dict:
+    notes = {path.relative_to(output_dir).as_posix(): path.read_bytes()
+             for path in output_dir.rglob('*.md')}
+    index = json.loads((output_dir / ConversationConverter.INDEX_FILENAME).read_text())
+    # Notes were written at different times in the two runs
+    index['notes'] = {rel: entry[:2] + entry[3:] for rel, entry in index['notes'].items()}
+    manifest = json.loads((output_dir / ConversationConverter.MANIFEST_FILENAME).read_text())
+    return {'notes': notes, 'index': index, 'manifest': manifest}
+
+
+class PartitionMergeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.input_dir = self.tmp / 'input'
+        self.input_dir.mkdir()
+        for source in (FIXTURES / 'corpus').iterdir():
+            write_source(self.input_dir / source.name, source.read_bytes().decode('utf-8'))
+        rng = random.Random(21)
+        for i in range(40):
+            text = random_conversation(rng)
+            write_source(self.input_dir / f'random-{i:02d}.md', text)
+            if i % 4 == 0:
+                # Same content under other names: likely owned by other nodes
+                write_source(self.input_dir / f'copy-{i:02d}.md', text)
+
+    def partitioned(self, output_dir: Path):
+        for node in range(1, NODES + 1):
+            run(self.input_dir, output_dir, partition=(node, NODES))
+        converter = quietly(ConversationConverter, output_dir, build_index=False)
+        return quietly(converter.merge_shards)
+
+    def test_merged_partitions_match_serial_run(self):
+        serial, merged = self.tmp / 'serial', self.tmp / 'merged'
+        run(self.input_dir, serial)
+        counts = self.partitioned(merged)
+        self.assertEqual(counts['shards'], NODES)
+        self.assertGreater(counts['duplicates'], 0)
+        self.assertFalse((merged / ConversationConverter.SHARD_DIRNAME).exists())
+        self.assertEqual(state(merged), state(serial))
+
+    def test_run_after_merge_reads_nothing(self):
+        merged = self.tmp / 'merged'
+        self.partitioned(merged)
+        before = state(merged)
+        converter = run(self.input_dir, merged)
+        self.assertEqual({result.status for result in converter.results}, {'unchanged'})
+        self.assertEqual(state(merged), before)
+
+    def test_partition_run_keeps_temporary_notes(self):
+        output_dir = self.tmp / 'shared'
+        output_dir.mkdir()
+        sibling_write = output_dir / '.2024-01-01_note_0badf00d.tmp.md'
+        sibling_write.write_text('being written by another node')
+        run(self.input_dir, output_dir, partition=(1, NODES))
+        self.assertTrue(sibling_write.exists())
+        quietly(ConversationConverter, output_dir)
+        self.assertFalse(sibling_write.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""The full-text search index: kept in step with the notes, ranked and filtered."""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from conversation_converter import ConversationConverter, SearchIndex
+
+from tests.test_manifest import thread, write
+from tests.test_partition import quietly
+
+
+def fields(title: str, body: str, domains=(), date: str = '2024-03-01') -> dict:
+    return {'title': title, 'date': date, 'domains': list(domains), 'topics': [], 'body': body}
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.input_dir = self.tmp / 'input'
+        self.input_dir.mkdir()
+        self.output_dir = self.tmp / 'output'
+
+    def convert(self, **kwargs) -> ConversationConverter:
+        converter = quietly(ConversationConverter, self.output_dir, **kwargs)
+        quietly(converter.convert_directory, self.input_dir)
+        quietly(converter.save_index)
+        self.addCleanup(converter.search_index.close)
+        return converter
+
+    def paths(self, query: str, **kwargs) -> list:
+        index = SearchIndex(self.output_dir / ConversationConverter.SEARCH_FILENAME)
+        self.addCleanup(index.close)
+        return [match['path'] for match in index.search(query, **kwargs)]
+
+    def test_notes_are_indexed_as_they_are_written(self):
+        write(self.input_dir / 'a.md', thread(2, title='Log pipeline', topic='splunk'))
+        write(self.input_dir / 'b.md', thread(2, title='Risk register', topic='nist rmf'))
+        converter = self.convert(search_index=True)
+        notes = {Path(result.path).name: Path(result.source).name
+                 for result in converter.results}
+        self.assertEqual([notes[path] for path in self.paths('splunk')], ['a.md'])
+        self.assertEqual([notes[path] for path in self.paths('register')], ['b.md'])
+        self.assertEqual(self.paths('splunk', since='2024-03-02'), [])
+        self.assertEqual(len(self.paths('splunk', until='2024-03-01')), 1)
+
+    def test_notes_changed_or_removed_outside_a_run_are_refreshed(self):
+        write(self.input_dir / 'a.md', thread(2, title='Log pipeline', topic='splunk'))
+        write(self.input_dir / 'b.md', thread(2, title='Risk register', topic='nist rmf'))
+        self.convert(search_index=True)
+        edited, removed = sorted(self.output_dir.glob('*.md'))
+        edited.write_text(edited.read_text(encoding='utf-8').replace('answer 1', 'answer quokka'),
+                          encoding='utf-8')
+        removed.unlink()
+        # An existing index is reopened (and synced) without asking for it
+        converter = quietly(ConversationConverter, self.output_dir)
+        self.addCleanup(converter.search_index.close)
+        quietly(converter.save_index)
+        self.assertEqual(self.paths('quokka'), [edited.name])
+        self.assertEqual(self.paths('register OR pipeline'), [edited.name])
+
+    def test_title_and_topic_matches_rank_first(self):
+        index = SearchIndex(self.tmp / 'search.sqlite')
+        self.addCleanup(index.close)
+        index.add('body.md', fields('Chat about logs', 'splunk queries and splunk alerts'), 1, 1)
+        index.add('title.md', fields('Splunk dashboards', 'panels and alerts'), 1, 1)
+        index.add('other.md', fields('Unrelated', 'nothing here'), 1, 1)
+        matches = index.search('splunk')
+        self.assertEqual([match['path'] for match in matches], ['title.md', 'body.md'])
+        self.assertGreater(matches[0]['score'], matches[1]['score'])
+        self.assertEqual(matches[1]['snippet'].count('[splunk]'), 2)
+
+    def test_unparseable_queries_are_searched_literally(self):
+        index = SearchIndex(self.tmp / 'search.sqlite')
+        self.addCleanup(index.close)
+        index.add('a.md', fields('Controls', 'mapping nist 800-53 controls'), 1, 1)
+        index.add('b.md', fields('Other', 'the 800 and 53 apart, "quoted" AND'), 1, 1)
+        self.assertEqual([match['path'] for match in index.search('800-53')], ['a.md'])
+        self.assertEqual([match['path'] for match in index.search('"quoted')], ['b.md'])
+        self.assertEqual([match['path'] for match in index.search('AND')], ['b.md'])
+        self.assertEqual(index.search('   '), [])
+
+    def test_domain_filter_is_literal(self):
+        index = SearchIndex(self.tmp / 'search.sqlite')
+        self.addCleanup(index.close)
+        for path, domains in (('under.md', ['cloud_sec']), ('other.md', ['cloudxsec']),
+                              ('percent.md', ['100%']), ('both.md', ['grc', 'cloud_sec'])):
+            index.add(path, fields('Note', 'shared words', domains), 1, 1)
+        search = lambda domain: sorted(match['path'] for match in index.search('shared', domain=domain))
+        self.assertEqual(search('cloud_sec'), ['both.md', 'under.md'])
+        self.assertEqual(search('cloudxsec'), ['other.md'])
+        self.assertEqual(search('100%'), ['percent.md'])
+        self.assertEqual(search('%'), [])
+        self.assertEqual(search('grc'), ['both.md'])
+        self.assertEqual(search('cloud'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""ConversionService: silent, in-memory conversion with dedup across calls."""
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from conversation_converter import ConversionService, HashIndex
+
+from tests.test_document import FIXTURES
+from tests.test_near_duplicates import BODY, edited, export
+from tests.test_partition import run
+from tests.test_streaming import FIXED_MTIME, write_source
+
+CORPUS = sorted((FIXTURES / 'corpus').iterdir())
+
+
+class ConversionServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def test_prints_and_writes_nothing(self):
+        cwd = os.getcwd()
+        os.chdir(self.tmp)
+        self.addCleanup(os.chdir, cwd)
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            service = ConversionService(near_duplicate_threshold=0.8)
+            results = [service.convert(path.read_text(encoding='utf-8'), name=path.name,
+                                       mtime=FIXED_MTIME) for path in CORPUS]
+        self.assertEqual((out.getvalue(), err.getvalue()), ('', ''))
+        self.assertEqual(os.listdir(self.tmp), [])
+        self.assertTrue(all(result['output'] for result in results
+                            if result['status'] != 'duplicate'))
+
+    def test_notes_match_a_directory_run(self):
+        input_dir = self.tmp / 'input'
+        input_dir.mkdir()
+        for path in CORPUS:
+            write_source(input_dir / path.name, path.read_bytes().decode('utf-8'))
+        output_dir = self.tmp / 'output'
+        run(input_dir, output_dir)
+        expected = {path.name: path.read_text(encoding='utf-8')
+                    for path in output_dir.glob('*.md')}
+        service = ConversionService()
+        results = [service.convert((input_dir / path.name).read_text(encoding='utf-8'),
+                                   name=path.name, mtime=FIXED_MTIME) for path in CORPUS]
+        self.assertEqual({result['filename']: result['output'] for result in results
+                          if result['status'] == 'converted'}, expected)
+
+    def test_duplicates_are_found_across_calls(self):
+        for dedup_index in (None, HashIndex(Path('notes'))):
+            with self.subTest(type(dedup_index).__name__):
+                service = ConversionService(dedup_index=dedup_index)
+                text = CORPUS[0].read_text(encoding='utf-8')
+                first = service.convert(text, name='a.md')
+                second = service.convert(text, name='b.md')
+                self.assertEqual(first['status'], 'converted')
+                self.assertEqual(second, {'status': 'duplicate', 'source': 'b.md',
+                                          'content_hash': first['content_hash'],
+                                          'duplicate_of': service.dedup_index.get(
+                                              first['content_hash'])})
+                self.assertEqual(Path(second['duplicate_of']).name, first['filename'])
+                self.assertEqual(list(service.convert_many([text]))[0]['status'], 'duplicate')
+
+    def test_dedup_off_neither_checks_nor_records(self):
+        service = ConversionService()
+        text = CORPUS[0].read_text(encoding='utf-8')
+        for _ in range(2):
+            self.assertEqual(service.convert(text, dedup=False)['status'], 'converted')
+        self.assertEqual(len(service.dedup_index), 0)
+        self.assertEqual(service.convert(text)['status'], 'converted')
+
+    def test_near_duplicates(self):
+        service = ConversionService(near_duplicate_threshold=0.8)
+        first = service.convert(export('Original', BODY), name='a.md')
+        second = service.convert(export('Touched up', edited(3)), name='b.md')
+        self.assertEqual(second['status'], 'near-duplicate')
+        self.assertEqual(second['duplicate_of'], first['filename'])
+        self.assertGreaterEqual(second['similarity'], 0.8)
+
+    def test_one_of_several_threads_converts(self):
+        service = ConversionService()
+        text = CORPUS[0].read_text(encoding='utf-8')
+        statuses = []
+        barrier = threading.Barrier(8)
+
+        def convert():
+            barrier.wait()
+            statuses.append(service.convert(text)['status'])
+        threads = [threading.Thread(target=convert) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(statuses), ['converted'] + ['duplicate'] * 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""Streamed conversion (large sources) must match the in-memory path exactly.
+
+``StreamedDocument``, ``StreamedBody`` and ``NoteStream`` re-implement what
+``ConversationDocument`` and ``render_note`` do on a loaded text, so every
+change to one side has to be made to the other. These tests render the
+same inputs both ways and compare everything the converter keeps.
+"""
+
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from conversation_converter import ConversationConverter, NoteStream, StreamedBody
+
+from tests.test_document import FIXTURES
+
+FRAGMENTS = [
+    '', ' ', '  ', '\t', '## Conversation', '# Title here', '## Chat session', '---', '--- x',
+    '----', 'User: hello there how are you doing today friend', 'user:', 'User:   ',
+    'Q: what is nist rmf and how does it apply', 'A: answer text', 'Assistant: sure thing',
+    'question: why is the sky blue and what is risk', '```json', '```', 'conversation',
+    'Perplexity', 'github copilot', '2024-05-06', 'Σίσυφος ΣΑΣ', 'İstanbul',
+    'some words nmap wireshark splunk mitre att&ck cvss', 'x## Conversation', '**User**: bold',
+    '  User: indented', 'Date: 2023-01-01', '> quote line long enough to be a title maybe',
+    'lorem ipsum dolor sit amet consectetur', '# Notes about ## Conversation',
+    'User: please explain this whole ## Conversation', '## Conversation ## Conversation',
+]
+FIXED_MTIME = 1_700_000_000
+
+
+def random_conversation(rng: random.Random) -> str:
+    count = rng.randint(0, 40)
+    lines = [rng.choice(FRAGMENTS) for _ in range(count)]
+    if count and rng.random() < 0.5:
+        at = rng.randrange(count)
+        lines[at:at] = ['## Conversation', '']
+    newline = rng.choice(['\n', '\n', '\r\n', '\r'])
+    text = newline.join(lines)
+    if rng.random() < 0.5:
+        text += newline * rng.randint(1, 3)
+    return text
+
+
+def write_source(path: Path, text: str):
+    path.write_bytes(text.encode('utf-8'))
+    os.utime(path, (FIXED_MTIME, FIXED_MTIME))
+
+
+class StreamedRenderTest(unittest.TestCase):
+
+    def setUp(self):
+        # Small shingle batches exercise the incremental MinHash merging
+        patcher = mock.patch.object(StreamedBody, 'SHINGLE_BATCH', 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.converter = ConversationConverter(None, near_duplicate_threshold=0.8)
+
+    def render(self, path: Path, streamed: bool) -> tuple:
+        converter = self.converter
+        if streamed:
+            doc = converter.parse_stream(path)
+            content_hash = doc.content_hash
+        else:
+            content = path.read_text(encoding='utf-8')
+            doc = converter.parse(content)
+            content_hash = converter.conversation_hash(content, doc)
+        note = dict(converter.render_note(path, doc))
+        output = note.pop('output')
+        if streamed:
+            self.assertIsInstance(output, NoteStream)
+            text, digest = ''.join(output.pieces()), output.body.digest
+        else:
+            text, digest = output, converter.note_digest(output)
+        return content_hash, text, digest, note, converter.note_fields(output)
+
+    def test_random_conversations_render_identically(self):
+        rng = random.Random(23)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'conversation.md'
+            for _ in range(400):
+                text = random_conversation(rng)
+                write_source(path, text)
+                self.assertEqual(self.render(path, True), self.render(path, False), repr(text))
+
+
+class StreamedDirectoryTest(unittest.TestCase):
+
+    def convert(self, input_dir: Path, output_dir: Path, stream_threshold):
+        converter = ConversationConverter(output_dir, near_duplicate_threshold=0.8, hubs=True,
+                                          stream_threshold=stream_threshold)
+        with contextlib.redirect_stdout(io.StringIO()):
+            converter.convert_directory(input_dir)
+            converter.save_index()
+
+    @staticmethod
+    def state(output_dir: Path) -> dict:
+        notes = {path.relative_to(output_dir).as_posix(): path.read_bytes()
+                 for path in output_dir.rglob('*.md')}
+        index = json.loads((output_dir / ConversationConverter.INDEX_FILENAME).read_text())
+        # mtimes differ between the two runs
+        index['notes'] = {rel: entry[:2] + entry[3:] for rel, entry in index['notes'].items()}
+        hubs = json.loads((output_dir / ConversationConverter.HUB_STATE_FILENAME).read_text())
+        hubs = {rel: entry[:1] + entry[2:] for rel, entry in hubs['notes'].items()}
+        return {'notes': notes, 'index': index, 'hubs': hubs}
+
+    def test_directory_converts_identically(self):
+        rng = random.Random(7)
+        with tempfile.TemporaryDirectory() as tmp:
+            input_dir = Path(tmp) / 'input'
+            input_dir.mkdir()
+            for source in (FIXTURES / 'corpus').iterdir():
+                write_source(input_dir / source.name, source.read_bytes().decode('utf-8'))
+            for i in range(60):
+                write_source(input_dir / f'random-{i:02d}.md', random_conversation(rng))
+            in_memory, streamed = Path(tmp) / 'in-memory', Path(tmp) / 'streamed'
+            self.convert(input_dir, in_memory, None)
+            self.convert(input_dir, streamed, 0)
+            expected = self.state(in_memory)
+            self.assertGreater(len(expected['notes']), len(list((FIXTURES / 'corpus').iterdir())))
+            self.assertEqual(self.state(streamed), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Taxonomies loaded from TOML or JSON files."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from conversation_converter import ConversationConverter, Taxonomy
+
+EXAMPLE = Path(__file__).resolve().parent.parent / 'docs' / 'taxonomy.example.toml'
+
+
+def rules(taxonomy: Taxonomy) -> tuple:
+    return (taxonomy.domains, taxonomy.activities, taxonomy.topics, taxonomy.pages,
+            taxonomy.default_domain, taxonomy.default_activity)
+
+
+class TaxonomyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def write_json(self, data, name: str = 'taxonomy.json') -> Path:
+        path = self.tmp / name
+        path.write_text(json.dumps(data), encoding='utf-8')
+        return path
+
+    def test_example_file_is_the_built_in_taxonomy(self):
+        built_in = ConversationConverter.default_taxonomy()
+        taxonomy = Taxonomy.load(EXAMPLE)
+        self.assertEqual(rules(taxonomy), rules(built_in))
+        self.assertEqual(taxonomy.source, str(EXAMPLE))
+
+    def test_json_file(self):
+        path = self.write_json({
+            'default_domain': 'misc',
+            'domains': {'cloud': {'page': 'Cloud Security', 'keywords': ['AWS', 'Azure']},
+                        'grc': ['audit']},
+            'activities': {'planning': ['roadmap']},
+            'topics': [{'name': 'S3', 'all': ['aws'], 'any': ['s3', 'bucket']}],
+        })
+        taxonomy = Taxonomy.load(path)
+        self.assertEqual(taxonomy.domains, {'cloud': ['aws', 'azure'], 'grc': ['audit']})
+        self.assertEqual(taxonomy.pages, {'cloud': 'Cloud Security'})
+        self.assertEqual(taxonomy.topics, [('S3', ('aws',), ('s3', 'bucket'))])
+        converter = ConversationConverter(None, taxonomy=taxonomy)
+        text = 'Our roadmap for the AWS bucket audit'
+        self.assertEqual(converter.classify_domains(text), ['cloud', 'grc'])
+        self.assertEqual(converter.classify_activity(text), 'planning')
+        self.assertEqual(converter.extract_key_topics(text), ['S3'])
+        self.assertEqual(converter.classify_domains('nothing'), ['misc'])
+
+    def test_invalid_files_raise_value_error(self):
+        cases = {
+            'missing.json': None,
+            'broken.json': '{"domains": ',
+            'broken.toml': 'domains = [',
+            'list.json': '[]',
+            'no-domains.json': '{"activities": {}}',
+            'empty-keyword.json': '{"domains": {"a": ["x", " "]}}',
+            'multiline.json': '{"domains": {"a": ["x\\ny"]}}',
+            'activities.json': '{"domains": {}, "activities": ["x"]}',
+            'topic-name.json': '{"domains": {}, "topics": [{"any": ["x"]}]}',
+            'topic-keywords.json': '{"domains": {}, "topics": [{"name": "T"}]}',
+            'latin-1.json': b'{"domains": {"a": ["caf\xe9"]}}',
+        }
+        for name, text in cases.items():
+            path = self.tmp / name
+            if isinstance(text, bytes):
+                path.write_bytes(text)
+            elif text is not None:
+                path.write_text(text, encoding='utf-8')
+            with self.subTest(name), self.assertRaises(ValueError):
+                Taxonomy.load(path)
+
+    def test_edits_apply_on_the_next_load_and_nothing_is_cached(self):
+        cache = self.tmp / 'cache'
+        path = self.write_json({'domains': {'a': ['alpha']}})
+        with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': str(cache), 'HOME': str(self.tmp)}):
+            self.assertEqual(Taxonomy.load(path).domains, {'a': ['alpha']})
+            stat = path.stat()
+            # Same size and mtime: only the content tells the two files apart
+            path.write_text(json.dumps({'domains': {'a': ['omega']}}), encoding='utf-8')
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            taxonomy = Taxonomy.load(path)
+        self.assertEqual(taxonomy.domains, {'a': ['omega']})
+        hits = {}
+        taxonomy.matcher().scan_chunk('the omega point', hits)
+        self.assertEqual(hits, {'omega': [4, 1]})
+        self.assertEqual(sorted(path.name for path in self.tmp.rglob('*')), ['taxonomy.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
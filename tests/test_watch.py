@@ -0,0 +1,109 @@
+"""The --watch debounce, driven through the polling watcher on a fake clock."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from conversation_converter import DirectoryWatcher
+
+
+class FakeClock:
+    """``time.monotonic``/``time.sleep`` stand-ins that run scheduled writes."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.events = []
+
+    def at(self, when: float, action):
+        self.events.append((self.now + when, action))
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+        for event in [event for event in self.events if event[0] <= self.now]:
+            self.events.remove(event)
+            event[1]()
+
+
+class DebounceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.clock = FakeClock()
+        for name in ('monotonic', 'sleep'):
+            patcher = mock.patch(f'time.{name}', getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.watcher = DirectoryWatcher(self.tmp, debounce=2.0, poll_interval=0.5,
+                                        use_inotify=False)
+        self.writes = 0
+
+    def write(self, name: str, text: str):
+        """Write a file with a distinct mtime, as an exporter would over time."""
+        def action():
+            path = self.tmp / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(text, encoding='utf-8')
+            self.writes += 1
+            os.utime(path, ns=(0, 1_700_000_000_000_000_000 + self.writes))
+        return action
+
+    def batches(self, count: int) -> list:
+        """The next ``count`` batches as (fake time, file names)."""
+        batches = self.watcher.batches()
+        self.addCleanup(batches.close)
+        result = []
+        for _ in range(count):
+            names = [path.relative_to(self.tmp).as_posix() for path in next(batches)]
+            result.append((self.clock.now, names))
+        return result
+
+    def test_files_are_yielded_once_settled(self):
+        self.write('present.md', 'x')()
+        self.clock.at(1, self.write('slow.md', 'part'))
+        self.clock.at(2, self.write('slow.md', 'part two'))
+        self.clock.at(3, self.write('slow.md', 'part two, done'))
+        self.clock.at(4, self.write('notes.txt', 'ignored'))
+        self.clock.at(5, self.write('sub/nested.md', 'y'))
+        (first, initial), (when, ready), (later, nested) = self.batches(3)
+        self.assertEqual((first, initial), (1000.0, ['present.md']))
+        # Still changing at +3: ready no sooner than 2 s after that
+        self.assertEqual(ready, ['slow.md'])
+        self.assertGreaterEqual(when, 1003.0 + 2.0)
+        self.assertLess(when, 1003.0 + 2.0 + 2 * self.watcher.poll_interval)
+        self.assertEqual(nested, ['sub/nested.md'])
+        self.assertGreaterEqual(later, 1005.0 + 2.0)
+
+    def test_only_real_changes_are_yielded_again(self):
+        self.write('a.md', 'one')()
+        self.write('b.md', 'one')()
+        path = self.tmp / 'a.md'
+        stat = path.stat()
+        # Rewritten with the same size and mtime: not a change
+        self.clock.at(1, lambda: os.utime(path, ns=(0, stat.st_mtime_ns)))
+        self.clock.at(2, self.write('b.md', 'two'))
+        self.assertEqual([names for _, names in self.batches(2)], [['a.md', 'b.md'], ['b.md']])
+
+    def test_files_removed_while_pending_are_dropped(self):
+        self.clock.at(1, self.write('gone.md', 'x'))
+        self.clock.at(2, lambda: (self.tmp / 'gone.md').unlink())
+        self.clock.at(3, self.write('kept.md', 'y'))
+        self.assertEqual([names for _, names in self.batches(1)], [['kept.md']])
+        self.assertEqual(self.watcher.pending, {})
+
+    def test_timeout_waits_for_the_next_file_to_settle(self):
+        self.assertEqual(self.watcher.timeout(0.0), 0.5)
+        self.watcher.pending[self.tmp / 'a.md'] = (1, 1, 10.0)
+        self.watcher.debounce = 0.3
+        self.assertAlmostEqual(self.watcher.timeout(10.1), 0.2)
+        self.assertEqual(self.watcher.timeout(20.0), 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()